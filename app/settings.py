@@ -24,10 +24,14 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'locar.consultas_lentas.ConsultasLentasMiddleware',
+    'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'locar.perfil.PerfilMiddleware',
+    'locar.renderizacao.RenderizacaoMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -44,6 +48,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'locar.context_processors.assets',
             ],
         },
     },
@@ -59,9 +64,23 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Banco de teste em arquivo: o padrão em memória (cache compartilhado) responde "table is
+        # locked" na hora a duas threads escrevendo, em vez de esperar como o banco real
+        'TEST': {'NAME': BASE_DIR / 'test_db.sqlite3'},
     }
 }
 
+# PostgreSQL opcional (ex.: comparar com o SQLite no teste_carga): POSTGRES_DB=locadora ...
+if os.environ.get("POSTGRES_DB"):
+    DATABASES["default"] = {
+        "ENGINE": "django.db.backends.postgresql",
+        "NAME": os.environ["POSTGRES_DB"],
+        "USER": os.environ.get("POSTGRES_USER", ""),
+        "PASSWORD": os.environ.get("POSTGRES_PASSWORD", ""),
+        "HOST": os.environ.get("POSTGRES_HOST", ""),
+        "PORT": os.environ.get("POSTGRES_PORT", ""),
+    }
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -90,4 +109,74 @@ TIME_ZONE = 'America/Sao_Paulo'
 USE_I18N = True
 USE_TZ = True
 STATIC_URL = 'static/'
+STATIC_ROOT = BASE_DIR / 'staticfiles'
+
+# Arquivos estáticos com hash no nome + .gz/.br pré-comprimidos (collectstatic),
+# servidos pelo WhiteNoise com Cache-Control imutável
+STORAGES = {
+    "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+    "staticfiles": {"BACKEND": "whitenoise.storage.CompressedManifestStaticFilesStorage"},
+}
+TAILWIND_CLI = os.environ.get("TAILWIND_CLI", "npx tailwindcss@3.4.17")
+
+# Locações encerradas há mais tempo que isso vão para o arquivo (manage.py arquivar_locacoes)
+ARQUIVAMENTO_DIAS = 365
+
+# Documentos enviados (CNH, CRLV, comprovantes) só por links assinados; MEDIA_URL não deve ser
+# público em produção. DOCUMENTOS_ENVIO: "x-accel-redirect" (nginx), "x-sendfile" (Apache) ou vazio.
+DOCUMENTOS_ENVIO = os.environ.get("DOCUMENTOS_ENVIO", "")
+DOCUMENTOS_URL_INTERNA = "/protegido/"
+DOCUMENTOS_URL_VALIDADE = 60 * 10
+
+# E-mail (lembretes de cobrança). Para testar localmente: python -m aiosmtpd -n -l localhost:1025
+# e EMAIL_PORT=1025
+EMAIL_HOST = os.environ.get("EMAIL_HOST", "localhost")
+EMAIL_PORT = int(os.environ.get("EMAIL_PORT", 25))
+EMAIL_HOST_USER = os.environ.get("EMAIL_HOST_USER", "")
+EMAIL_HOST_PASSWORD = os.environ.get("EMAIL_HOST_PASSWORD", "")
+EMAIL_USE_TLS = os.environ.get("EMAIL_USE_TLS") == "1"
+EMAIL_TIMEOUT = 10
+DEFAULT_FROM_EMAIL = os.environ.get("DEFAULT_FROM_EMAIL", "Locadora <nao-responda@locadora.local>")
+
+# Lembretes de parcelas (manage.py enviar_lembretes)
+LEMBRETES_CANAIS = {
+    "email": "locar.lembretes.CanalEmail",
+    "whatsapp": "locar.lembretes.CanalWhatsApp",
+    "sms": "locar.lembretes.CanalSms",
+}
+LEMBRETES_GATEWAYS = {
+    "whatsapp": {"url": os.environ.get("WHATSAPP_GATEWAY_URL", ""), "token": os.environ.get("WHATSAPP_GATEWAY_TOKEN", "")},
+    "sms": {"url": os.environ.get("SMS_GATEWAY_URL", ""), "token": os.environ.get("SMS_GATEWAY_TOKEN", "")},
+}
+LEMBRETES_DIAS_ANTES = 3
+LEMBRETES_POR_SEGUNDO = 5
+LEMBRETES_ESPERA_RETENTATIVA = 2
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# Perfil de requisições (locar/perfil.py): ?perfil=1 ou cabeçalho X-Perfil (só equipe),
+# ou uma fração sorteada das requisições (0 = desligado)
+PERFIL_AMOSTRAGEM = float(os.environ.get("PERFIL_AMOSTRAGEM", 0))
+PERFIL_PARAMETRO = "perfil"
+PERFIL_INTERVALO_AMOSTRA = 0.005
+PERFIL_MAXIMO = 500
+
+# Consultas lentas (locar/consultas_lentas.py): limite em ms (0 = desligado), tamanho do buffer
+# em memória, quadros da pilha guardados e linhas mantidas na tabela
+SQL_LENTO_MS = int(os.environ.get("SQL_LENTO_MS", 200))
+SQL_LENTO_BUFFER = 200
+SQL_LENTO_QUADROS = 8
+SQL_LENTO_MAXIMO = 5000
+
+# Medição dos templates (locar/renderizacao.py): tempo por template/bloco/include e SQL disparado
+# na renderização, no cabeçalho Server-Timing e em /api/metricas/ (0 = desligado)
+TEMPLATES_MEDIR = os.environ.get("TEMPLATES_MEDIR", "1") == "1"
+
+# Webhooks (locar/webhooks.py, manage.py enviar_webhooks): eventos por POST, tentativas antes da
+# dead letter, espera exponencial entre elas (segundos, com teto), timeout do POST e dias que as
+# entregas concluídas ficam na tabela
+WEBHOOKS_LOTE = 50
+WEBHOOKS_MAX_TENTATIVAS = 8
+WEBHOOKS_ESPERA_BASE = 30
+WEBHOOKS_ESPERA_MAXIMA = 6 * 60 * 60
+WEBHOOKS_TIMEOUT = 10
+WEBHOOKS_RETENCAO_DIAS = 30
@@ -6,10 +6,16 @@ from django.shortcuts import redirect
 
 
 from locar.views import ( ClienteList, ClienteCreate, ClienteDelete, ClienteDetail, ClienteUptade,
+                          ClienteExtratoView, ClienteExtratoExportView,
                           VeiculoCreate ,VeiculoList, VeiculoDetail, VeiculoUpdate, VeiculoDelete,
-                          LocacaoList, LocacaoCreate, LocacaoDetail, LocacaoUpdate, LocacaoDelete,
+                          LocacaoList, LocacaoCreate, LocacaoDetail, LocacaoUpdate, LocacaoDelete, LocacaoArquivadaDetail,
                           EncerrarLocacaoView, ReceberListView, EfetuarPagamentoView, DashboardView, 
-                          DespesaListView, DespesaCreateView, DespesaUpdateView, DespesaDeleteView
+                          DespesaListView, DespesaCreateView, DespesaUpdateView, DespesaDeleteView,
+                          RentabilidadeView, SerieTemporalView, OcupacaoView, OcupacaoJsonView,
+                          PrevisaoJsonView, PrevisaoExportView, VeiculoOpcoesView,
+                          DashboardResumoView, DashboardFrotaView, DashboardRecebimentosView, DashboardGraficoView,
+                          DocumentoView, ContratoPdfView, ReciboPdfView, RecibosMesPdfView, ConsultasLentasView,
+                          MetricasView
                          )
 
 urlpatterns = [
@@ -20,6 +26,8 @@ urlpatterns = [
     path('clientes/<int:pk>/excluir/', ClienteDelete.as_view(), name='cliente_excluir'),
     path('clientes/<int:pk>/detalhe/', ClienteDetail.as_view(), name='cliente_detalhe'),
     path('clientes/<int:pk>/editar/', ClienteUptade.as_view(), name ='cliente_editar'),
+    path('clientes/<int:pk>/extrato/', ClienteExtratoView.as_view(), name='cliente_extrato'),
+    path('clientes/<int:pk>/extrato.csv', ClienteExtratoExportView.as_view(), name='cliente_extrato_csv'),
 
     path('veiculos/', VeiculoList.as_view(), name='veiculo_list'),
     path('veiculos/adicionar/', VeiculoCreate.as_view(), name='veiculo_adicionar'),
@@ -30,12 +38,14 @@ urlpatterns = [
     path('locacao/', LocacaoList.as_view(), name='locacao_list'),
     path('locacao/adicionar/', LocacaoCreate.as_view(), name='locacao_adicionar'),
     path('locacao/<int:pk>/detalhe', LocacaoDetail.as_view(), name='locacao_detalhe'),
+    path('locacao/arquivo/<int:pk>/detalhe', LocacaoArquivadaDetail.as_view(), name='locacao_arquivada_detalhe'),
     path("locacoes/<int:pk>/encerrar/", EncerrarLocacaoView.as_view(), name="locacao_encerrar"),
     path('locacao/<int:pk>/editar/', LocacaoUpdate.as_view(), name="locacao_editar"),
     path('locacao/<int:pk>/excluir/', LocacaoDelete.as_view(), name="locacao_excluir"),
 
     path("financeiro/receber/", ReceberListView.as_view(), name="receber"),
     path("financeiro/<int:pk>/pagamento/", EfetuarPagamentoView.as_view(), name="pagamento"),
+    path("financeiro/previsao/exportar/", PrevisaoExportView.as_view(), name="previsao_exportar"),
 
     path("despesa/", DespesaListView.as_view(), name="despesa_list" ),
     path("despesa/adicionar/", DespesaCreateView.as_view(), name='despesa_adicionar'),
@@ -43,10 +53,29 @@ urlpatterns = [
     path("desepesa/<int:pk>/excluir/", DespesaDeleteView.as_view(), name="despesa_excluir"),
 
 
-    path('dashboard/', DashboardView.as_view(), name="dashboard")
+    path('dashboard/', DashboardView.as_view(), name="dashboard"),
+    path('dashboard/resumo/', DashboardResumoView.as_view(), name="dashboard_resumo"),
+    path('dashboard/frota/', DashboardFrotaView.as_view(), name="dashboard_frota"),
+    path('dashboard/recebimentos/', DashboardRecebimentosView.as_view(), name="dashboard_recebimentos"),
+    path('dashboard/grafico/', DashboardGraficoView.as_view(), name="dashboard_grafico"),
+
+    path("relatorios/rentabilidade/", RentabilidadeView.as_view(), name="rentabilidade"),
+    path("relatorios/ocupacao/", OcupacaoView.as_view(), name="ocupacao"),
+    path("relatorios/consultas-lentas/", ConsultasLentasView.as_view(), name="consultas_lentas"),
+    path("api/serie-temporal/", SerieTemporalView.as_view(), name="serie_temporal"),
+    path("api/ocupacao/", OcupacaoJsonView.as_view(), name="ocupacao_json"),
+    path("api/previsao/", PrevisaoJsonView.as_view(), name="previsao_json"),
+    path("api/veiculos/", VeiculoOpcoesView.as_view(), name="veiculo_opcoes"),
+    path("api/metricas/", MetricasView.as_view(), name="metricas"),
+
+    path("documentos/<str:token>/", DocumentoView.as_view(), name="documento"),
+    path("locacao/<int:pk>/contrato.pdf", ContratoPdfView.as_view(), name="contrato_pdf"),
+    path("financeiro/recibo/<int:pk>.pdf", ReciboPdfView.as_view(), name="recibo_pdf"),
+    path("clientes/<int:pk>/recibos/<int:ano>-<int:mes>.pdf", RecibosMesPdfView.as_view(), name="recibos_mes_pdf"),
 
 
 ]
 
+# Só para desenvolvimento: em produção os arquivos saem por DocumentoView (links assinados)
 if settings.DEBUG:
     urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
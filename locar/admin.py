@@ -1,27 +1,202 @@
+import json
+from functools import partial
 from django.contrib import admin
-from .models import Cliente, Veiculo, Locacao, Despesa, Pagamento
+from django.db.models import Q
+from django.http import HttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import path, reverse
+from django.utils.html import format_html
+from .models import (Cliente, Veiculo, Locacao, Despesa, Pagamento, LocacaoArquivada, PerfilRequisicao, DestinoWebhook,
+                     EntregaWebhook)
+from .normalizacao import busca_cliente, busca_veiculo
+from .paginacao import PaginadorEstimado
+from .perfil import texto_pstats
+from .webhooks import EVENTOS, reenviar
+
+
+class TabelaGrandeAdmin(admin.ModelAdmin):
+    # Sem o COUNT(*) da tabela inteira ("x de y") e com contagem estimada na paginação
+    show_full_result_count = False
+    paginator = PaginadorEstimado
+
+
+class BuscaNormalizadaAdmin(TabelaGrandeAdmin):
+    """Busca pelas colunas normalizadas e indexadas (locar/normalizacao.py), com o termo normalizado
+    como nas telas do sistema ("abc-1d23" acha ABC1D23, "jose" acha José). `search_fields` só lista
+    as colunas (caixa de busca e autocomplete); o filtro vem de `buscas`, funções termo -> Q."""
+    buscas = ()
+
+    def get_search_results(self, request, queryset, search_term):
+        termo = search_term.strip()
+        if not termo:
+            return queryset, False
+        filtro = Q()
+        for busca in self.buscas:
+            filtro |= busca(termo)
+        return queryset.filter(filtro), False
+
+
+def _busca_id(campo):
+    return lambda termo: Q(**{campo: int(termo)}) if termo.isdigit() else Q(pk__in=[])
+
+
+_busca_cliente = partial(busca_cliente, prefixo="cliente__")
+_busca_veiculo = partial(busca_veiculo, prefixo="veiculo__")
+
 
 @admin.register(Cliente)
-class ClienteAdmin(admin.ModelAdmin):
+class ClienteAdmin(BuscaNormalizadaAdmin):
     list_display = ("nome", "cpf", "telefone")
-    search_fields = ("nome", "cpf")
-    
+    search_fields = ("nome_normalizado", "cpf_normalizado", "cnh_normalizada")
+    buscas = (busca_cliente,)
+
 @admin.register(Veiculo)
-class VeiculoAdmin(admin.ModelAdmin):
+class VeiculoAdmin(BuscaNormalizadaAdmin):
     list_display = ("marca", "modelo", "placa", "status")
-    search_fields = ("placa", "modelo")
+    search_fields = ("placa_normalizada", "modelo", "marca")
+    buscas = (busca_veiculo,)
 
 @admin.register(Locacao)
-class LocacaoAdmin(admin.ModelAdmin):
+class LocacaoAdmin(BuscaNormalizadaAdmin):
     list_display = ("veiculo", "cliente", "inicio", "caucao", "valor_semanal")
-    search_fields = ("veiculo", "cliente")
+    list_select_related = ("veiculo", "cliente")
+    search_fields = ("veiculo__placa_normalizada", "cliente__nome_normalizado", "cliente__cpf_normalizado")
+    buscas = (_busca_veiculo, _busca_cliente)
+    autocomplete_fields = ("veiculo", "cliente")
+    date_hierarchy = "inicio"
 
 @admin.register(Despesa)
-class DespesaAdmin(admin.ModelAdmin):
-    list_display = ("veiculo", "categoria", "data", "valor")
-    search_fields = ("veiculo", "data")
+class DespesaAdmin(BuscaNormalizadaAdmin):
+    list_display = ("veiculo", "categoria", "data", "valor", "cliente")
+    list_select_related = ("veiculo", "cliente")
+    search_fields = ("veiculo__placa_normalizada", "descricao", "=auto_infracao")
+    buscas = (_busca_veiculo, lambda termo: Q(descricao__icontains=termo), lambda termo: Q(auto_infracao=termo))
+    readonly_fields = ("cliente", "auto_infracao")
+    autocomplete_fields = ("veiculo",)
+    date_hierarchy = "data"
 
 @admin.register(Pagamento)
-class PagamentoAdmin(admin.ModelAdmin):
-    list_display = ("locacao", "data")
-    search_fields = ("locacao", "data")
+class PagamentoAdmin(BuscaNormalizadaAdmin):
+    list_display = ("locacao", "data", "valor")
+    # __str__ da locação usa veículo e cliente
+    list_select_related = ("locacao__veiculo", "locacao__cliente")
+    search_fields = ("=locacao__id", "locacao__veiculo__placa_normalizada", "locacao__cliente__nome_normalizado")
+    buscas = (
+        _busca_id("locacao_id"),
+        partial(busca_veiculo, prefixo="locacao__veiculo__"),
+        partial(busca_cliente, prefixo="locacao__cliente__"),
+    )
+    autocomplete_fields = ("locacao",)
+    date_hierarchy = "data"
+
+@admin.register(LocacaoArquivada)
+class LocacaoArquivadaAdmin(BuscaNormalizadaAdmin):
+    list_display = ("id", "veiculo", "cliente", "inicio", "fim", "arquivado_em")
+    list_select_related = ("veiculo", "cliente")
+    search_fields = ("=id", "veiculo__placa_normalizada", "cliente__nome_normalizado", "cliente__cpf_normalizado")
+    buscas = (_busca_id("id"), _busca_veiculo, _busca_cliente)
+    autocomplete_fields = ("veiculo", "cliente")
+
+
+@admin.register(PerfilRequisicao)
+class PerfilRequisicaoAdmin(admin.ModelAdmin):
+    list_display = ("criado_em", "metodo", "url_nome", "status", "duracao_ms", "consultas", "tempo_sql_ms", "motivo", "arquivos")
+    list_filter = ("motivo", "metodo")
+    search_fields = ("url_nome", "caminho")
+    date_hierarchy = "criado_em"
+    fields = (
+        "criado_em", "caminho", "url_nome", "metodo", "status", "motivo", "usuario",
+        "duracao_ms", "consultas", "tempo_sql_ms", "arquivos", "sql", "funcoes",
+    )
+    readonly_fields = fields
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def get_queryset(self, request):
+        # Os blobs só são lidos no detalhe e nos downloads
+        return super().get_queryset(request).defer("pstats", "pilhas")
+
+    def get_urls(self):
+        return [
+            path("<int:pk>/pstats/", self.admin_site.admin_view(self.baixar_pstats), name="locar_perfil_pstats"),
+            path("<int:pk>/pilhas/", self.admin_site.admin_view(self.baixar_pilhas), name="locar_perfil_pilhas"),
+        ] + super().get_urls()
+
+    def _baixar(self, request, pk, campo, conteudo, nome):
+        if not self.has_view_permission(request):
+            return HttpResponse(status=403)
+        dados = getattr(get_object_or_404(PerfilRequisicao.objects.only(campo), pk=pk), campo)
+        response = HttpResponse(bytes(dados) if campo == "pstats" else dados, content_type=conteudo)
+        response["Content-Disposition"] = f'attachment; filename="{nome}"'
+        return response
+
+    def baixar_pstats(self, request, pk):
+        # python -m pstats perfil-<id>.prof / snakeviz
+        return self._baixar(request, pk, "pstats", "application/octet-stream", f"perfil-{pk}.prof")
+
+    def baixar_pilhas(self, request, pk):
+        # flamegraph.pl perfil-<id>.folded > perfil.svg, ou abrir no speedscope
+        return self._baixar(request, pk, "pilhas", "text/plain; charset=utf-8", f"perfil-{pk}.folded")
+
+    @admin.display(description="Downloads")
+    def arquivos(self, obj):
+        return format_html(
+            '<a href="{}">pstats</a> · <a href="{}">pilhas (flamegraph)</a>',
+            reverse("admin:locar_perfil_pstats", args=[obj.pk]),
+            reverse("admin:locar_perfil_pilhas", args=[obj.pk]),
+        )
+
+    @admin.display(description="SQL mais pesado")
+    def sql(self, obj):
+        return format_html("<pre>{}</pre>", obj.resumo_sql or "—")
+
+    @admin.display(description="Funções (tempo acumulado)")
+    def funcoes(self, obj):
+        return format_html("<pre>{}</pre>", texto_pstats(obj.pstats))
+
+
+@admin.register(DestinoWebhook)
+class DestinoWebhookAdmin(admin.ModelAdmin):
+    list_display = ("nome", "url", "eventos", "ativo", "max_concorrencia", "pendentes", "mortas")
+    list_filter = ("ativo",)
+
+    def get_form(self, request, obj=None, **kwargs):
+        form = super().get_form(request, obj, **kwargs)
+        form.base_fields["eventos"].help_text = "Separados por vírgula; vazio recebe todos: " + ", ".join(EVENTOS)
+        return form
+
+    @admin.display(description="Pendentes")
+    def pendentes(self, obj):
+        return obj.entregas.filter(status="pendente").count()
+
+    @admin.display(description="Dead letter")
+    def mortas(self, obj):
+        return obj.entregas.filter(status="morta").count()
+
+
+@admin.register(EntregaWebhook)
+class EntregaWebhookAdmin(TabelaGrandeAdmin):
+    list_display = ("id", "evento", "destino", "status", "tentativas", "proxima_tentativa", "entregue_em", "erro")
+    list_filter = ("status", "destino", "evento__tipo")
+    list_select_related = ("evento", "destino")
+    fields = ("evento", "destino", "status", "tentativas", "proxima_tentativa", "lote", "erro", "entregue_em", "dados")
+    readonly_fields = fields
+    actions = ["reenviar"]
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    @admin.display(description="Dados do evento")
+    def dados(self, obj):
+        return format_html("<pre>{}</pre>", json.dumps(obj.evento.dados, indent=2, ensure_ascii=False))
+
+    @admin.action(description="Reenviar (volta para a fila com as tentativas zeradas)")
+    def reenviar(self, request, queryset):
+        self.message_user(request, f"{reenviar(queryset)} entrega(s) de volta na fila.")
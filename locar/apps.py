@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class LocarConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'locar'
+
+    def ready(self):
+        from . import consultas_lentas, renderizacao, signals  # noqa: F401
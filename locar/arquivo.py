@@ -0,0 +1,65 @@
+from datetime import timedelta
+from django.db import connection, transaction
+from django.utils import timezone
+from .models import Locacao, Pagamento, LocacaoArquivada, PagamentoArquivado
+from .versoes import tocar
+
+# Campos copiados entre as tabelas principais e as de arquivo (mesmos nomes dos dois lados)
+CAMPOS_LOCACAO = [
+    "id", "veiculo_id", "cliente_id", "inicio", "fim", "km_inicio", "km_fim", "valor_semanal",
+    "quantidade_semanas", "caucao", "caucao_status", "forma_pagamento", "status", "criado_por_id",
+    "criado_em", "documentos_locacao", "observacoes", "semanas_pagas",
+]
+CAMPOS_PAGAMENTO = ["id", "locacao_id", "data", "valor"]
+# Ids por DELETE (limite de parâmetros do SQLite)
+LOTE_DELETE = 500
+
+
+def candidatas_arquivamento(dias):
+    limite = timezone.now() - timedelta(days=dias)
+    return Locacao.objects.filter(status="encerrada", fim__lt=limite).order_by("id")
+
+
+def _apagar(modelo, campo, ids):
+    # DELETE direto, sem carregar as linhas: o delete() do queryset dispararia post_delete linha
+    # a linha (versões, extrato, lembretes). Os lembretes ficam (mesmo id na restauração)
+    tabela = connection.ops.quote_name(modelo._meta.db_table)
+    coluna = connection.ops.quote_name(modelo._meta.get_field(campo).column)
+    with connection.cursor() as cursor:
+        for inicio in range(0, len(ids), LOTE_DELETE):
+            lote = ids[inicio:inicio + LOTE_DELETE]
+            cursor.execute(f"DELETE FROM {tabela} WHERE {coluna} IN ({', '.join(['%s'] * len(lote))})", lote)
+
+
+def _mover(ids, origem_locacao, origem_pagamento, destino_locacao, destino_pagamento, preparar=None):
+    # Copia com bulk_create e apaga a origem na mesma transação
+    with transaction.atomic():
+        locacoes = [destino_locacao(**row) for row in origem_locacao.objects.filter(id__in=ids).values(*CAMPOS_LOCACAO)]
+        pagamentos = [
+            destino_pagamento(**row)
+            for row in origem_pagamento.objects.filter(locacao_id__in=ids).values(*CAMPOS_PAGAMENTO)
+        ]
+        if preparar:
+            for locacao in locacoes:
+                preparar(locacao)
+        destino_locacao.objects.bulk_create(locacoes)
+        destino_pagamento.objects.bulk_create(pagamentos)
+        movidas = [locacao.id for locacao in locacoes]
+        _apagar(origem_pagamento, "locacao", movidas)
+        _apagar(origem_locacao, "id", movidas)
+        # O que os sinais fariam, uma vez por lote (a versão também renova o extrato em cache)
+        tocar(Locacao, Pagamento, LocacaoArquivada, PagamentoArquivado)
+    return len(locacoes), len(pagamentos)
+
+
+def _recalcular(locacao):
+    # bulk_create não chama o save(): campos derivados são refeitos aqui
+    locacao.proximo_vencimento = locacao.calcular_proximo_vencimento()
+
+
+def arquivar_locacoes(ids):
+    return _mover(ids, Locacao, Pagamento, LocacaoArquivada, PagamentoArquivado)
+
+
+def restaurar_locacoes(ids):
+    return _mover(ids, LocacaoArquivada, PagamentoArquivado, Locacao, Pagamento, preparar=_recalcular)
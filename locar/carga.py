@@ -0,0 +1,272 @@
+import http.cookiejar
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import defaultdict
+from datetime import timedelta
+from django.conf import settings
+from django.db import connection
+from django.urls import reverse
+from django.utils import timezone
+from .models import Cliente, Veiculo, Locacao, Pagamento, TarefaPdf, EventoWebhook
+
+# Teste de carga dos caminhos de gravação (manage.py teste_carga): cada usuário virtual é uma
+# thread com sua própria sessão HTTP, seu cliente e seu veículo, repetindo a jornada do balcão
+# — abrir "receber", criar locação, registrar pagamento, abrir a locação e encerrá-la.
+
+PREFIXO_PLACA = "CRG"
+ETAPAS = ["receber", "criar_locacao", "pagamento", "abrir_locacao", "encerrar_locacao"]
+PERCENTIS = (50, 95, 99)
+
+
+# ----------------------------- DADOS DO TESTE -----------------------------------------
+def preparar_dados(usuarios):
+    """Um cliente e um veículo por usuário virtual (placas CRG0001...). Devolve [(cliente_id, veiculo_id)]."""
+    pares = []
+    for numero in range(1, usuarios + 1):
+        cliente, _ = Cliente.objects.get_or_create(
+            cpf=f"000000{numero:05d}",
+            defaults={"nome": f"Cliente Carga {numero}", "data_nascimento": "1990-01-01", "cnh_numero": f"CRG{numero:05d}"},
+        )
+        veiculo, _ = Veiculo.objects.get_or_create(
+            placa=f"{PREFIXO_PLACA}{numero:04d}", defaults={"marca": "Carga", "modelo": "Teste", "ano": 2024}
+        )
+        # Sobra de uma execução interrompida
+        if veiculo.status != "disponível":
+            Veiculo.objects.filter(pk=veiculo.pk).update(status="disponível")
+        pares.append((cliente.pk, veiculo.pk))
+    return pares
+
+
+def limpar_dados():
+    veiculos = Veiculo.objects.filter(placa__startswith=PREFIXO_PLACA)
+    clientes = Cliente.objects.filter(cnh_numero__startswith=PREFIXO_PLACA)
+    locacoes = list(Locacao.objects.filter(veiculo__in=veiculos).values_list("id", flat=True))
+    pagamentos = list(Pagamento.objects.filter(locacao_id__in=locacoes).values_list("id", flat=True))
+    TarefaPdf.objects.filter(tipo="contrato", referencia__in=[str(i) for i in locacoes]).delete()
+    TarefaPdf.objects.filter(tipo="recibo", referencia__in=[str(i) for i in pagamentos]).delete()
+    # Eventos de webhook das locações e pagamentos do teste (as entregas vão junto, em cascata):
+    # o enviar_webhooks não pode entregar dados sintéticos aos destinos reais
+    EventoWebhook.objects.filter(dados__cliente_id__in=list(clientes.values_list("id", flat=True))).delete()
+    Pagamento.objects.filter(id__in=pagamentos).delete()
+    Locacao.objects.filter(id__in=locacoes).delete()
+    veiculos.delete()
+    clientes.delete()
+
+
+# ----------------------------- SERVIDOR -----------------------------------------
+def _porta_livre():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def iniciar_servidor(porta=None, espera=30):
+    """Sobe `manage.py runserver` (WSGI, com threads) em outro processo; devolve (processo, url_base)."""
+    porta = porta or _porta_livre()
+    processo = subprocess.Popen(
+        [sys.executable, "manage.py", "runserver", f"127.0.0.1:{porta}", "--noreload"],
+        cwd=settings.BASE_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    limite = time.monotonic() + espera
+    while time.monotonic() < limite:
+        if processo.poll() is not None:
+            raise RuntimeError("O servidor de teste terminou ao iniciar.")
+        try:
+            socket.create_connection(("127.0.0.1", porta), timeout=0.5).close()
+            return processo, f"http://127.0.0.1:{porta}"
+        except OSError:
+            time.sleep(0.2)
+    processo.terminate()
+    raise RuntimeError(f"O servidor de teste não respondeu em {espera}s.")
+
+
+# ----------------------------- USUÁRIO VIRTUAL -----------------------------------------
+class _SemRedirecionar(urllib.request.HTTPRedirectHandler):
+    # O 302 de sucesso dos formulários é a resposta medida; não segue para a próxima página
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class UsuarioVirtual:
+    def __init__(self, url_base, cliente_id, veiculo_id, timeout=30):
+        self.url_base = url_base
+        self.cliente_id = cliente_id
+        self.veiculo_id = veiculo_id
+        self.timeout = timeout
+        self.cookies = http.cookiejar.CookieJar()
+        self.navegador = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(self.cookies), _SemRedirecionar()
+        )
+        self.medicoes = []
+
+    def _csrf(self):
+        return next((c.value for c in self.cookies if c.name == settings.CSRF_COOKIE_NAME), "")
+
+    def _requisicao(self, etapa, caminho, dados=None, status_esperado=200):
+        """Faz a requisição e registra (etapa, ms, erro). Devolve True se deu certo."""
+        corpo = None
+        if dados is not None:
+            corpo = urllib.parse.urlencode({**dados, "csrfmiddlewaretoken": self._csrf()}).encode()
+        inicio = time.perf_counter()
+        erro = None
+        try:
+            with self.navegador.open(self.url_base + caminho, data=corpo, timeout=self.timeout) as resposta:
+                resposta.read()
+                status = resposta.status
+        except urllib.error.HTTPError as exc:
+            exc.read()
+            status = exc.code
+        except OSError as exc:
+            status, erro = None, type(exc).__name__
+        duracao = (time.perf_counter() - inicio) * 1000
+        if erro is None and status != status_esperado:
+            # 200 num POST = formulário devolvido com erro; 500 = ex.: "database is locked"
+            erro = f"HTTP {status}"
+        self.medicoes.append((etapa, duracao, erro))
+        return erro is None
+
+    def _dados_locacao(self):
+        agora = timezone.localtime()
+        return {
+            "cliente": self.cliente_id,
+            "veiculo": self.veiculo_id,
+            "inicio": f"{agora:%Y-%m-%dT%H:%M}",
+            "fim": f"{agora + timedelta(days=28):%Y-%m-%dT%H:%M}",
+            "km_inicio": 1000,
+            "valor_semanal": "300.00",
+            "quantidade_semanas": 4,
+            "caucao": "0.00",
+            "forma_pagamento": "semanal",
+            "status": "andamento",
+            "observacoes": "teste de carga",
+        }
+
+    def jornada(self):
+        if not self._requisicao("receber", reverse("receber")):
+            return
+        # Formulário de locação: o GET também entrega o cookie CSRF
+        self._requisicao("criar_locacao", reverse("locacao_adicionar"))
+        criada = self._requisicao(
+            "criar_locacao", reverse("locacao_adicionar"), self._dados_locacao(), status_esperado=302
+        )
+        if not criada:
+            return
+        # O redirecionamento não traz o id: procura a locação aberta deste veículo (fora da medição)
+        locacao_id = (
+            Locacao.objects.filter(veiculo_id=self.veiculo_id, status="andamento").order_by("-id")
+            .values_list("id", flat=True).first()
+        )
+        if locacao_id is None:
+            return
+        self._requisicao("pagamento", reverse("pagamento", args=[locacao_id]))
+        self._requisicao("pagamento", reverse("pagamento", args=[locacao_id]), {}, status_esperado=302)
+        self._requisicao("abrir_locacao", reverse("locacao_detalhe", args=[locacao_id]))
+        self._requisicao("encerrar_locacao", reverse("locacao_encerrar", args=[locacao_id]), {
+            "km_fim": 1500, "caucao_status": "devolvido", "observacoes": "teste de carga",
+        }, status_esperado=302)
+
+    def executar(self, fim, iteracoes=None):
+        feitas = 0
+        while time.monotonic() < fim and (iteracoes is None or feitas < iteracoes):
+            self.jornada()
+            feitas += 1
+        # Locação que ficou aberta por erro no meio da jornada libera o veículo para a próxima
+        Locacao.objects.filter(veiculo_id=self.veiculo_id, status="andamento").update(status="encerrada")
+        Veiculo.objects.filter(pk=self.veiculo_id).update(status="disponível")
+        connection.close()
+
+
+def executar_carga(url_base, pares, duracao, iteracoes=None):
+    """Roda um usuário virtual (thread) por par cliente/veículo. Devolve (medições, segundos)."""
+    fim = time.monotonic() + duracao
+    usuarios = [UsuarioVirtual(url_base, cliente_id, veiculo_id) for cliente_id, veiculo_id in pares]
+    threads = [threading.Thread(target=usuario.executar, args=(fim, iteracoes)) for usuario in usuarios]
+    inicio = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    segundos = time.monotonic() - inicio
+    return [medicao for usuario in usuarios for medicao in usuario.medicoes], segundos
+
+
+def executar_disputa(url_base, pares):
+    """Todos os usuários tentam locar o veículo do primeiro par no mesmo instante.
+
+    Devolve (vencedores, recusados, outros_erros, locacoes_abertas): com a reserva atômica
+    deve haver exatamente um vencedor e uma locação aberta; os demais recebem o formulário
+    de volta com o erro do veículo (HTTP 200).
+    """
+    veiculo_id = pares[0][1]
+    usuarios = [UsuarioVirtual(url_base, cliente_id, veiculo_id) for cliente_id, _ in pares]
+    barreira = threading.Barrier(len(usuarios))
+
+    def disputar(usuario):
+        # O GET entrega o cookie CSRF; a barreira solta todos os POSTs juntos
+        usuario._requisicao("formulario", reverse("locacao_adicionar"))
+        barreira.wait()
+        usuario._requisicao("criar_locacao", reverse("locacao_adicionar"), usuario._dados_locacao(), status_esperado=302)
+        connection.close()
+
+    threads = [threading.Thread(target=disputar, args=(usuario,)) for usuario in usuarios]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    erros = [erro for usuario in usuarios for etapa, _, erro in usuario.medicoes if etapa == "criar_locacao"]
+    vencedores = erros.count(None)
+    recusados = erros.count("HTTP 200")
+    abertas = Locacao.objects.filter(veiculo_id=veiculo_id, status="andamento").count()
+    return vencedores, recusados, len(erros) - vencedores - recusados, abertas
+
+
+# ----------------------------- RELATÓRIO -----------------------------------------
+def _percentil(ordenados, p):
+    # Método do posto mais próximo
+    if not ordenados:
+        return 0
+    return ordenados[max(0, min(len(ordenados) - 1, round(p / 100 * len(ordenados) + 0.5) - 1))]
+
+
+def resumir(medicoes, segundos):
+    por_etapa = defaultdict(list)
+    erros = defaultdict(lambda: defaultdict(int))
+    for etapa, duracao, erro in medicoes:
+        por_etapa[etapa].append(duracao)
+        if erro:
+            erros[etapa][erro] += 1
+    etapas = {}
+    for etapa in ETAPAS:
+        duracoes = sorted(por_etapa.get(etapa, []))
+        total_erros = sum(erros[etapa].values())
+        etapas[etapa] = {
+            "requisicoes": len(duracoes),
+            "por_segundo": round(len(duracoes) / segundos, 2) if segundos else 0,
+            "erros": total_erros,
+            "taxa_erro": round(total_erros / len(duracoes), 4) if duracoes else 0,
+            "tipos_erro": dict(erros[etapa]),
+            **{f"p{p}_ms": round(_percentil(duracoes, p), 1) for p in PERCENTIS},
+        }
+    return etapas
+
+
+def comparar(atual, base, tolerancia):
+    """Etapas que pioraram mais que `tolerancia` (fração) em p95, vazão ou taxa de erro."""
+    regressoes = []
+    for etapa, dados in atual.items():
+        anterior = base.get(etapa)
+        if not anterior or not anterior["requisicoes"]:
+            continue
+        if anterior["p95_ms"] and dados["p95_ms"] > anterior["p95_ms"] * (1 + tolerancia):
+            regressoes.append(f"{etapa}: p95 {anterior['p95_ms']} -> {dados['p95_ms']} ms")
+        if dados["por_segundo"] < anterior["por_segundo"] * (1 - tolerancia):
+            regressoes.append(f"{etapa}: vazão {anterior['por_segundo']} -> {dados['por_segundo']} req/s")
+        if dados["taxa_erro"] > anterior["taxa_erro"] + tolerancia / 10:
+            regressoes.append(f"{etapa}: erros {anterior['taxa_erro']:.1%} -> {dados['taxa_erro']:.1%}")
+    return regressoes
@@ -0,0 +1,55 @@
+from django.db import transaction
+from django.db.models import Count, DecimalField, F, IntegerField, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from .models import Locacao, Pagamento
+from .versoes import tocar
+
+# Conferência de Locacao.semanas_pagas (contador incrementado a cada recebimento) contra as
+# linhas de Pagamento. As locações são percorridas por faixas de id: uma consulta agrupada por
+# faixa devolve só as divergentes, então a memória não cresce com o tamanho da tabela.
+
+
+def divergencias(id_inicial, id_final):
+    """Locações com id em (id_inicial, id_final] cujo contador não bate com os pagamentos."""
+    return (
+        Locacao.objects.filter(pk__gt=id_inicial, pk__lte=id_final)
+        .order_by()
+        .annotate(
+            pagamentos_qtd=Count("pagamentos"),
+            pagamentos_total=Coalesce(Sum("pagamentos__valor"), Value(0), output_field=DecimalField()),
+        )
+        # Valor recebido diferente de parcelas x valor semanal também é reportado (não é corrigido)
+        .filter(
+            ~Q(semanas_pagas=F("pagamentos_qtd"))
+            | ~Q(pagamentos_total=F("pagamentos_qtd") * F("valor_semanal"))
+        )
+        .order_by("pk")
+        .values("id", "semanas_pagas", "quantidade_semanas", "valor_semanal", "pagamentos_qtd", "pagamentos_total")
+    )
+
+
+def corrigir(ids):
+    """Recalcula semanas_pagas (e o próximo vencimento) das locações, num UPDATE só."""
+    contagem = (
+        Pagamento.objects.filter(locacao=OuterRef("pk"))
+        .order_by()
+        .values("locacao")
+        .annotate(total=Count("id"))
+        .values("total")
+    )
+    with transaction.atomic():
+        # UPDATE ... SET semanas_pagas = (SELECT COUNT(*) ...): a contagem é feita no próprio
+        # UPDATE, então um pagamento lançado entre a leitura e a correção não se perde
+        Locacao.objects.filter(pk__in=ids).update(
+            semanas_pagas=Coalesce(Subquery(contagem, output_field=IntegerField()), 0)
+        )
+        locacoes = list(
+            Locacao.objects.select_for_update()
+            .filter(pk__in=ids)
+            .only("id", "cliente", "inicio", "semanas_pagas", "quantidade_semanas", "proximo_vencimento")
+        )
+        for locacao in locacoes:
+            locacao.proximo_vencimento = locacao.calcular_proximo_vencimento()
+        Locacao.objects.bulk_update(locacoes, ["proximo_vencimento"])
+        # update()/bulk_update não disparam sinais (a versão também renova o extrato em cache)
+        tocar(Locacao)
@@ -0,0 +1,224 @@
+import atexit
+import contextvars
+import hashlib
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from django.conf import settings
+from django.core.signals import request_finished, request_started
+from django.db import DatabaseError, close_old_connections, connections, transaction
+from django.db.models import Avg, Count, Max, Sum
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.utils import timezone
+
+# Registro de consultas lentas: um execute_wrapper instalado em toda conexão (views, comandos,
+# workers) mede cada SQL; as que passam de SQL_LENTO_MS vão para um buffer circular em memória
+# e para a tabela ConsultaLenta, com a impressão digital do SQL, parâmetros (CPF/CNH ocultos),
+# a view de origem, a pilha Python do projeto e o EXPLAIN.
+# Relatório por impressão digital: /relatorios/consultas-lentas/.
+
+logger = logging.getLogger(__name__)
+
+# Últimas consultas lentas deste processo (não depende do banco)
+recentes = deque(maxlen=settings.SQL_LENTO_BUFFER)
+
+# View (ou comando) que originou as consultas; definida pelo ConsultasLentasMiddleware
+origem_atual = contextvars.ContextVar("origem_sql", default=None)
+_local = threading.local()
+
+LITERAIS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+LISTAS = re.compile(r"\((?:\s*(?:%s|\?)\s*,)+\s*(?:%s|\?)\s*\)")
+# CPF (com ou sem pontuação) e números longos como CNH
+DOCUMENTO = re.compile(r"^\d{3}\.?\d{3}\.?\d{3}-?\d{2}$|^\d{9,14}$")
+
+
+def normalizar_sql(sql):
+    """SQL sem literais e com listas IN (...) de qualquer tamanho iguais, para agrupar."""
+    sql = LITERAIS.sub("?", sql)
+    sql = LISTAS.sub("(...)", sql)
+    return " ".join(sql.split())
+
+
+def impressao_digital(sql_normalizado):
+    return hashlib.sha1(sql_normalizado.encode()).hexdigest()
+
+
+def ocultar(params):
+    if params is None:
+        return None
+    if isinstance(params, dict):
+        return {chave: ocultar([valor])[0] for chave, valor in params.items()}
+    # strip("%"): buscas por LIKE chegam como "%12345678901%"
+    return ["***" if isinstance(valor, str) and DOCUMENTO.match(valor.strip("% ")) else valor for valor in params]
+
+
+def _pilha():
+    # Só os quadros do projeto (sem Django/bibliotecas e sem os middlewares de medição),
+    # do mais externo ao mais interno
+    base = str(settings.BASE_DIR)
+    proprios = (__file__, os.path.join(os.path.dirname(__file__), "perfil.py"))
+    quadros = [
+        quadro for quadro in traceback.extract_stack()[:-3]
+        if quadro.filename.startswith(base) and "site-packages" not in quadro.filename
+        and quadro.filename not in proprios
+    ]
+    return "".join(traceback.format_list(quadros[-settings.SQL_LENTO_QUADROS:]))
+
+
+def _origem():
+    origem = origem_atual.get()
+    if origem:
+        return origem
+    if len(sys.argv) > 1 and sys.argv[0].endswith("manage.py"):
+        return f"manage.py {sys.argv[1]}"
+    return ""
+
+
+def _explain(conexao, sql, params):
+    if not sql.lstrip().upper().startswith("SELECT"):
+        return ""
+    try:
+        # atomic: no PostgreSQL um EXPLAIN com erro não pode abortar a transação da requisição
+        with transaction.atomic(using=conexao.alias), conexao.cursor() as cursor:
+            cursor.execute(f"{conexao.ops.explain_query_prefix()} {sql}", params)
+            return "\n".join(" ".join(str(coluna) for coluna in linha) for linha in cursor.fetchall())
+    except DatabaseError as exc:
+        return f"(EXPLAIN indisponível: {exc})"
+
+
+def _anotar(conexao, sql, params, duracao):
+    # Dentro do execute_wrapper não se toca no banco: outra consulta aqui mudaria o rowcount
+    # (SQLite) do comando medido. O EXPLAIN e a gravação ficam para gravar_pendentes(), chamada no
+    # fim da requisição ou, fora dela, antes do próximo comando SQL que não esteja numa transação.
+    normalizado = normalizar_sql(sql)
+    entrada = {
+        "criado_em": timezone.now(),
+        "impressao_digital": impressao_digital(normalizado),
+        "sql": normalizado,
+        "parametros": json.dumps(ocultar(params), default=str, ensure_ascii=False)[:2000],
+        "duracao_ms": round(duracao, 2),
+        "origem": _origem()[:200],
+        "pilha": _pilha(),
+        "plano": "",
+    }
+    recentes.append(entrada)
+    _local.pendentes = getattr(_local, "pendentes", []) + [(entrada, conexao.alias, sql, params)]
+    logger.warning("Consulta lenta (%.0f ms) em %s: %s", duracao, entrada["origem"] or "?", normalizado[:300])
+
+
+def gravar_pendentes():
+    """Captura o EXPLAIN e grava as consultas lentas anotadas nesta thread."""
+    from .models import ConsultaLenta
+
+    pendentes, _local.pendentes = getattr(_local, "pendentes", []), []
+    if not pendentes:
+        return
+    _local.registrando = True
+    try:
+        for entrada, alias, sql, params in pendentes:
+            conexao = connections[alias]
+            if conexao.needs_rollback:
+                # Transação já condenada: fica só no buffer e no log
+                continue
+            entrada["plano"] = _explain(conexao, sql, params)
+            try:
+                with transaction.atomic(using=alias):
+                    registro = ConsultaLenta.objects.using(alias).create(**entrada)
+                    ConsultaLenta.objects.using(alias).filter(pk__lte=registro.pk - settings.SQL_LENTO_MAXIMO).delete()
+            except DatabaseError:
+                # Ex.: tabela ainda não criada (migrate)
+                pass
+    finally:
+        _local.registrando = False
+
+
+def _pode_gravar():
+    # Numa requisição a gravação fica para request_finished. Dentro de uma transação do chamador
+    # o EXPLAIN e o INSERT entrariam nela (e voltariam junto com ela): espera ela terminar.
+    if getattr(_local, "em_requisicao", False):
+        return False
+    return not any(connections[alias].in_atomic_block for _, alias, _, _ in _local.pendentes)
+
+
+def medir(execute, sql, params, many, context):
+    if getattr(_local, "registrando", False):
+        # Consultas do próprio registro (EXPLAIN, INSERT) não são medidas
+        return execute(sql, params, many, context)
+    if getattr(_local, "pendentes", None) and _pode_gravar():
+        # Fora de uma requisição (comandos, workers) grava antes do próximo comando SQL
+        gravar_pendentes()
+    inicio = time.perf_counter()
+    resultado = execute(sql, params, many, context)
+    duracao = (time.perf_counter() - inicio) * 1000
+    if duracao >= settings.SQL_LENTO_MS:
+        _anotar(context["connection"], sql, None if many else params, duracao)
+    return resultado
+
+
+# Comandos: a última consulta lenta não tem "próximo comando SQL" que a grave
+atexit.register(gravar_pendentes)
+
+
+@receiver(request_started)
+def iniciar_requisicao(sender, **kwargs):
+    _local.em_requisicao = True
+
+
+@receiver(request_finished)
+def encerrar_requisicao(sender, **kwargs):
+    _local.em_requisicao = False
+    if getattr(_local, "pendentes", None):
+        gravar_pendentes()
+        # O close_old_connections do Django roda antes deste receiver: sem isto a conexão
+        # reaberta para gravar ficaria aberta além de CONN_MAX_AGE
+        close_old_connections()
+
+
+@receiver(connection_created)
+def instalar(sender, connection, **kwargs):
+    if settings.SQL_LENTO_MS and medir not in connection.execute_wrappers:
+        connection.execute_wrappers.append(medir)
+
+
+class ConsultasLentasMiddleware:
+    """Marca as consultas com a view que as originou (a gravação é feita em request_finished)."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = origem_atual.set(request.path)
+        try:
+            return self.get_response(request)
+        finally:
+            origem_atual.reset(token)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        correspondencia = request.resolver_match
+        origem_atual.set(correspondencia.view_name if correspondencia and correspondencia.view_name else request.path)
+
+
+def ranking(desde, limite=50):
+    """Impressões digitais ordenadas pelo tempo total, com o registro mais recente de cada uma."""
+    from .models import ConsultaLenta
+
+    grupos = list(
+        ConsultaLenta.objects.filter(criado_em__gte=desde)
+        .values("impressao_digital")
+        .annotate(
+            execucoes=Count("id"), total_ms=Sum("duracao_ms"), media_ms=Avg("duracao_ms"),
+            maximo_ms=Max("duracao_ms"), ultima=Max("criado_em"), ultimo_id=Max("id"),
+        )
+        .order_by("-total_ms")[:limite]
+    )
+    exemplos = ConsultaLenta.objects.in_bulk([grupo["ultimo_id"] for grupo in grupos])
+    for grupo in grupos:
+        grupo["exemplo"] = exemplos[grupo["ultimo_id"]]
+    return grupos
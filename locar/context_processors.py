@@ -0,0 +1,27 @@
+from pathlib import Path
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+
+STATIC_DIR = Path(__file__).resolve().parent / "static"
+# Pacote local gerado pelo manage.py build_assets (Tailwind compilado + Alpine/Chart.js)
+ARQUIVOS = ["locar/css/app.css", "locar/vendor/alpine.min.js", "locar/vendor/chart.umd.min.js"]
+
+
+def _no_manifesto():
+    # O mesmo manifesto que o {% static %} consulta (carregado quando o processo sobe): um arquivo
+    # fora dele faria o {% static %} levantar ValueError
+    nomes = getattr(staticfiles_storage, "hashed_files", None)
+    if nomes is None:
+        # Armazenamento sem manifesto: basta o arquivo estar em STATIC_ROOT
+        return all(staticfiles_storage.exists(arquivo) for arquivo in ARQUIVOS)
+    return all(arquivo in nomes for arquivo in ARQUIVOS)
+
+
+def assets(request):
+    # Usa o pacote local quando ele está completo (um build_assets interrompido deixaria páginas
+    # sem scripts); fora do DEBUG, quando todos os arquivos estão no manifesto do collectstatic.
+    if settings.DEBUG:
+        locais = all((STATIC_DIR / arquivo).exists() for arquivo in ARQUIVOS)
+    else:
+        locais = _no_manifesto()
+    return {"assets_locais": locais}
@@ -0,0 +1,116 @@
+from collections import defaultdict
+from datetime import timedelta
+from django.db.models import Sum
+from .models import Cliente, Veiculo, Locacao, Despesa
+
+# Cálculos do dashboard, separados por widget para que cada parte seja servida
+# (e cacheada) pelo seu próprio endpoint.
+
+DIAS_SEMANA = {
+    0: "Segunda-feira",
+    1: "Terça-feira",
+    2: "Quarta-feira",
+    3: "Quinta-feira",
+    4: "Sexta-feira",
+    5: "Sábado",
+    6: "Domingo",
+}
+
+
+def locacoes_no_periodo(data_inicio, data_fim):
+    locacoes_qs = Locacao.objects.select_related("cliente", "veiculo").filter(
+        inicio__date__lte=data_fim
+    ).filter(
+        fim__date__gte=data_inicio
+    ) | Locacao.objects.filter(status="andamento")
+
+    locacoes_qs = locacoes_qs.distinct()
+
+    locacoes = []
+    for loc in locacoes_qs:
+        inicio_date = loc.inicio.date() if hasattr(loc.inicio, "date") else loc.inicio
+        duracao_dias = (loc.quantidade_semanas or 0) * 7
+        fim_estimado = inicio_date + timedelta(days=max(duracao_dias - 1, 0))
+
+        fim_real = getattr(loc, "fim", None)
+        if fim_real:
+            fim_date = fim_real.date() if hasattr(fim_real, "date") else fim_real
+        else:
+            fim_date = fim_estimado
+
+        if fim_date >= data_inicio and inicio_date <= data_fim:
+            locacoes.append(loc)
+    return locacoes
+
+
+def resumo_financeiro(locacoes, data_inicio, data_fim):
+    total_receber = 0
+    total_pago = 0
+    total_saldo = 0
+
+    for loc in locacoes:
+        parcela = loc.valor_total_locacao / loc.quantidade_semanas if loc.quantidade_semanas > 0 else 0
+        # 🔹 Se o caução foi devolvido, não soma ao total_pago
+        caucao_valor = loc.caucao if getattr(loc, "caucao_status", "retido") == "retido" else 0
+
+        pago = loc.semanas_pagas * parcela + caucao_valor
+        saldo = loc.valor_total_locacao - pago
+
+        total_receber += loc.valor_total_locacao
+        total_pago += pago
+        total_saldo += saldo
+
+    despesas = Despesa.objects.filter(data__range=[data_inicio, data_fim])
+    total_despesas = despesas.aggregate(total=Sum("valor"))["total"] or 0
+    lucro_liquido = total_pago - total_despesas
+
+    return {
+        "total_receber": total_receber,
+        "total_pago": total_pago,
+        "saldo_a_receber": total_saldo,
+        "total_despesas": total_despesas,
+        "lucro_liquido": lucro_liquido,
+    }
+
+
+def indicadores_frota(locacoes):
+    return {
+        "total_veiculos": Veiculo.objects.count(),
+        "veiculos_alugados": Veiculo.objects.filter(status="alugado").count(),
+        "locacoes_ativas": len(locacoes),
+        "total_clientes": Cliente.objects.count(),
+    }
+
+
+def pagamentos_por_dia(locacoes, hoje):
+    agrupado = defaultdict(list)
+
+    for loc in locacoes:
+        dia_semana = loc.inicio.weekday()
+        parcela = loc.valor_total_locacao / loc.quantidade_semanas if loc.quantidade_semanas > 0 else 0
+        proximo_pagamento = (
+            (loc.inicio.date() if hasattr(loc.inicio, "date") else loc.inicio)
+            + timedelta(days=(loc.semanas_pagas + 1) * 7)
+        )
+
+        caucao_valor = loc.caucao if getattr(loc, "caucao_status", "retido") == "retido" else 0
+
+        if proximo_pagamento <= hoje:
+            status = "vencido"
+        elif proximo_pagamento <= hoje + timedelta(days=3):
+            status = "proximo"
+        else:
+            status = "ok"
+
+        agrupado[DIAS_SEMANA[dia_semana]].append({
+            "locacao": loc,
+            "cliente": loc.cliente.nome,
+            "veiculo": loc.veiculo.modelo,
+            "proximo_pagamento": proximo_pagamento,
+            "status": status,
+            "parcela": parcela,
+            "semanas_pagas": loc.semanas_pagas,
+            "semanas_restantes": loc.quantidade_semanas - loc.semanas_pagas,
+            "valor_recebido": (loc.semanas_pagas * parcela) + caucao_valor,
+        })
+    return dict(agrupado)
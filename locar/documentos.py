@@ -0,0 +1,125 @@
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+from django.conf import settings
+from django.core import signing
+from django.core.exceptions import PermissionDenied
+from django.core.files.storage import default_storage
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.utils.http import content_disposition_header
+from .models import Cliente, Veiculo, Locacao, LocacaoArquivada, Despesa
+
+# Arquivos enviados pelos usuários só saem por links assinados e de curta duração.
+# Em produção o Python apenas autoriza: a transferência fica com o nginx (X-Accel-Redirect)
+# ou Apache (X-Sendfile); sem eles, FileResponse em blocos com suporte a Range.
+
+# Campos de arquivo que podem ser servidos, por modelo
+DOCUMENTOS = {
+    model._meta.model_name: (model, campos)
+    for model, campos in (
+        (Cliente, ("documento_com_foto",)),
+        (Veiculo, ("documento_veiculo", "foto_veiculo")),
+        (Locacao, ("documentos_locacao",)),
+        (LocacaoArquivada, ("documentos_locacao",)),
+        (Despesa, ("comprovante",)),
+    )
+}
+
+SALT = "locar.documentos"
+BLOCO = 64 * 1024
+
+
+def url_documento(obj, campo, usuario):
+    """Link assinado para o arquivo `campo` de `obj`, válido por DOCUMENTOS_URL_VALIDADE segundos
+    e só para `usuario`. Levanta PermissionDenied para visitante anônimo."""
+    if usuario is None or not usuario.is_authenticated:
+        raise PermissionDenied("Links de documento só são emitidos para usuários autenticados.")
+    token = signing.TimestampSigner(salt=SALT).sign_object({
+        "m": obj._meta.model_name,
+        "pk": obj.pk,
+        "c": campo,
+        "u": usuario.pk,
+    })
+    return reverse("documento", args=[token])
+
+
+def abrir_token(token):
+    """Valida o token e devolve (modelo, pk, campo, usuario_pk). Levanta signing.BadSignature."""
+    dados = signing.TimestampSigner(salt=SALT).unsign_object(token, max_age=settings.DOCUMENTOS_URL_VALIDADE)
+    if dados.get("m") not in DOCUMENTOS or dados.get("c") not in DOCUMENTOS[dados["m"]][1]:
+        raise signing.BadSignature("Documento não permitido.")
+    return DOCUMENTOS[dados["m"]][0], dados["pk"], dados["c"], dados["u"]
+
+
+def _intervalo(cabecalho, tamanho):
+    """(inicio, fim) do cabeçalho Range; None para enviar o arquivo inteiro, False se impossível."""
+    if not cabecalho:
+        return None
+    encontrado = re.fullmatch(r"bytes=(\d*)-(\d*)", cabecalho.strip())
+    # Múltiplos intervalos ou formato desconhecido: a RFC permite responder com o arquivo inteiro
+    if not encontrado or encontrado.groups() == ("", ""):
+        return None
+    inicio, fim = encontrado.groups()
+    if inicio == "":
+        inicio, fim = max(tamanho - int(fim), 0), tamanho - 1
+    else:
+        inicio, fim = int(inicio), min(int(fim), tamanho - 1) if fim else tamanho - 1
+    if inicio >= tamanho or inicio > fim:
+        return False
+    return inicio, fim
+
+
+def _ler_blocos(caminho, inicio, restante):
+    with open(caminho, "rb") as arquivo:
+        arquivo.seek(inicio)
+        while restante > 0:
+            bloco = arquivo.read(min(BLOCO, restante))
+            if not bloco:
+                break
+            restante -= len(bloco)
+            yield bloco
+
+
+def _resposta_python(request, caminho, tipo):
+    tamanho = os.path.getsize(caminho)
+    intervalo = _intervalo(request.headers.get("Range"), tamanho)
+    if intervalo is None:
+        response = FileResponse(open(caminho, "rb"), content_type=tipo)
+    elif intervalo is False:
+        response = HttpResponse(status=416)
+        response["Content-Range"] = f"bytes */{tamanho}"
+    else:
+        inicio, fim = intervalo
+        response = StreamingHttpResponse(_ler_blocos(caminho, inicio, fim - inicio + 1), status=206, content_type=tipo)
+        response["Content-Length"] = str(fim - inicio + 1)
+        response["Content-Range"] = f"bytes {inicio}-{fim}/{tamanho}"
+    response["Accept-Ranges"] = "bytes"
+    return response
+
+
+def resposta_arquivo(request, nome, storage=default_storage, nome_download=None):
+    """Resposta para um arquivo já autorizado (nome relativo ao storage), conforme settings.DOCUMENTOS_ENVIO."""
+    nome_download = nome_download or os.path.basename(nome)
+    tipo = mimetypes.guess_type(nome_download)[0] or "application/octet-stream"
+    envio = settings.DOCUMENTOS_ENVIO
+
+    if envio == "x-accel-redirect":
+        # nginx: location <DOCUMENTOS_URL_INTERNA> { internal; alias <MEDIA_ROOT>/; }
+        response = HttpResponse(content_type=tipo)
+        response["X-Accel-Redirect"] = settings.DOCUMENTOS_URL_INTERNA + quote(nome)
+    elif envio == "x-sendfile":
+        response = HttpResponse(content_type=tipo)
+        response["X-Sendfile"] = storage.path(nome)
+    else:
+        response = _resposta_python(request, storage.path(nome), tipo)
+
+    response["Content-Disposition"] = content_disposition_header(False, nome_download)
+    response["Cache-Control"] = f"private, max-age={settings.DOCUMENTOS_URL_VALIDADE}"
+    response["X-Content-Type-Options"] = "nosniff"
+    return response
+
+
+def resposta_documento(request, arquivo):
+    return resposta_arquivo(request, arquivo.name, arquivo.storage)
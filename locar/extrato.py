@@ -0,0 +1,161 @@
+from datetime import timezone as tz
+from decimal import Decimal
+from django.core.cache import cache
+from django.db import connection
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from .models import Locacao, Pagamento
+from .versoes import chave_versoes
+
+# Extrato do cliente: locações (ativas e arquivadas), parcelas semanais e pagamentos em ordem
+# cronológica, com saldo e total pago acumulados. Tudo sai de uma consulta: as parcelas são
+# geradas por uma CTE recursiva, os acumulados e os totais são funções de janela (SUM() OVER)
+# e a paginação é LIMIT/OFFSET sobre o resultado já acumulado. O ORM não aplica Window() sobre
+# um UNION, então a consulta é SQL; só a aritmética de datas muda entre SQLite e PostgreSQL.
+# Cada página fica em cache com as versões (VersaoTabela) de locação e pagamento na chave: vale
+# para todos os processos, e qualquer gravação nessas tabelas (inclusive o arquivamento) a renova.
+
+POR_PAGINA = 50
+EXTRATO_CACHE_TIMEOUT = 60 * 60 * 24
+
+COLUNAS_LOCACAO = "id, inicio, valor_semanal, quantidade_semanas, semanas_pagas, caucao, caucao_status"
+
+SQL_EXTRATO = """
+WITH RECURSIVE
+loc AS (
+    SELECT {colunas} FROM locar_locacao WHERE cliente_id = %(cliente)s
+    UNION ALL
+    SELECT {colunas} FROM locar_locacaoarquivada WHERE cliente_id = %(cliente)s
+),
+parcela (locacao_id, numero) AS (
+    SELECT id, 1 FROM loc WHERE quantidade_semanas > 0
+    UNION ALL
+    SELECT parcela.locacao_id, parcela.numero + 1
+    FROM parcela JOIN loc ON loc.id = parcela.locacao_id
+    WHERE parcela.numero < loc.quantidade_semanas
+),
+movimento AS (
+    SELECT loc.inicio AS data, 0 AS ordem, 'locacao' AS tipo, loc.id AS locacao_id, 0 AS numero,
+           0 AS debito, 0 AS credito, loc.caucao AS caucao,
+           CASE WHEN loc.caucao_status = 'pendente' THEN loc.caucao ELSE 0 END AS caucao_retida, 0 AS pago
+    FROM loc
+    UNION ALL
+    SELECT {vencimento}, 1, 'parcela', loc.id, parcela.numero,
+           loc.valor_semanal, 0, 0, 0, CASE WHEN parcela.numero <= loc.semanas_pagas THEN 1 ELSE 0 END
+    FROM parcela JOIN loc ON loc.id = parcela.locacao_id
+    UNION ALL
+    SELECT p.data, 2, 'pagamento', p.locacao_id, 0, 0, p.valor, 0, 0, 0
+    FROM locar_pagamento p JOIN loc ON loc.id = p.locacao_id
+    UNION ALL
+    SELECT p.data, 2, 'pagamento', p.locacao_id, 0, 0, p.valor, 0, 0, 0
+    FROM locar_pagamentoarquivado p JOIN loc ON loc.id = p.locacao_id
+)
+SELECT data, tipo, locacao_id, numero, debito, credito, caucao, pago,
+       SUM(debito - credito) OVER acumulado AS saldo,
+       SUM(credito) OVER acumulado AS total_pago,
+       COUNT(*) OVER () AS linhas,
+       SUM(CASE WHEN data <= %(agora)s THEN debito ELSE 0 END) OVER () AS devido,
+       SUM(credito) OVER () AS pago_total,
+       SUM(caucao_retida) OVER () AS caucao_retida,
+       SUM(CASE WHEN tipo = 'parcela' AND pago = 0 AND data < %(agora)s THEN debito ELSE 0 END) OVER () AS em_atraso,
+       MIN(CASE WHEN tipo = 'parcela' AND pago = 0 AND data < %(agora)s THEN data END) OVER () AS atraso_desde
+FROM movimento
+WINDOW acumulado AS (ORDER BY data, ordem, locacao_id, numero ROWS UNBOUNDED PRECEDING)
+ORDER BY data, ordem, locacao_id, numero
+"""
+
+# Vencimento da parcela n: n semanas depois do dia de início (como Locacao.calcular_proximo_vencimento)
+VENCIMENTO = {
+    "postgresql": "date_trunc('day', loc.inicio) + parcela.numero * interval '7 days'",
+    "sqlite": "datetime(date(loc.inicio), '+' || (parcela.numero * 7) || ' days')",
+}
+
+
+def _data(valor):
+    # SQLite devolve texto para colunas calculadas
+    if isinstance(valor, str):
+        valor = parse_datetime(valor)
+    if valor is not None and timezone.is_naive(valor):
+        valor = valor.replace(tzinfo=tz.utc)
+    return valor
+
+
+def _valor(valor):
+    return Decimal(str(valor or 0)).quantize(Decimal("0.01"))
+
+
+def _consultar(cliente_id, limite=None, deslocamento=0):
+    agora = timezone.now()
+    sql = SQL_EXTRATO.format(colunas=COLUNAS_LOCACAO, vencimento=VENCIMENTO.get(connection.vendor, VENCIMENTO["sqlite"]))
+    parametros = {"cliente": cliente_id, "agora": connection.ops.adapt_datetimefield_value(agora)}
+    if limite is not None:
+        sql += " LIMIT %(limite)s OFFSET %(deslocamento)s"
+        parametros.update(limite=limite, deslocamento=deslocamento)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, parametros)
+        colunas = [coluna[0] for coluna in cursor.description]
+        registros = [dict(zip(colunas, registro)) for registro in cursor.fetchall()]
+
+    linhas = []
+    for registro in registros:
+        data = _data(registro["data"])
+        pago = bool(registro["pago"])
+        atrasada = registro["tipo"] == "parcela" and not pago and data < agora
+        linhas.append({
+            "data": data,
+            "tipo": registro["tipo"],
+            "locacao_id": registro["locacao_id"],
+            "numero": registro["numero"],
+            "debito": _valor(registro["debito"]),
+            "credito": _valor(registro["credito"]),
+            "caucao": _valor(registro["caucao"]),
+            "pago": pago,
+            "dias_atraso": (agora.date() - data.date()).days if atrasada else 0,
+            "saldo": _valor(registro["saldo"]),
+            "total_pago": _valor(registro["total_pago"]),
+        })
+
+    resumo = None
+    if registros:
+        primeiro = registros[0]
+        atraso_desde = _data(primeiro["atraso_desde"])
+        resumo = {
+            "linhas": primeiro["linhas"],
+            "devido": _valor(primeiro["devido"]),
+            "pago": _valor(primeiro["pago_total"]),
+            "saldo": _valor(primeiro["devido"]) - _valor(primeiro["pago_total"]),
+            "caucao_retida": _valor(primeiro["caucao_retida"]),
+            "em_atraso": _valor(primeiro["em_atraso"]),
+            "dias_atraso": (agora.date() - atraso_desde.date()).days if atraso_desde else 0,
+        }
+    return linhas, resumo
+
+
+# ----------------------------- CACHE -----------------------------------------
+def extrato_cliente(cliente_id, pagina=1):
+    """Página do extrato: {"linhas", "resumo", "pagina", "paginas"} (resumo None sem movimento)."""
+    # Versões lidas do banco, não de um contador no cache: o LocMem é por processo e um contador
+    # incrementado num worker não chegaria aos outros. A data entra na chave: parcelas vencem na
+    # virada do dia
+    versao = chave_versoes(Locacao, Pagamento)
+    chave = f"extrato:{cliente_id}:{versao}:{timezone.localdate()}:{pagina}"
+    extrato = cache.get(chave)
+    if extrato is None:
+        linhas, resumo = _consultar(cliente_id, POR_PAGINA, (pagina - 1) * POR_PAGINA)
+        if not linhas and pagina > 1:
+            # Página além do fim
+            return extrato_cliente(cliente_id, 1)
+        total = resumo["linhas"] if resumo else 0
+        extrato = {
+            "linhas": linhas,
+            "resumo": resumo,
+            "pagina": pagina,
+            "paginas": max(1, -(-total // POR_PAGINA)),
+        }
+        cache.set(chave, extrato, EXTRATO_CACHE_TIMEOUT)
+    return extrato
+
+
+def extrato_completo(cliente_id):
+    """Todas as linhas (exportação), sem cache."""
+    return _consultar(cliente_id)
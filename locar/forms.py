@@ -1,5 +1,6 @@
 from django import forms
 from .models import Cliente, Veiculo, Locacao, Despesa
+from .normalizacao import normalizar_placa, so_digitos
 
 class ClienteForm(forms.ModelForm):
     class Meta:
@@ -16,6 +17,23 @@ class ClienteForm(forms.ModelForm):
             'observacao': forms.Textarea(attrs={'placeholder': 'Informações Adicionais'}),
             'cnh_validade': forms.DateInput(format='%Y-%m-%d', attrs={'type': 'date'}),
         }
+
+    # Duplicidade pelos dígitos: "123.456.789-00" e "12345678900" são o mesmo cliente.
+    # Consulta exata na coluna normalizada (índice), não uma varredura da tabela.
+    def _ja_cadastrado(self, campo, valor):
+        return valor and Cliente.objects.filter(**{campo: valor}).exclude(pk=self.instance.pk).exists()
+
+    def clean_cpf(self):
+        cpf = self.cleaned_data["cpf"]
+        if self._ja_cadastrado("cpf_normalizado", so_digitos(cpf)):
+            raise forms.ValidationError("Já existe um cliente cadastrado com este CPF.")
+        return cpf
+
+    def clean_cnh_numero(self):
+        cnh = self.cleaned_data["cnh_numero"]
+        if self._ja_cadastrado("cnh_normalizada", so_digitos(cnh)):
+            raise forms.ValidationError("Já existe um cliente cadastrado com esta CNH.")
+        return cnh
     
 
 class VeiculoForm(forms.ModelForm):
@@ -23,6 +41,12 @@ class VeiculoForm(forms.ModelForm):
         model = Veiculo
         fields = "__all__"
 
+    def clean_placa(self):
+        placa = self.cleaned_data["placa"]
+        if Veiculo.objects.filter(placa_normalizada=normalizar_placa(placa)).exclude(pk=self.instance.pk).exists():
+            raise forms.ValidationError("Já existe um veículo cadastrado com esta placa.")
+        return placa
+
 class LocacaoForm(forms.ModelForm):
     class Meta:
         model = Locacao
@@ -0,0 +1,253 @@
+import json
+import logging
+import time
+import urllib.error
+import urllib.request
+import uuid
+from collections import Counter, defaultdict
+from datetime import timedelta
+from smtplib import SMTPException, SMTPRecipientsRefused, SMTPSenderRefused, SMTPServerDisconnected
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db.models import Case, CharField, Exists, F, OuterRef, Value, When
+from django.template.loader import render_to_string
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from .models import Locacao, LembreteEnviado
+
+# Lembretes de parcelas a vencer/vencidas: uma consulta (índice status + proximo_vencimento),
+# agrupamento por cliente, uma mensagem por cliente e envio por um canal plugável
+# (settings.LEMBRETES_CANAIS) com limite de taxa e novas tentativas.
+
+logger = logging.getLogger(__name__)
+
+ASSUNTO = "Lembrete de pagamento — Locadora"
+
+
+class ErroPermanente(Exception):
+    """Falha que não adianta repetir (destinatário recusado, número inválido...)."""
+
+
+# ----------------------------- CANAIS -----------------------------------------
+class Canal:
+    nome = None
+    # Campo do cliente com o endereço/número de destino
+    campo_destino = None
+    # Exceções que justificam nova tentativa
+    erros_temporarios = ()
+
+    def abrir(self):
+        pass
+
+    def fechar(self):
+        pass
+
+    def enviar(self, destino, assunto, corpo):
+        raise NotImplementedError
+
+
+class CanalEmail(Canal):
+    """E-mail por uma única conexão SMTP reaproveitada em todo o lote."""
+    nome = "email"
+    campo_destino = "email"
+    erros_temporarios = (SMTPException, OSError)
+
+    def abrir(self):
+        self.conexao = get_connection(fail_silently=False)
+        self.conexao.open()
+
+    def fechar(self):
+        self.conexao.close()
+
+    def enviar(self, destino, assunto, corpo):
+        mensagem = EmailMessage(assunto, corpo, settings.DEFAULT_FROM_EMAIL, [destino], connection=self.conexao)
+        try:
+            mensagem.send()
+        except (SMTPRecipientsRefused, SMTPSenderRefused) as exc:
+            raise ErroPermanente(str(exc)) from exc
+        except SMTPServerDisconnected:
+            # Reabre a conexão para a próxima tentativa continuar no mesmo "pool"
+            self.conexao.close()
+            try:
+                self.conexao.open()
+            except OSError:
+                pass
+            raise
+
+
+class CanalHttp(Canal):
+    """Gateway HTTP genérico (WhatsApp/SMS): POST JSON {"destino", "mensagem"} com token Bearer.
+
+    URL e token vêm de settings.LEMBRETES_GATEWAYS[nome].
+    """
+    campo_destino = "telefone"
+    erros_temporarios = (urllib.error.URLError, TimeoutError, ConnectionError)
+
+    def abrir(self):
+        self.config = settings.LEMBRETES_GATEWAYS[self.nome]
+        if not self.config.get("url"):
+            raise ValueError(f"Gateway '{self.nome}' sem URL configurada (LEMBRETES_GATEWAYS).")
+
+    def enviar(self, destino, assunto, corpo):
+        requisicao = urllib.request.Request(
+            self.config["url"],
+            data=json.dumps({"destino": destino, "mensagem": corpo}).encode(),
+            headers={"Content-Type": "application/json", "Authorization": f"Bearer {self.config.get('token', '')}"},
+            method="POST",
+        )
+        try:
+            with urllib.request.urlopen(requisicao, timeout=10):
+                pass
+        except urllib.error.HTTPError as exc:
+            # 4xx (exceto 429) é erro do pedido: repetir não resolve
+            if 400 <= exc.code < 500 and exc.code != 429:
+                raise ErroPermanente(f"HTTP {exc.code}") from exc
+            raise
+
+
+class CanalWhatsApp(CanalHttp):
+    nome = "whatsapp"
+
+
+class CanalSms(CanalHttp):
+    nome = "sms"
+
+
+class LimiteTaxa:
+    """No máximo `por_segundo` envios por segundo (0 = sem limite)."""
+
+    def __init__(self, por_segundo):
+        self.intervalo = 1 / por_segundo if por_segundo else 0
+        self.proximo = 0.0
+
+    def aguardar(self):
+        agora = time.monotonic()
+        if agora < self.proximo:
+            time.sleep(self.proximo - agora)
+            agora = self.proximo
+        self.proximo = agora + self.intervalo
+
+
+# ----------------------------- SELEÇÃO E AGRUPAMENTO -----------------------------------------
+def parcelas_pendentes(canal, hoje, dias_antes):
+    """Parcelas vencidas ou que vencem em até `dias_antes` dias ainda sem lembrete por este canal."""
+    tipo = Case(
+        When(proximo_vencimento__lte=hoje, then=Value("vencido")),
+        default=Value("proximo"),
+        output_field=CharField(),
+    )
+    ja_lembrado = LembreteEnviado.objects.filter(
+        locacao=OuterRef("pk"), vencimento=OuterRef("proximo_vencimento"), tipo=OuterRef("tipo"), canal=canal.nome,
+    ).exclude(status="erro")
+    return (
+        Locacao.objects
+        .filter(status="andamento", proximo_vencimento__lte=hoje + timedelta(days=dias_antes))
+        .annotate(tipo=tipo)
+        .filter(~Exists(ja_lembrado))
+        .order_by("cliente_id", "proximo_vencimento")
+        .values(
+            "id", "cliente_id", "proximo_vencimento", "tipo", "valor_semanal", "semanas_pagas", "quantidade_semanas",
+            nome=F("cliente__nome"), destino=F(f"cliente__{canal.campo_destino}"),
+            modelo=F("veiculo__modelo"), placa=F("veiculo__placa"),
+        )
+    )
+
+
+def agrupar_por_cliente(parcelas):
+    grupos = {}
+    for parcela in parcelas:
+        grupo = grupos.setdefault(parcela["cliente_id"], {
+            "cliente_id": parcela["cliente_id"],
+            "nome": parcela["nome"],
+            "destino": (parcela["destino"] or "").strip(),
+            "parcelas": [],
+        })
+        grupo["parcelas"].append(parcela)
+    return list(grupos.values())
+
+
+# ----------------------------- ENVIO -----------------------------------------
+def _enviar_com_retentativas(canal, limite, destino, corpo, tentativas):
+    """Devolve (erro ou None, tentativas usadas)."""
+    erro = None
+    for tentativa in range(1, tentativas + 1):
+        limite.aguardar()
+        try:
+            canal.enviar(destino, ASSUNTO, corpo)
+            return None, tentativa
+        except ErroPermanente as exc:
+            return str(exc), tentativa
+        except canal.erros_temporarios as exc:
+            erro = str(exc) or type(exc).__name__
+            logger.warning("Falha ao enviar lembrete para %s (tentativa %s): %s", destino, tentativa, erro)
+            if tentativa < tentativas:
+                time.sleep(settings.LEMBRETES_ESPERA_RETENTATIVA * 2 ** (tentativa - 1))
+    return erro, tentativas
+
+
+def enviar_lembretes(canal_nome="email", hoje=None, dias_antes=None, por_segundo=None, tentativas=3,
+                     clientes_por_lote=500, simular=False):
+    """Envia os lembretes pendentes e devolve um Counter com o resumo da execução."""
+    canal = import_string(settings.LEMBRETES_CANAIS[canal_nome])()
+    hoje = hoje or timezone.localdate()
+    dias_antes = settings.LEMBRETES_DIAS_ANTES if dias_antes is None else dias_antes
+    limite = LimiteTaxa(settings.LEMBRETES_POR_SEGUNDO if por_segundo is None else por_segundo)
+
+    grupos = agrupar_por_cliente(parcelas_pendentes(canal, hoje, dias_antes))
+    resumo = Counter(clientes=len(grupos), parcelas=sum(len(g["parcelas"]) for g in grupos))
+    if simular or not grupos:
+        return resumo
+
+    canal.abrir()
+    try:
+        for inicio in range(0, len(grupos), clientes_por_lote):
+            _enviar_bloco(canal, limite, grupos[inicio:inicio + clientes_por_lote], hoje, tentativas, resumo)
+    finally:
+        canal.fechar()
+    return resumo
+
+
+def _enviar_bloco(canal, limite, grupos, hoje, tentativas, resumo):
+    lote = uuid.uuid4()
+    # Reserva as parcelas antes de enviar: outra execução simultânea (ou uma repetição depois
+    # de uma queda) não manda o mesmo lembrete de novo
+    LembreteEnviado.objects.bulk_create(
+        [
+            LembreteEnviado(
+                locacao_id=parcela["id"], cliente_id=grupo["cliente_id"], vencimento=parcela["proximo_vencimento"],
+                tipo=parcela["tipo"], canal=canal.nome, destino=grupo["destino"], lote=lote,
+            )
+            for grupo in grupos if grupo["destino"]
+            for parcela in grupo["parcelas"]
+        ],
+        ignore_conflicts=True,
+    )
+    reservadas = set(LembreteEnviado.objects.filter(lote=lote).values_list("locacao_id", "vencimento", "tipo"))
+
+    enviados = defaultdict(list)
+    for grupo in grupos:
+        if not grupo["destino"]:
+            resumo["sem_contato"] += 1
+            continue
+        parcelas = [p for p in grupo["parcelas"] if (p["id"], p["proximo_vencimento"], p["tipo"]) in reservadas]
+        if not parcelas:
+            resumo["ja_reservados"] += 1
+            continue
+
+        corpo = render_to_string("lembretes/mensagem.txt", {"nome": grupo["nome"], "parcelas": parcelas, "hoje": hoje})
+        erro, usadas = _enviar_com_retentativas(canal, limite, grupo["destino"], corpo, tentativas)
+        locacoes = [p["id"] for p in parcelas]
+        if erro is None:
+            enviados[usadas].extend(locacoes)
+            resumo["enviados"] += 1
+        else:
+            LembreteEnviado.objects.filter(lote=lote, locacao_id__in=locacoes).update(
+                status="erro", erro=erro, tentativas=usadas
+            )
+            resumo["erros"] += 1
+
+    agora = timezone.now()
+    for usadas, locacoes in enviados.items():
+        LembreteEnviado.objects.filter(lote=lote, locacao_id__in=locacoes).update(
+            status="enviado", enviado_em=agora, tentativas=usadas
+        )
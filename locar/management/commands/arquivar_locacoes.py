@@ -0,0 +1,42 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from locar.arquivo import arquivar_locacoes, candidatas_arquivamento, restaurar_locacoes
+
+
+class Command(BaseCommand):
+    help = (
+        "Move locações encerradas há mais de N dias (e seus pagamentos) para as tabelas de arquivo, "
+        "em lotes. Pensado para rodar agendado (cron/systemd), ex.: 0 3 * * * manage.py arquivar_locacoes"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dias", type=int, default=getattr(settings, "ARQUIVAMENTO_DIAS", 365))
+        parser.add_argument("--lote", type=int, default=500)
+        parser.add_argument("--simular", action="store_true", help="Apenas conta as locações elegíveis.")
+        parser.add_argument("--restaurar", type=int, nargs="+", metavar="ID", help="Restaura locações arquivadas.")
+
+    def handle(self, *args, **options):
+        if options["restaurar"]:
+            locacoes, pagamentos = restaurar_locacoes(options["restaurar"])
+            self.stdout.write(self.style.SUCCESS(f"{locacoes} locação(ões) e {pagamentos} pagamento(s) restaurados."))
+            return
+
+        candidatas = candidatas_arquivamento(options["dias"])
+        if options["simular"]:
+            self.stdout.write(f"{candidatas.count()} locação(ões) seriam arquivadas.")
+            return
+
+        total_locacoes = total_pagamentos = 0
+        while True:
+            # Cada lote é uma transação curta; o próximo lote é buscado de novo na tabela principal
+            ids = list(candidatas.values_list("id", flat=True)[:options["lote"]])
+            if not ids:
+                break
+            locacoes, pagamentos = arquivar_locacoes(ids)
+            total_locacoes += locacoes
+            total_pagamentos += pagamentos
+            self.stdout.write(f"Lote arquivado: {locacoes} locação(ões), {pagamentos} pagamento(s)")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Arquivamento concluído: {total_locacoes} locação(ões) e {total_pagamentos} pagamento(s)."
+        ))
@@ -0,0 +1,38 @@
+import time
+import numpy as np
+from django.core.management.base import BaseCommand
+from locar.ocupacao import matriz_ocupacao, resumir_ocupacao
+
+
+class Command(BaseCommand):
+    help = "Mede o cálculo vetorizado de ocupação com uma frota sintética (padrão: 5 mil veículos x 3 anos)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--veiculos", type=int, default=5000)
+        parser.add_argument("--dias", type=int, default=3 * 365)
+        parser.add_argument("--locacoes-por-veiculo", type=int, default=20)
+        parser.add_argument("--repeticoes", type=int, default=5)
+
+    def handle(self, *args, **options):
+        n_veiculos, n_dias = options["veiculos"], options["dias"]
+        n_locacoes = n_veiculos * options["locacoes_por_veiculo"]
+        rng = np.random.default_rng(42)
+
+        indices = rng.integers(0, n_veiculos, n_locacoes)
+        inicios = rng.integers(-30, n_dias, n_locacoes)
+        fins = inicios + rng.integers(7, 90, n_locacoes)
+        inicio_ativo = rng.integers(0, n_dias // 2, n_veiculos)
+        grupos = rng.integers(0, 50, n_veiculos)
+
+        tempos = []
+        for _ in range(options["repeticoes"]):
+            t0 = time.perf_counter()
+            ocupado = matriz_ocupacao(indices, inicios, fins, n_veiculos, n_dias)
+            resumo = resumir_ocupacao(ocupado, inicio_ativo, grupos)
+            tempos.append(time.perf_counter() - t0)
+
+        self.stdout.write(
+            f"{n_veiculos} veículos x {n_dias} dias, {n_locacoes} locações: "
+            f"melhor {min(tempos) * 1000:.1f} ms, mediana {np.median(tempos) * 1000:.1f} ms "
+            f"(ocupação média {resumo['por_dia'].mean() * 100:.1f}%)"
+        )
@@ -0,0 +1,61 @@
+import shlex
+import subprocess
+import urllib.request
+from pathlib import Path
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+APP_DIR = Path(__file__).resolve().parents[2]
+STATIC_DIR = APP_DIR / "static" / "locar"
+
+# Versões fixas das bibliotecas que antes vinham do CDN
+VENDOR = {
+    "alpine.min.js": "https://cdn.jsdelivr.net/npm/alpinejs@3.14.9/dist/cdn.min.js",
+    "chart.umd.min.js": "https://cdn.jsdelivr.net/npm/chart.js@4.4.9/dist/chart.umd.min.js",
+}
+
+
+class Command(BaseCommand):
+    help = "Gera o CSS do Tailwind (purgado e minificado), baixa Alpine/Chart.js e opcionalmente roda o collectstatic."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--forcar", action="store_true", help="Baixa novamente os arquivos de vendor.")
+        parser.add_argument("--collectstatic", action="store_true", help="Gera os arquivos com hash e .gz/.br em STATIC_ROOT.")
+
+    def handle(self, *args, **options):
+        self.compilar_css()
+        self.baixar_vendor(options["forcar"])
+        if options["collectstatic"]:
+            call_command("collectstatic", interactive=False, verbosity=1)
+
+    def compilar_css(self):
+        saida = STATIC_DIR / "css" / "app.css"
+        saida.parent.mkdir(parents=True, exist_ok=True)
+        cli = shlex.split(getattr(settings, "TAILWIND_CLI", "npx tailwindcss@3.4.17"))
+        comando = cli + [
+            "-c", str(settings.BASE_DIR / "tailwind.config.js"),
+            "-i", str(APP_DIR / "static_src" / "app.css"),
+            "-o", str(saida),
+            "--minify",
+        ]
+        self.stdout.write(" ".join(comando))
+        try:
+            subprocess.run(comando, check=True, cwd=settings.BASE_DIR)
+        except (OSError, subprocess.CalledProcessError) as erro:
+            raise CommandError(f"Falha ao compilar o Tailwind: {erro}")
+        self.stdout.write(self.style.SUCCESS(f"CSS gerado em {saida} ({saida.stat().st_size} bytes)"))
+
+    def baixar_vendor(self, forcar):
+        destino = STATIC_DIR / "vendor"
+        destino.mkdir(parents=True, exist_ok=True)
+        for nome, url in VENDOR.items():
+            arquivo = destino / nome
+            if arquivo.exists() and not forcar:
+                continue
+            try:
+                with urllib.request.urlopen(url, timeout=30) as resposta:
+                    arquivo.write_bytes(resposta.read())
+            except OSError as erro:
+                raise CommandError(f"Falha ao baixar {url}: {erro}")
+            self.stdout.write(self.style.SUCCESS(f"{nome} salvo em {arquivo}"))
@@ -0,0 +1,71 @@
+import json
+import tempfile
+from pathlib import Path
+from django.core.management.base import BaseCommand
+from django.db.models import Max
+from locar.conciliacao import corrigir, divergencias
+from locar.models import Locacao
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara Locacao.semanas_pagas com a quantidade e a soma dos pagamentos de cada locação, em faixas de id. "
+        "Lista as divergências e, com --corrigir, recalcula o contador. O progresso fica salvo em --checkpoint: "
+        "uma execução interrompida continua de onde parou (use --reiniciar para começar do zero); o relatório e o "
+        "--corrigir têm checkpoints separados."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--lote", type=int, default=5000, help="Tamanho da faixa de ids por consulta.")
+        parser.add_argument("--corrigir", action="store_true")
+        parser.add_argument(
+            "--checkpoint",
+            help="Arquivo com o último id conferido (padrão: conciliar_pagamentos_<modo>.json na pasta temporária).",
+        )
+        parser.add_argument("--reiniciar", action="store_true", help="Ignora o checkpoint salvo.")
+
+    def _ler_checkpoint(self, caminho, modo, reiniciar):
+        if reiniciar or not caminho.exists():
+            return 0
+        salvo = json.loads(caminho.read_text())
+        # Um relatório interrompido não pode fazer o --corrigir pular faixas (nem o contrário)
+        if salvo.get("modo") != modo:
+            self.stdout.write(f"Checkpoint de outro modo ({salvo.get('modo')}) ignorado.")
+            return 0
+        return salvo["ultimo_id"]
+
+    def handle(self, *args, **options):
+        modo = "corrigir" if options["corrigir"] else "relatorio"
+        checkpoint = Path(options["checkpoint"] or Path(tempfile.gettempdir()) / f"conciliar_pagamentos_{modo}.json")
+        ultimo_id = self._ler_checkpoint(checkpoint, modo, options["reiniciar"])
+        if ultimo_id:
+            self.stdout.write(f"Continuando do checkpoint: locações com id > {ultimo_id}")
+        maior_id = Locacao.objects.aggregate(maior=Max("id"))["maior"] or 0
+
+        encontradas = corrigidas = 0
+        while ultimo_id < maior_id:
+            fim_faixa = min(ultimo_id + options["lote"], maior_id)
+            ids = []
+            for linha in divergencias(ultimo_id, fim_faixa):
+                encontradas += 1
+                # Só o contador é corrigido; diferença apenas de valor fica no relatório
+                if linha["semanas_pagas"] != linha["pagamentos_qtd"]:
+                    ids.append(linha["id"])
+                self.stdout.write(
+                    f"Locação {linha['id']}: semanas_pagas={linha['semanas_pagas']}, "
+                    f"pagamentos={linha['pagamentos_qtd']} (R$ {linha['pagamentos_total']:.2f}, "
+                    f"esperado R$ {linha['pagamentos_qtd'] * linha['valor_semanal']:.2f}), "
+                    f"contratadas={linha['quantidade_semanas']}"
+                )
+            if options["corrigir"] and ids:
+                corrigir(ids)
+                corrigidas += len(ids)
+            ultimo_id = fim_faixa
+            # Grava depois de processar a faixa: uma faixa interrompida é conferida de novo
+            checkpoint.write_text(json.dumps({"modo": modo, "ultimo_id": ultimo_id}))
+
+        checkpoint.unlink(missing_ok=True)
+        resumo = f"{encontradas} locação(ões) divergente(s)"
+        if options["corrigir"]:
+            resumo += f", {corrigidas} corrigida(s)"
+        self.stdout.write(self.style.SUCCESS(resumo + "."))
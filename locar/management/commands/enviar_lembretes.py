@@ -0,0 +1,37 @@
+from datetime import date
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from locar.lembretes import enviar_lembretes
+
+
+class Command(BaseCommand):
+    help = (
+        "Envia lembretes das parcelas vencidas ou a vencer, uma mensagem por cliente. "
+        "Pensado para rodar agendado, ex.: 0 9 * * * manage.py enviar_lembretes --canal email"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--canal", default="email", choices=sorted(settings.LEMBRETES_CANAIS))
+        parser.add_argument("--dias-antes", type=int, default=settings.LEMBRETES_DIAS_ANTES)
+        parser.add_argument("--por-segundo", type=float, default=settings.LEMBRETES_POR_SEGUNDO,
+                            help="Limite de mensagens por segundo (0 = sem limite).")
+        parser.add_argument("--tentativas", type=int, default=3)
+        parser.add_argument("--data", help="Data de referência AAAA-MM-DD (padrão: hoje).")
+        parser.add_argument("--simular", action="store_true", help="Só conta clientes e parcelas.")
+
+    def handle(self, *args, **options):
+        try:
+            hoje = date.fromisoformat(options["data"]) if options["data"] else None
+        except ValueError:
+            raise CommandError("Use --data no formato AAAA-MM-DD.")
+
+        resumo = enviar_lembretes(
+            options["canal"], hoje=hoje, dias_antes=options["dias_antes"], por_segundo=options["por_segundo"],
+            tentativas=options["tentativas"], simular=options["simular"],
+        )
+        self.stdout.write(f"{resumo['clientes']} cliente(s), {resumo['parcelas']} parcela(s) a lembrar.")
+        if not options["simular"]:
+            self.stdout.write(self.style.SUCCESS(
+                f"Enviados: {resumo['enviados']} · erros: {resumo['erros']} · "
+                f"sem contato: {resumo['sem_contato']} · já reservados: {resumo['ja_reservados']}"
+            ))
@@ -0,0 +1,44 @@
+import time
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from locar.webhooks import despachar, limpar
+
+
+class Command(BaseCommand):
+    help = (
+        "Worker dos webhooks: envia as entregas pendentes (EntregaWebhook) em lotes assinados, respeitando o "
+        "limite de envios simultâneos de cada destino. Com --continuo fica consultando a fila. "
+        "Pode rodar em mais de um processo."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--lote", type=int, help="Eventos por POST (padrão: WEBHOOKS_LOTE).")
+        parser.add_argument("--trabalhadores", type=int, help="Threads de envio (padrão: soma das vagas dos destinos, até 16).")
+        parser.add_argument("--continuo", action="store_true", help="Não sai quando a fila esvazia.")
+        parser.add_argument("--intervalo", type=float, default=2, help="Segundos entre consultas à fila vazia.")
+
+    def handle(self, *args, **options):
+        total = 0
+        ultima_limpeza = 0.0
+        while True:
+            if time.monotonic() - ultima_limpeza > 3600:
+                entregas, eventos = limpar()
+                ultima_limpeza = time.monotonic()
+                if entregas or eventos:
+                    self.stdout.write(f"Limpeza: {entregas} entrega(s) e {eventos} evento(s) antigos apagados.")
+
+            resumo = despachar(options["lote"], options["trabalhadores"])
+            if resumo["lotes"]:
+                total += resumo["entregue"]
+                self.stdout.write(
+                    f"[{timezone.localtime():%H:%M:%S}] {resumo['lotes']} lote(s): {resumo['entregue']} entregue(s), "
+                    f"{resumo['retentativa']} para nova tentativa, {resumo['morta']} na dead letter"
+                )
+                continue
+            if resumo["erros"]:
+                self.stderr.write(f"{resumo['erros']} erro(s) no envio; ver o log.")
+            if not options["continuo"]:
+                break
+            time.sleep(options["intervalo"])
+
+        self.stdout.write(self.style.SUCCESS(f"{total} entrega(s) concluída(s)."))
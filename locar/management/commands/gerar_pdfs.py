@@ -0,0 +1,39 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from locar.pdfs import enfileirar_recibos_mes, processar_fila
+
+
+class Command(BaseCommand):
+    help = (
+        "Worker dos PDFs (contratos, recibos e recibos mensais): processa a fila TarefaPdf. "
+        "Com --continuo fica consultando a fila; --recibos-mes AAAA-MM enfileira os recibos do mês de todos os clientes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--lote", type=int, default=20)
+        parser.add_argument("--continuo", action="store_true", help="Não sai quando a fila esvazia.")
+        parser.add_argument("--intervalo", type=float, default=5, help="Segundos entre consultas à fila vazia.")
+        parser.add_argument("--recibos-mes", metavar="AAAA-MM", help="Gera os recibos mensais de todos os clientes.")
+
+    def handle(self, *args, **options):
+        if options["recibos_mes"]:
+            try:
+                ano, mes = map(int, options["recibos_mes"].split("-"))
+                total = enfileirar_recibos_mes(ano, mes)
+            except ValueError:
+                raise CommandError("Use --recibos-mes no formato AAAA-MM.")
+            self.stdout.write(f"{total} cliente(s) com recibos de {options['recibos_mes']} enfileirados.")
+
+        total = 0
+        while True:
+            processadas = processar_fila(options["lote"])
+            total += processadas
+            if processadas:
+                self.stdout.write(f"[{timezone.localtime():%H:%M:%S}] {processadas} tarefa(s) processada(s)")
+                continue
+            if not options["continuo"]:
+                break
+            time.sleep(options["intervalo"])
+
+        self.stdout.write(self.style.SUCCESS(f"{total} tarefa(s) processada(s)."))
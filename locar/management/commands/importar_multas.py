@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand, CommandError
+from locar.multas import escrever_relatorio, importar_multas
+
+
+class Command(BaseCommand):
+    help = (
+        "Importa multas do DETRAN (CSV: placa; data_hora; valor; auto; descricao) como despesas, "
+        "ligando cada uma ao cliente que estava com o veículo. As que não casam vão para o relatório."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("arquivo")
+        parser.add_argument("--relatorio", help="CSV com as multas não casadas (padrão: <arquivo>.pendentes.csv).")
+        parser.add_argument("--encoding", default="utf-8-sig", help="Os arquivos do DETRAN costumam vir em latin-1.")
+        parser.add_argument("--simular", action="store_true", help="Casa as multas sem gravar as despesas.")
+
+    def handle(self, *args, **options):
+        try:
+            with open(options["arquivo"], newline="", encoding=options["encoding"]) as arquivo:
+                resumo, pendentes = importar_multas(arquivo, simular=options["simular"])
+        except (OSError, UnicodeDecodeError) as exc:
+            raise CommandError(f"Não foi possível ler {options['arquivo']}: {exc}")
+
+        caminho = options["relatorio"] or f"{options['arquivo']}.pendentes.csv"
+        if pendentes:
+            with open(caminho, "w", newline="", encoding="utf-8") as saida:
+                escrever_relatorio(saida, pendentes)
+
+        self.stdout.write(
+            f"{resumo['lidas']} multa(s) lida(s): {resumo['com_cliente']} com cliente, "
+            f"{resumo['sem_locacao']} sem locação no horário, {len(pendentes) - resumo['sem_locacao']} não importada(s)."
+        )
+        if pendentes:
+            self.stdout.write(f"Relatório de pendências: {caminho}")
+        verbo = "seriam criadas" if options["simular"] else "criadas"
+        self.stdout.write(self.style.SUCCESS(f"{resumo['criadas']} despesa(s) {verbo}."))
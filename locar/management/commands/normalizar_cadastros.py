@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+from locar.models import Cliente, Veiculo
+from locar.versoes import tocar
+
+
+class Command(BaseCommand):
+    help = (
+        "Preenche as colunas de busca normalizadas (CPF/CNH só dígitos, nome sem acento, placa sem separadores) "
+        "em lotes. A migração 0050 já preenche os cadastros existentes e o save() dos modelos as mantém; rodar "
+        "de novo quando as regras de normalização mudarem."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--lote", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        for modelo in (Cliente, Veiculo):
+            origem, destino = list(modelo.CAMPOS_NORMALIZADOS), list(modelo.CAMPOS_NORMALIZADOS.values())
+            atualizados = 0
+            ultimo_id = 0
+            while True:
+                # Paginação pela chave: cada lote é uma consulta curta por faixa de id
+                lote = list(
+                    modelo.objects.filter(pk__gt=ultimo_id).order_by("pk").only("pk", *origem, *destino)[:options["lote"]]
+                )
+                if not lote:
+                    break
+                ultimo_id = lote[-1].pk
+                alterados = []
+                for obj in lote:
+                    antes = [getattr(obj, campo) for campo in destino]
+                    obj.normalizar()
+                    if [getattr(obj, campo) for campo in destino] != antes:
+                        alterados.append(obj)
+                modelo.objects.bulk_update(alterados, destino)
+                atualizados += len(alterados)
+            if atualizados:
+                # bulk_update não dispara sinais
+                tocar(modelo)
+            self.stdout.write(f"{modelo._meta.verbose_name_plural}: {atualizados} registro(s) atualizado(s).")
+        self.stdout.write(self.style.SUCCESS("Colunas normalizadas preenchidas."))
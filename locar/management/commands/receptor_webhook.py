@@ -0,0 +1,62 @@
+import json
+import random
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from django.core.management.base import BaseCommand
+from locar.webhooks import verificar_assinatura
+
+
+class Command(BaseCommand):
+    help = (
+        "Destino de webhook local para testes: confere a assinatura e imprime os eventos recebidos. "
+        "Cadastre um DestinoWebhook com a URL http://127.0.0.1:<porta>/ e o mesmo --segredo; --falhas e "
+        "--atraso simulam um destino instável ou lento."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--porta", type=int, default=8765)
+        parser.add_argument("--segredo", required=True)
+        parser.add_argument("--falhas", type=float, default=0, help="Fração dos POSTs respondida com 503 (0 a 1).")
+        parser.add_argument("--status", type=int, default=503, help="Status das falhas simuladas (ex.: 410 vira dead letter).")
+        parser.add_argument("--atraso", type=float, default=0, help="Segundos de espera antes de responder.")
+
+    def handle(self, *args, **options):
+        comando = self
+        vistos = set()
+
+        class Receptor(BaseHTTPRequestHandler):
+            def do_POST(self):
+                corpo = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                if options["atraso"]:
+                    time.sleep(options["atraso"])
+                if not verificar_assinatura(
+                    options["segredo"], self.headers.get("X-Webhook-Timestamp"), corpo,
+                    self.headers.get("X-Webhook-Assinatura"),
+                ):
+                    comando.stderr.write("Assinatura inválida: 401")
+                    return self._responder(401)
+                if random.random() < options["falhas"]:
+                    comando.stdout.write(f"Falha simulada: {options['status']}")
+                    return self._responder(options["status"])
+                for evento in json.loads(corpo)["eventos"]:
+                    repetido = " (repetido)" if evento["id"] in vistos else ""
+                    vistos.add(evento["id"])
+                    comando.stdout.write(f"#{evento['id']} {evento['tipo']}{repetido} {json.dumps(evento['dados'])}")
+                self._responder(204)
+
+            def _responder(self, status):
+                self.send_response(status)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def log_message(self, formato, *args):
+                pass
+
+        servidor = ThreadingHTTPServer(("127.0.0.1", options["porta"]), Receptor)
+        self.stdout.write(f"Recebendo webhooks em http://127.0.0.1:{options['porta']}/ (Ctrl+C para sair)")
+        try:
+            servidor.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            servidor.server_close()
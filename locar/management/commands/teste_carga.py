@@ -0,0 +1,103 @@
+import json
+from pathlib import Path
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+from locar.carga import (ETAPAS, comparar, executar_carga, executar_disputa, iniciar_servidor, limpar_dados,
+                         preparar_dados, resumir)
+
+
+class Command(BaseCommand):
+    help = (
+        "Teste de carga dos caminhos de gravação (receber, criar locação, pagamento, abrir e encerrar locação) "
+        "com N usuários simultâneos. Sobe o runserver em outro processo (ou usa --url) e cria dados próprios "
+        "(placas CRG...), apagados no fim. Use um banco de teste: o teste grava de verdade."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--usuarios", type=int, default=5, help="Usuários simultâneos (threads).")
+        parser.add_argument("--duracao", type=float, default=30, help="Segundos de teste.")
+        parser.add_argument("--iteracoes", type=int, help="Jornadas por usuário (em vez de parar por tempo).")
+        parser.add_argument("--url", help="Servidor já em execução (ex.: http://127.0.0.1:8000), que usa o mesmo banco.")
+        parser.add_argument("--salvar", metavar="ARQUIVO", help="Grava o resultado como linha de base (JSON).")
+        parser.add_argument("--comparar", metavar="ARQUIVO", help="Compara com uma linha de base salva.")
+        parser.add_argument("--tolerancia", type=float, default=0.2, help="Piora aceita ao comparar (0.2 = 20%%).")
+        parser.add_argument("--manter-dados", action="store_true")
+        parser.add_argument(
+            "--disputa", action="store_true",
+            help="Em vez da jornada, todos os usuários tentam locar o mesmo veículo ao mesmo tempo; falha se "
+                 "não houver exatamente um vencedor.",
+        )
+
+    def handle(self, *args, **options):
+        if options["usuarios"] < 1:
+            raise CommandError("--usuarios deve ser pelo menos 1.")
+        base = None
+        if options["comparar"]:
+            try:
+                base = json.loads(Path(options["comparar"]).read_text())
+            except (OSError, ValueError) as exc:
+                raise CommandError(f"Linha de base inválida: {exc}")
+
+        pares = preparar_dados(options["usuarios"])
+        processo = None
+        try:
+            url_base = options["url"]
+            if not url_base:
+                processo, url_base = iniciar_servidor()
+            if options["disputa"]:
+                return self._disputa(url_base.rstrip("/"), pares)
+            self.stdout.write(
+                f"{options['usuarios']} usuário(s) em {url_base} ({connection.vendor}) por "
+                + (f"{options['iteracoes']} jornada(s)" if options["iteracoes"] else f"{options['duracao']:.0f}s")
+                + "..."
+            )
+            duracao = float("inf") if options["iteracoes"] else options["duracao"]
+            medicoes, segundos = executar_carga(url_base.rstrip("/"), pares, duracao, options["iteracoes"])
+        finally:
+            if processo is not None:
+                processo.terminate()
+                processo.wait()
+            if not options["manter_dados"]:
+                limpar_dados()
+
+        etapas = resumir(medicoes, segundos)
+        self._imprimir(etapas, segundos)
+        resultado = {
+            "data": timezone.now().isoformat(),
+            "banco": connection.vendor,
+            "usuarios": options["usuarios"],
+            "segundos": round(segundos, 2),
+            "etapas": etapas,
+        }
+        if options["salvar"]:
+            Path(options["salvar"]).write_text(json.dumps(resultado, indent=2, ensure_ascii=False))
+            self.stdout.write(f"Linha de base gravada em {options['salvar']}")
+        if base:
+            regressoes = comparar(etapas, base["etapas"], options["tolerancia"])
+            if regressoes:
+                raise CommandError("Regressão em relação à linha de base:\n  " + "\n  ".join(regressoes))
+            self.stdout.write(self.style.SUCCESS(f"Sem regressões em relação a {options['comparar']}."))
+
+    def _disputa(self, url_base, pares):
+        self.stdout.write(f"{len(pares)} usuário(s) locando o mesmo veículo em {url_base} ({connection.vendor})...")
+        vencedores, recusados, outros, abertas = executar_disputa(url_base, pares)
+        self.stdout.write(
+            f"Vencedores: {vencedores}  Recusados com erro no formulário: {recusados}  "
+            f"Outros erros: {outros}  Locações abertas do veículo: {abertas}"
+        )
+        if vencedores != 1 or abertas != 1:
+            raise CommandError("A reserva do veículo não foi exclusiva.")
+        self.stdout.write(self.style.SUCCESS("Reserva exclusiva: um vencedor e uma locação aberta."))
+
+    def _imprimir(self, etapas, segundos):
+        self.stdout.write(f"\n{'etapa':<18}{'req':>7}{'req/s':>9}{'erros':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+        for etapa in ETAPAS:
+            dados = etapas[etapa]
+            self.stdout.write(
+                f"{etapa:<18}{dados['requisicoes']:>7}{dados['por_segundo']:>9}{dados['taxa_erro']:>8.1%}"
+                f"{dados['p50_ms']:>9}{dados['p95_ms']:>9}{dados['p99_ms']:>9}"
+            )
+            for erro, quantidade in dados["tipos_erro"].items():
+                self.stdout.write(f"{'':<18}  {quantidade}x {erro}")
+        self.stdout.write(f"Duração: {segundos:.1f}s")
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.6 on 2026-10-19 15:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('locar', '0036_alter_locacao_documentos_locacao'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='despesa',
+            index=models.Index(fields=['-data', '-id'], name='despesa_data_id_idx'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.6 on 2026-10-19 15:51
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('locar', '0037_despesa_despesa_data_id_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VersaoTabela',
+            fields=[
+                ('tabela', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('versao', models.PositiveBigIntegerField(default=0)),
+                ('atualizado_em', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+    ]
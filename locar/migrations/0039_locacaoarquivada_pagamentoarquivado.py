@@ -0,0 +1,54 @@
+# Generated by Django 5.2.6 on 2026-10-19 15:57
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('locar', '0038_versaotabela'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LocacaoArquivada',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('inicio', models.DateTimeField()),
+                ('fim', models.DateTimeField()),
+                ('km_inicio', models.PositiveIntegerField()),
+                ('km_fim', models.PositiveIntegerField(blank=True, null=True)),
+                ('valor_semanal', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('quantidade_semanas', models.IntegerField(default=0)),
+                ('caucao', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('caucao_status', models.CharField(blank=True, choices=[('pendente', 'Pendente'), ('devolvido', 'Devolvido'), ('retido', 'Retido')], max_length=20, null=True)),
+                ('forma_pagamento', models.CharField(choices=[('avista', 'À Vista'), ('semanal', 'Semanal')], max_length=10)),
+                ('status', models.CharField(blank=True, choices=[('andamento', 'Em Andamento'), ('encerrada', 'Encerrada')], max_length=10, null=True)),
+                ('criado_em', models.DateTimeField()),
+                ('documentos_locacao', models.FileField(blank=True, null=True, upload_to='', verbose_name='Documentos')),
+                ('observacoes', models.TextField(blank=True)),
+                ('semanas_pagas', models.PositiveIntegerField(default=0)),
+                ('arquivado_em', models.DateTimeField(auto_now_add=True)),
+                ('cliente', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='locacoes_arquivadas', to='locar.cliente')),
+                ('criado_por', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('veiculo', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='locacoes_arquivadas', to='locar.veiculo')),
+            ],
+            options={
+                'verbose_name': 'Locação arquivada',
+                'verbose_name_plural': 'Locações arquivadas',
+                'ordering': ['-criado_em'],
+            },
+        ),
+        migrations.CreateModel(
+            name='PagamentoArquivado',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('data', models.DateTimeField()),
+                ('valor', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('locacao', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='pagamentos', to='locar.locacaoarquivada')),
+            ],
+        ),
+    ]
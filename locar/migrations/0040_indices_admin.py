@@ -0,0 +1,31 @@
+# Generated by Django 5.2.6 on 2026-10-19 16:00
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('locar', '0039_locacaoarquivada_pagamentoarquivado'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='cliente',
+            index=models.Index(fields=['nome'], name='cliente_nome_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='locacao',
+            index=models.Index(fields=['-criado_em'], name='locacao_criado_em_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='locacao',
+            index=models.Index(fields=['inicio'], name='locacao_inicio_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pagamento',
+            index=models.Index(fields=['data'], name='pagamento_data_idx'),
+        ),
+    ]
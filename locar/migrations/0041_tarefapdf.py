@@ -0,0 +1,31 @@
+# Generated by Django 5.2.6 on 2026-10-19 16:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('locar', '0040_indices_admin'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TarefaPdf',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('contrato', 'Contrato'), ('recibo', 'Recibo'), ('recibos_mes', 'Recibos do mês')], max_length=20)),
+                ('referencia', models.CharField(max_length=30)),
+                ('status', models.CharField(choices=[('pendente', 'Pendente'), ('concluida', 'Concluída'), ('erro', 'Erro')], default='pendente', max_length=10)),
+                ('arquivo', models.CharField(blank=True, max_length=200)),
+                ('erro', models.TextField(blank=True)),
+                ('tentativas', models.PositiveSmallIntegerField(default=0)),
+                ('criado_em', models.DateTimeField(auto_now_add=True)),
+                ('concluido_em', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'id'], name='tarefapdf_status_idx')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('status', 'pendente')), fields=('tipo', 'referencia'), name='tarefapdf_pendente_unica')],
+            },
+        ),
+    ]
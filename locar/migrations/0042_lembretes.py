@@ -0,0 +1,74 @@
+# Generated by Django 5.2.6 on 2026-10-19 16:08
+
+import django.db.models.deletion
+from datetime import timedelta
+from django.conf import settings
+from django.db import migrations, models
+
+
+def preencher_proximo_vencimento(apps, schema_editor):
+    Locacao = apps.get_model("locar", "Locacao")
+    lote = []
+    for locacao in Locacao.objects.only("inicio", "quantidade_semanas", "semanas_pagas").iterator(chunk_size=1000):
+        if locacao.semanas_pagas < locacao.quantidade_semanas:
+            locacao.proximo_vencimento = locacao.inicio.date() + timedelta(days=(locacao.semanas_pagas + 1) * 7)
+            lote.append(locacao)
+        if len(lote) >= 1000:
+            Locacao.objects.bulk_update(lote, ["proximo_vencimento"])
+            lote = []
+    Locacao.objects.bulk_update(lote, ["proximo_vencimento"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('locar', '0041_tarefapdf'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LembreteEnviado',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('vencimento', models.DateField()),
+                ('tipo', models.CharField(choices=[('proximo', 'Vence em breve'), ('vencido', 'Vencido')], max_length=10)),
+                ('canal', models.CharField(max_length=20)),
+                ('destino', models.CharField(max_length=254)),
+                ('status', models.CharField(choices=[('enviando', 'Enviando'), ('enviado', 'Enviado'), ('erro', 'Erro')], default='enviando', max_length=10)),
+                ('lote', models.UUIDField()),
+                ('tentativas', models.PositiveSmallIntegerField(default=0)),
+                ('erro', models.TextField(blank=True)),
+                ('criado_em', models.DateTimeField(auto_now_add=True)),
+                ('enviado_em', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='locacao',
+            name='proximo_vencimento',
+            field=models.DateField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='locacao',
+            index=models.Index(fields=['status', 'proximo_vencimento'], name='locacao_vencimento_idx'),
+        ),
+        migrations.AddField(
+            model_name='lembreteenviado',
+            name='cliente',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lembretes', to='locar.cliente'),
+        ),
+        migrations.AddField(
+            model_name='lembreteenviado',
+            name='locacao',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lembretes', to='locar.locacao'),
+        ),
+        migrations.AddIndex(
+            model_name='lembreteenviado',
+            index=models.Index(fields=['lote'], name='lembrete_lote_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='lembreteenviado',
+            constraint=models.UniqueConstraint(condition=models.Q(('status', 'erro'), _negated=True), fields=('locacao', 'vencimento', 'tipo', 'canal'), name='lembrete_unico_por_parcela'),
+        ),
+        migrations.RunPython(preencher_proximo_vencimento, migrations.RunPython.noop),
+    ]
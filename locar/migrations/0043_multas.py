@@ -0,0 +1,28 @@
+# Generated by Django 5.2.6 on 2026-10-19 16:11
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('locar', '0042_lembretes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='despesa',
+            name='auto_infracao',
+            field=models.CharField(blank=True, editable=False, max_length=30, verbose_name='Auto de infração'),
+        ),
+        migrations.AddField(
+            model_name='despesa',
+            name='cliente',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='despesas', to='locar.cliente'),
+        ),
+        migrations.AddConstraint(
+            model_name='despesa',
+            constraint=models.UniqueConstraint(condition=models.Q(('auto_infracao', ''), _negated=True), fields=('auto_infracao',), name='despesa_auto_infracao_unico'),
+        ),
+    ]
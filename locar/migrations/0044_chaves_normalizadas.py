@@ -0,0 +1,33 @@
+# Generated by Django 5.2.6 on 2026-10-19 16:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('locar', '0043_multas'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cliente',
+            name='cnh_normalizada',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=30),
+        ),
+        migrations.AddField(
+            model_name='cliente',
+            name='cpf_normalizado',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=14),
+        ),
+        migrations.AddField(
+            model_name='cliente',
+            name='nome_normalizado',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=100),
+        ),
+        migrations.AddField(
+            model_name='veiculo',
+            name='placa_normalizada',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=7),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.6 on 2026-10-19 16:24
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('locar', '0044_chaves_normalizadas'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PerfilRequisicao',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('criado_em', models.DateTimeField(auto_now_add=True)),
+                ('url_nome', models.CharField(blank=True, max_length=100, verbose_name='Rota')),
+                ('caminho', models.CharField(max_length=500)),
+                ('metodo', models.CharField(max_length=10)),
+                ('status', models.PositiveSmallIntegerField()),
+                ('motivo', models.CharField(choices=[('pedido', 'Pedido'), ('amostra', 'Amostragem')], max_length=10)),
+                ('duracao_ms', models.FloatField(verbose_name='Duração (ms)')),
+                ('consultas', models.PositiveIntegerField(default=0)),
+                ('tempo_sql_ms', models.FloatField(default=0, verbose_name='SQL (ms)')),
+                ('resumo_sql', models.TextField(blank=True)),
+                ('pstats', models.BinaryField()),
+                ('pilhas', models.TextField(blank=True)),
+                ('usuario', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Perfil de requisição',
+                'verbose_name_plural': 'Perfis de requisição',
+                'ordering': ['-criado_em'],
+            },
+        ),
+    ]
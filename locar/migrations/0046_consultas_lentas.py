@@ -0,0 +1,31 @@
+# Generated by Django 5.2.6 on 2026-10-19 16:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('locar', '0045_perfil_requisicao'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ConsultaLenta',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('criado_em', models.DateTimeField()),
+                ('impressao_digital', models.CharField(max_length=40)),
+                ('sql', models.TextField()),
+                ('parametros', models.TextField(blank=True)),
+                ('duracao_ms', models.FloatField()),
+                ('origem', models.CharField(blank=True, max_length=200)),
+                ('pilha', models.TextField(blank=True)),
+                ('plano', models.TextField(blank=True)),
+            ],
+            options={
+                'ordering': ['-criado_em'],
+                'indexes': [models.Index(fields=['impressao_digital', 'criado_em'], name='consultalenta_digital_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,66 @@
+# Generated by Django 5.2.6 on 2026-10-19 16:38
+
+import django.core.serializers.json
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('locar', '0046_consultas_lentas'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DestinoWebhook',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nome', models.CharField(max_length=100)),
+                ('url', models.URLField(max_length=500)),
+                ('segredo', models.CharField(max_length=200)),
+                ('eventos', models.CharField(blank=True, max_length=300)),
+                ('ativo', models.BooleanField(default=True)),
+                ('max_concorrencia', models.PositiveSmallIntegerField(default=2, help_text='Lotes em andamento ao mesmo tempo para este destino.', verbose_name='Envios simultâneos')),
+                ('criado_em', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Destino de webhook',
+                'verbose_name_plural': 'Destinos de webhook',
+            },
+        ),
+        migrations.CreateModel(
+            name='EventoWebhook',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(max_length=50)),
+                ('dados', models.JSONField(encoder=django.core.serializers.json.DjangoJSONEncoder)),
+                ('criado_em', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Evento de webhook',
+                'verbose_name_plural': 'Eventos de webhook',
+            },
+        ),
+        migrations.CreateModel(
+            name='EntregaWebhook',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('pendente', 'Pendente'), ('enviando', 'Enviando'), ('entregue', 'Entregue'), ('morta', 'Falhou (dead letter)')], default='pendente', max_length=10)),
+                ('tentativas', models.PositiveSmallIntegerField(default=0)),
+                ('proxima_tentativa', models.DateTimeField(default=django.utils.timezone.now)),
+                ('lote', models.UUIDField(blank=True, null=True)),
+                ('travado_ate', models.DateTimeField(blank=True, null=True)),
+                ('erro', models.TextField(blank=True)),
+                ('entregue_em', models.DateTimeField(blank=True, null=True)),
+                ('destino', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='entregas', to='locar.destinowebhook')),
+                ('evento', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='entregas', to='locar.eventowebhook')),
+            ],
+            options={
+                'verbose_name': 'Entrega de webhook',
+                'verbose_name_plural': 'Entregas de webhook',
+                'indexes': [models.Index(fields=['destino', 'status', 'proxima_tentativa'], name='entregawebhook_fila_idx'), models.Index(fields=['lote'], name='entregawebhook_lote_idx')],
+            },
+        ),
+    ]
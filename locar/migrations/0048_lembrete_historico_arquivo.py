@@ -0,0 +1,19 @@
+# Generated by Django 5.2.6 on 2026-10-19 16:49
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('locar', '0047_webhooks'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='lembreteenviado',
+            name='locacao',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='lembretes', to='locar.locacao'),
+        ),
+    ]
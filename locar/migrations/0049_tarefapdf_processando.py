@@ -0,0 +1,23 @@
+# Generated by Django 5.2.6 on 2026-10-19 16:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('locar', '0048_lembrete_historico_arquivo'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tarefapdf',
+            name='iniciado_em',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='tarefapdf',
+            name='status',
+            field=models.CharField(choices=[('pendente', 'Pendente'), ('processando', 'Processando'), ('concluida', 'Concluída'), ('erro', 'Erro')], default='pendente', max_length=12),
+        ),
+    ]
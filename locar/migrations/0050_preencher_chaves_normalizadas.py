@@ -0,0 +1,43 @@
+from django.db import migrations
+from locar.normalizacao import normalizar_nome, normalizar_placa, so_digitos
+
+
+def _preencher(modelo, origem, destino, normalizar):
+    lote = []
+    for obj in modelo.objects.only(*origem).iterator(chunk_size=1000):
+        normalizar(obj)
+        lote.append(obj)
+        if len(lote) >= 1000:
+            modelo.objects.bulk_update(lote, destino)
+            lote = []
+    modelo.objects.bulk_update(lote, destino)
+
+
+def _normalizar_cliente(cliente):
+    cliente.cpf_normalizado = so_digitos(cliente.cpf)
+    cliente.cnh_normalizada = so_digitos(cliente.cnh_numero)
+    cliente.nome_normalizado = normalizar_nome(cliente.nome)
+
+
+def _normalizar_veiculo(veiculo):
+    veiculo.placa_normalizada = normalizar_placa(veiculo.placa)
+
+
+def preencher_chaves_normalizadas(apps, schema_editor):
+    # Cadastros anteriores à 0044: sem isto a busca e a checagem de duplicados não os encontram
+    _preencher(
+        apps.get_model("locar", "Cliente"), ["cpf", "cnh_numero", "nome"],
+        ["cpf_normalizado", "cnh_normalizada", "nome_normalizado"], _normalizar_cliente,
+    )
+    _preencher(apps.get_model("locar", "Veiculo"), ["placa"], ["placa_normalizada"], _normalizar_veiculo)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('locar', '0049_tarefapdf_processando'),
+    ]
+
+    operations = [
+        migrations.RunPython(preencher_chaves_normalizadas, migrations.RunPython.noop),
+    ]
@@ -1,9 +1,12 @@
-from django.db import models
+from django.db import models, transaction
 from decimal import Decimal
+from datetime import timedelta
 from django.contrib.auth import get_user_model
 from django.utils import timezone
 from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db.models import Sum
+from .normalizacao import normalizar_nome, normalizar_placa, so_digitos
 import locale
 
 Usuario = get_user_model()
@@ -15,6 +18,13 @@ except:
     # fallback caso o sistema não tenha o locale BR instalado
     locale.setlocale(locale.LC_ALL, "")
 
+def _incluir_normalizados(kwargs, campos):
+    # save(update_fields=["cpf"]) também grava a coluna normalizada correspondente
+    update_fields = kwargs.get("update_fields")
+    if update_fields is not None:
+        kwargs["update_fields"] = {*update_fields, *(campos[c] for c in update_fields if c in campos)}
+
+
 class Cliente(models.Model):
     nome = models.CharField(max_length=100, verbose_name="Nome Completo")
     cpf = models.CharField(max_length=14, unique=True, verbose_name="CPF")
@@ -27,6 +37,25 @@ class Cliente(models.Model):
     cnh_validade = models.DateField(blank=True, null=True, verbose_name="Validade CNH")
     observacao = models.TextField(blank=True, null=True, verbose_name="Observação", default="Nenhuma Observação Cadastrada")
     criado_em = models.DateTimeField(auto_now_add=True, editable=False)
+    # Chaves de busca (ver locar/normalizacao.py); preenchidas no save()
+    cpf_normalizado = models.CharField(max_length=14, db_index=True, editable=False, default="")
+    cnh_normalizada = models.CharField(max_length=30, db_index=True, editable=False, default="")
+    nome_normalizado = models.CharField(max_length=100, db_index=True, editable=False, default="")
+
+    CAMPOS_NORMALIZADOS = {"cpf": "cpf_normalizado", "cnh_numero": "cnh_normalizada", "nome": "nome_normalizado"}
+
+    class Meta:
+        indexes = [models.Index(fields=["nome"], name="cliente_nome_idx")]
+
+    def normalizar(self):
+        self.cpf_normalizado = so_digitos(self.cpf)
+        self.cnh_normalizada = so_digitos(self.cnh_numero)
+        self.nome_normalizado = normalizar_nome(self.nome)
+
+    def save(self, *args, **kwargs):
+        self.normalizar()
+        _incluir_normalizados(kwargs, self.CAMPOS_NORMALIZADOS)
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.nome}, CPF: ({self.cpf})"
@@ -46,10 +75,21 @@ class Veiculo(models.Model):
     status = models.CharField(max_length=20, choices=[('disponível', 'Disponível'), ('alugado', 'Alugado') , ('manutencao', 'Manutenção'), ('inativo','Inativo')], null=False, default='disponível')
     foto_veiculo = models.ImageField(upload_to="veiculos/", blank=True)
     criado_em = models.DateTimeField(auto_now_add=True)
+    placa_normalizada = models.CharField(max_length=7, db_index=True, editable=False, default="")
+
+    CAMPOS_NORMALIZADOS = {"placa": "placa_normalizada"}
 
     class Meta:
         ordering = ["-criado_em"]
 
+    def normalizar(self):
+        self.placa_normalizada = normalizar_placa(self.placa)
+
+    def save(self, *args, **kwargs):
+        self.normalizar()
+        _incluir_normalizados(kwargs, self.CAMPOS_NORMALIZADOS)
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return f"{self.modelo} - {self.placa}"
     
@@ -80,9 +120,16 @@ class Locacao(models.Model):
     documentos_locacao = models.FileField(blank=True, null=True, verbose_name="Documentos")
     observacoes = models.TextField(blank=True)
     semanas_pagas = models.PositiveIntegerField(default=0, editable=False)
+    # Vencimento da próxima parcela em aberto (None quando tudo foi pago); mantido no save()
+    proximo_vencimento = models.DateField(null=True, blank=True, editable=False)
 
     class Meta:
         ordering = ["-criado_em"]
+        indexes = [
+            models.Index(fields=["-criado_em"], name="locacao_criado_em_idx"),
+            models.Index(fields=["inicio"], name="locacao_inicio_idx"),
+            models.Index(fields=["status", "proximo_vencimento"], name="locacao_vencimento_idx"),
+        ]
 
     @property
     def valor_total_locacao(self):
@@ -103,25 +150,49 @@ class Locacao(models.Model):
                 self.veiculo.save()
         super().delete(*args, **kwargs)
 
+    def calcular_proximo_vencimento(self):
+        if self.semanas_pagas >= self.quantidade_semanas:
+            return None
+        return self.inicio.date() + timedelta(days=(self.semanas_pagas + 1) * 7)
+
     def dias_locacao(self):  #ATIVA
         return (self.fim.date() - self.inicio.date()).days 
 
     def clean(self):
+        # Aviso antecipado; quem garante a exclusividade é o reservar_veiculo() no save()
         if not self.pk and self.veiculo and self.veiculo.status in ["alugado", "inativo", "manutencao"]:
             raise ValidationError(f"O veículo {self.veiculo} não pode ser locado. Verifique o status!")
 
+    def reservar_veiculo(self):
+        """Passa o veículo para "alugado" num único UPDATE condicional.
+
+        De dois atendentes locando o mesmo carro ao mesmo tempo, só um encontra o status
+        "disponível"; o outro recebe ValidationError. Só trava a linha deste veículo.
+        """
+        if not Veiculo.objects.filter(pk=self.veiculo_id, status="disponível").update(status="alugado"):
+            raise ValidationError({"veiculo": f"O veículo {self.veiculo} acabou de ser locado ou não está disponível."})
+        self.veiculo.status = "alugado"
+
     def save(self, *args, **kwargs): #ATIVA
         self.full_clean()
-        # Se for uma nova locação -> muda o status para "alugado"
-        if not self.pk:  
-            self.veiculo.status = "alugado"
+        self.proximo_vencimento = self.calcular_proximo_vencimento()
+        # Se for uma nova locação -> reserva o veículo na mesma transação da gravação
+        if not self.pk:
+            from .versoes import tocar
+
+            with transaction.atomic():
+                if self.veiculo_id:
+                    self.reservar_veiculo()
+                super().save(*args, **kwargs)
+            # update() não dispara sinais
+            tocar(Veiculo)
+            return
+
+        # Se já existe e foi informado km_fim -> volta para "disponível"
+        if self.km_fim is not None and self.veiculo.status == "alugado":
+            self.veiculo.status = "disponível"
+            self.veiculo.km_atual = self.km_fim
             self.veiculo.save()
-        else:
-            # Se já existe e foi informado km_fim -> volta para "disponível"
-            if self.km_fim is not None and self.veiculo.status == "alugado":
-                self.veiculo.status = "disponível"
-                self.veiculo.km_atual = self.km_fim
-                self.veiculo.save()
 
         super().save(*args, **kwargs)
 
@@ -134,18 +205,73 @@ class Pagamento(models.Model): #(RECEBER)
     data = models.DateTimeField(auto_now_add=True)
     valor = models.DecimalField(max_digits=10, decimal_places=2)
 
+    class Meta:
+        indexes = [models.Index(fields=["data"], name="pagamento_data_idx")]
+
     def clean(self):
         if self.locacao.status != "andamento":
             raise ValidationError("Não é possível registrar pagamento para uma locação encerrada.")
 
     def save(self, *args, **kwargs):
-        self.full_clean()  
-        super().save(*args, **kwargs)
+        self.full_clean()
+        # Mesma transação do evento de webhook gravado pelo sinal post_save (locar/webhooks.py)
+        with transaction.atomic():
+            super().save(*args, **kwargs)
 
     def __str__(self):
-        return f"Pagamento de R${self.valor} em {self.data.date()} (Locação {self.locacao.id})"
+        return f"Pagamento de R${self.valor} em {self.data.date()} (Locação {self.locacao_id})"
     
     
+# ----------------------------- ARQUIVO DE LOCAÇÕES -----------------------------------------
+# Locações encerradas antigas (e seus pagamentos) saem das tabelas principais para cá,
+# mantendo o mesmo id para permitir a restauração. Ver locar/arquivo.py.
+class LocacaoArquivada(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    veiculo = models.ForeignKey(Veiculo, on_delete=models.PROTECT, related_name='locacoes_arquivadas', null=True, blank=True)
+    cliente = models.ForeignKey(Cliente, on_delete=models.PROTECT, related_name='locacoes_arquivadas')
+    inicio = models.DateTimeField()
+    fim = models.DateTimeField()
+    km_inicio = models.PositiveIntegerField()
+    km_fim = models.PositiveIntegerField(blank=True, null=True)
+    valor_semanal = models.DecimalField(max_digits=10, decimal_places=2)
+    quantidade_semanas = models.IntegerField(default=0)
+    caucao = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    caucao_status = models.CharField(max_length=20, choices=Locacao.CAUCAO_STATUS_CHOICES, blank=True, null=True)
+    forma_pagamento = models.CharField(max_length=10, choices=Locacao.FORMA_PAGAMENTO_CHOICES)
+    status = models.CharField(max_length=10, choices=Locacao.STATUS_CHOICES, blank=True, null=True)
+    criado_por = models.ForeignKey(Usuario, null=True, blank=True, on_delete=models.SET_NULL, related_name='+')
+    criado_em = models.DateTimeField()
+    documentos_locacao = models.FileField(blank=True, null=True, verbose_name="Documentos")
+    observacoes = models.TextField(blank=True)
+    semanas_pagas = models.PositiveIntegerField(default=0)
+    arquivado_em = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["-criado_em"]
+        verbose_name = "Locação arquivada"
+        verbose_name_plural = "Locações arquivadas"
+
+    @property
+    def valor_total_locacao(self):
+        return self.valor_semanal * self.quantidade_semanas
+
+    def dias_locacao(self):
+        return (self.fim.date() - self.inicio.date()).days
+
+    def __str__(self):
+        return f"Locação {self.id} (arquivada) - {self.veiculo} para {self.cliente}"
+
+
+class PagamentoArquivado(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    locacao = models.ForeignKey(LocacaoArquivada, on_delete=models.CASCADE, related_name="pagamentos")
+    data = models.DateTimeField()
+    valor = models.DecimalField(max_digits=10, decimal_places=2)
+
+    def __str__(self):
+        return f"Pagamento de R${self.valor} em {self.data.date()} (Locação {self.locacao_id}, arquivada)"
+
+
 # ----------------------------- DESPESAS VEÍCULO -----------------------------------------
 class Despesa(models.Model):
     veiculo = models.ForeignKey(Veiculo, on_delete=models.CASCADE, related_name='despesas')
@@ -158,6 +284,224 @@ class Despesa(models.Model):
     data = models.DateField(default=timezone.now)
     valor = models.DecimalField(max_digits=10, decimal_places=2)
     comprovante = models.FileField(upload_to='comprovantes/%Y/%m/%d/', blank=True, null=True)
+    # Preenchidos pela importação de multas (locar/multas.py): cliente com o carro na hora da
+    # infração e número do auto, que impede importar a mesma multa duas vezes
+    cliente = models.ForeignKey(Cliente, on_delete=models.SET_NULL, related_name='despesas', null=True, blank=True, editable=False)
+    auto_infracao = models.CharField(max_length=30, blank=True, editable=False, verbose_name="Auto de infração")
+
+    class Meta:
+        indexes = [models.Index(fields=["-data", "-id"], name="despesa_data_id_idx")]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["auto_infracao"], condition=~models.Q(auto_infracao=""), name="despesa_auto_infracao_unico"
+            ),
+        ]
+
+    def save(self, *args, **kwargs):
+        # Mesma transação do evento de webhook gravado pelo sinal post_save (locar/webhooks.py)
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+    def __str__(self):
+        return f"{self.categoria} - {self.veiculo} - {self.valor}"
+
+
+# ----------------------------- VERSÕES (CACHE HTTP) -----------------------------------------
+class VersaoTabela(models.Model):
+    # Contador incrementado a cada gravação da tabela; base dos ETags das páginas
+    tabela = models.CharField(max_length=50, primary_key=True)
+    versao = models.PositiveBigIntegerField(default=0)
+    atualizado_em = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.tabela} v{self.versao}"
+
+
+# ----------------------------- PDFs (CONTRATOS E RECIBOS) -----------------------------------------
+class TarefaPdf(models.Model):
+    # Fila dos PDFs gerados em segundo plano (manage.py gerar_pdfs); o arquivo é nomeado pelo
+    # hash dos dados, então só é refeito quando a locação/pagamento muda
+    TIPO_CHOICES = [("contrato", "Contrato"), ("recibo", "Recibo"), ("recibos_mes", "Recibos do mês")]
+    # "processando": reservada por um worker (iniciado_em); volta a ser reservável se o worker morrer
+    STATUS_CHOICES = [("pendente", "Pendente"), ("processando", "Processando"), ("concluida", "Concluída"), ("erro", "Erro")]
+
+    tipo = models.CharField(max_length=20, choices=TIPO_CHOICES)
+    referencia = models.CharField(max_length=30)
+    status = models.CharField(max_length=12, choices=STATUS_CHOICES, default="pendente")
+    arquivo = models.CharField(max_length=200, blank=True)
+    erro = models.TextField(blank=True)
+    tentativas = models.PositiveSmallIntegerField(default=0)
+    criado_em = models.DateTimeField(auto_now_add=True)
+    iniciado_em = models.DateTimeField(null=True, blank=True)
+    concluido_em = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["status", "id"], name="tarefapdf_status_idx")]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["tipo", "referencia"], condition=models.Q(status="pendente"), name="tarefapdf_pendente_unica"
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.get_tipo_display()} {self.referencia} ({self.status})"
+
+
+# ----------------------------- LEMBRETES DE COBRANÇA -----------------------------------------
+class LembreteEnviado(models.Model):
+    # Uma linha por parcela lembrada (locação + vencimento), tipo e canal: é o que impede o
+    # reenvio. A linha é gravada como "enviando" antes do envio (manage.py enviar_lembretes)
+    TIPO_CHOICES = [("proximo", "Vence em breve"), ("vencido", "Vencido")]
+    STATUS_CHOICES = [("enviando", "Enviando"), ("enviado", "Enviado"), ("erro", "Erro")]
+
+    # Sem FK no banco: o histórico sobrevive ao arquivamento (locar/arquivo.py), que mantém o id
+    # da locação na restauração; quem apaga de verdade a locação apaga os lembretes (signals.py)
+    locacao = models.ForeignKey(
+        Locacao, on_delete=models.DO_NOTHING, db_constraint=False, related_name="lembretes"
+    )
+    cliente = models.ForeignKey(Cliente, on_delete=models.CASCADE, related_name="lembretes")
+    vencimento = models.DateField()
+    tipo = models.CharField(max_length=10, choices=TIPO_CHOICES)
+    canal = models.CharField(max_length=20)
+    destino = models.CharField(max_length=254)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default="enviando")
+    lote = models.UUIDField()
+    tentativas = models.PositiveSmallIntegerField(default=0)
+    erro = models.TextField(blank=True)
+    criado_em = models.DateTimeField(auto_now_add=True)
+    enviado_em = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            # Registros com erro ficam como histórico e não bloqueiam uma nova tentativa
+            models.UniqueConstraint(
+                fields=["locacao", "vencimento", "tipo", "canal"],
+                condition=~models.Q(status="erro"),
+                name="lembrete_unico_por_parcela",
+            )
+        ]
+        indexes = [models.Index(fields=["lote"], name="lembrete_lote_idx")]
+
+    def __str__(self):
+        return f"Lembrete {self.get_tipo_display()} {self.vencimento} via {self.canal} ({self.status})"
+
+
+# ----------------------------- PERFIS DE REQUISIÇÃO -----------------------------------------
+class PerfilRequisicao(models.Model):
+    # Gravado pelo PerfilMiddleware (locar/perfil.py) quando a equipe pede (?perfil=1 ou
+    # cabeçalho X-Perfil) ou por amostragem; baixado no admin como pstats ou pilhas "collapsed"
+    MOTIVO_CHOICES = [("pedido", "Pedido"), ("amostra", "Amostragem")]
+
+    criado_em = models.DateTimeField(auto_now_add=True)
+    url_nome = models.CharField(max_length=100, blank=True, verbose_name="Rota")
+    caminho = models.CharField(max_length=500)
+    metodo = models.CharField(max_length=10)
+    status = models.PositiveSmallIntegerField()
+    motivo = models.CharField(max_length=10, choices=MOTIVO_CHOICES)
+    usuario = models.ForeignKey(Usuario, null=True, blank=True, on_delete=models.SET_NULL, related_name="+")
+    duracao_ms = models.FloatField(verbose_name="Duração (ms)")
+    consultas = models.PositiveIntegerField(default=0)
+    tempo_sql_ms = models.FloatField(default=0, verbose_name="SQL (ms)")
+    # Consultas mais pesadas, agrupadas pelo SQL sem os parâmetros
+    resumo_sql = models.TextField(blank=True)
+    pstats = models.BinaryField()
+    pilhas = models.TextField(blank=True)
+
+    class Meta:
+        ordering = ["-criado_em"]
+        verbose_name = "Perfil de requisição"
+        verbose_name_plural = "Perfis de requisição"
+
+    def __str__(self):
+        return f"{self.metodo} {self.url_nome or self.caminho} — {self.duracao_ms:.0f} ms"
+
+
+# ----------------------------- CONSULTAS LENTAS -----------------------------------------
+class ConsultaLenta(models.Model):
+    # SQL acima de SQL_LENTO_MS, registrado pelo execute_wrapper de locar/consultas_lentas.py
+    criado_em = models.DateTimeField()
+    impressao_digital = models.CharField(max_length=40)
+    sql = models.TextField()
+    parametros = models.TextField(blank=True)
+    duracao_ms = models.FloatField()
+    origem = models.CharField(max_length=200, blank=True)
+    pilha = models.TextField(blank=True)
+    plano = models.TextField(blank=True)
+
+    class Meta:
+        ordering = ["-criado_em"]
+        indexes = [models.Index(fields=["impressao_digital", "criado_em"], name="consultalenta_digital_idx")]
+
+    def __str__(self):
+        return f"{self.duracao_ms:.0f} ms — {self.sql[:80]}"
+
+
+# ----------------------------- WEBHOOKS -----------------------------------------
+# Outbox: o evento e uma entrega por destino inscrito são gravados na mesma transação da
+# mudança; o envio é do worker (manage.py enviar_webhooks). Ver locar/webhooks.py.
+class DestinoWebhook(models.Model):
+    nome = models.CharField(max_length=100)
+    url = models.URLField(max_length=500)
+    # Chave do HMAC-SHA256 do cabeçalho X-Webhook-Assinatura
+    segredo = models.CharField(max_length=200)
+    # Tipos separados por vírgula (ex.: "pagamento.criado,locacao.encerrada"); vazio = todos
+    eventos = models.CharField(max_length=300, blank=True)
+    ativo = models.BooleanField(default=True)
+    max_concorrencia = models.PositiveSmallIntegerField(
+        default=2, verbose_name="Envios simultâneos", help_text="Lotes em andamento ao mesmo tempo para este destino."
+    )
+    criado_em = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Destino de webhook"
+        verbose_name_plural = "Destinos de webhook"
+
+    def recebe(self, tipo):
+        tipos = {t.strip() for t in self.eventos.split(",") if t.strip()}
+        return not tipos or tipo in tipos
+
+    def __str__(self):
+        return self.nome
+
+
+class EventoWebhook(models.Model):
+    tipo = models.CharField(max_length=50)
+    dados = models.JSONField(encoder=DjangoJSONEncoder)
+    criado_em = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Evento de webhook"
+        verbose_name_plural = "Eventos de webhook"
+
+    def __str__(self):
+        return f"{self.tipo} #{self.id}"
+
+
+class EntregaWebhook(models.Model):
+    # "enviando" com travado_ate vencido é de um worker que morreu no meio: volta a ser reservável.
+    # "morta" (dead letter) não é mais tentada; o admin reenvia.
+    STATUS_CHOICES = [
+        ("pendente", "Pendente"), ("enviando", "Enviando"), ("entregue", "Entregue"), ("morta", "Falhou (dead letter)"),
+    ]
+
+    evento = models.ForeignKey(EventoWebhook, on_delete=models.CASCADE, related_name="entregas")
+    destino = models.ForeignKey(DestinoWebhook, on_delete=models.CASCADE, related_name="entregas")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default="pendente")
+    tentativas = models.PositiveSmallIntegerField(default=0)
+    proxima_tentativa = models.DateTimeField(default=timezone.now)
+    # Lote do envio em andamento (um POST com vários eventos)
+    lote = models.UUIDField(null=True, blank=True)
+    travado_ate = models.DateTimeField(null=True, blank=True)
+    erro = models.TextField(blank=True)
+    entregue_em = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Entrega de webhook"
+        verbose_name_plural = "Entregas de webhook"
+        indexes = [
+            models.Index(fields=["destino", "status", "proxima_tentativa"], name="entregawebhook_fila_idx"),
+            models.Index(fields=["lote"], name="entregawebhook_lote_idx"),
+        ]
 
     def __str__(self):
-        return f"{self.categoria} - {self.veiculo} - {self.valor}"
\ No newline at end of file
+        return f"{self.evento} para {self.destino} ({self.status})"
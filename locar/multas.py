@@ -0,0 +1,281 @@
+import csv
+import re
+from collections import defaultdict
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from django.db import transaction
+from django.db.models import Max, Q
+from django.utils import timezone
+from .models import Veiculo, Locacao, LocacaoArquivada, Despesa
+from .normalizacao import normalizar_placa
+from .versoes import tocar
+from .webhooks import dados_despesa, registrar_eventos
+
+# Importação das multas do DETRAN (CSV com placa, data/hora da infração e valor).
+# Cada multa vira uma Despesa(categoria="multa") ligada ao cliente que estava com o carro:
+# as locações dos veículos do arquivo são lidas de uma vez, ordenadas por início, e cada
+# placa é percorrida junto com suas multas (também ordenadas) — nenhuma consulta por multa.
+
+# dd/mm/aaaa hh:mm[:ss]; o formato ISO é lido por datetime.fromisoformat
+DATA_BR = re.compile(r"(\d{2})/(\d{2})/(\d{4})[ T](\d{2}):(\d{2})(?::(\d{2}))?")
+# Limite de parâmetros por consulta (o SQLite aceita poucos)
+LOTE_CONSULTA = 500
+CAMPOS_RELATORIO = ["linha", "placa", "data_hora", "valor", "auto", "motivo"]
+
+
+def _data_hora(texto, fuso):
+    # Sem strptime nem make_aware por linha: com 100 mil multas são o que mais pesa na leitura
+    encontrado = DATA_BR.fullmatch(texto)
+    try:
+        if encontrado:
+            dia, mes, ano, hora, minuto, segundo = encontrado.groups()
+            momento = datetime(int(ano), int(mes), int(dia), int(hora), int(minuto), int(segundo or 0))
+        else:
+            momento = datetime.fromisoformat(texto)
+    except ValueError:
+        raise ValueError(f"data/hora inválida: {texto!r}")
+    # Horário local (do fuso do projeto), como vem do DETRAN
+    return momento.replace(tzinfo=fuso) if momento.tzinfo is None else momento.astimezone(fuso)
+
+
+def _valor(texto):
+    texto = texto.strip().replace("R$", "").strip()
+    if "," in texto:
+        # 1.234,56
+        texto = texto.replace(".", "").replace(",", ".")
+    try:
+        return Decimal(texto)
+    except InvalidOperation:
+        raise ValueError(f"valor inválido: {texto!r}")
+
+
+def ler_multas(arquivo):
+    """Lê o CSV (separador ; ou ,) e devolve (multas, rejeitadas).
+
+    Colunas: placa, data_hora, valor e, opcionais, auto (número do auto de infração) e descricao.
+    """
+    amostra = arquivo.read(4096)
+    arquivo.seek(0)
+    try:
+        dialeto = csv.Sniffer().sniff(amostra, delimiters=";,")
+    except csv.Error:
+        dialeto = "excel"
+    multas, rejeitadas, autos = [], [], set()
+    fuso = timezone.get_current_timezone()
+    for linha, registro in enumerate(csv.DictReader(arquivo, dialect=dialeto), start=2):
+        registro = {(chave or "").strip().lower(): (valor or "").strip() for chave, valor in registro.items()}
+        multa = {
+            "linha": linha,
+            "placa": normalizar_placa(registro.get("placa")),
+            "auto": registro.get("auto", ""),
+            "descricao": registro.get("descricao", ""),
+            "data_hora": registro.get("data_hora", ""),
+            "valor": registro.get("valor", ""),
+        }
+        try:
+            if not multa["placa"]:
+                raise ValueError("placa em branco")
+            multa["data_hora"] = _data_hora(multa["data_hora"], fuso)
+            multa["valor"] = _valor(multa["valor"])
+        except ValueError as exc:
+            rejeitadas.append({**multa, "motivo": str(exc)})
+            continue
+        if multa["auto"]:
+            if multa["auto"] in autos:
+                rejeitadas.append({**multa, "motivo": "auto repetido no arquivo"})
+                continue
+            autos.add(multa["auto"])
+        multas.append(multa)
+    return multas, rejeitadas
+
+
+def _em_lotes(itens):
+    itens = list(itens)
+    for inicio in range(0, len(itens), LOTE_CONSULTA):
+        yield itens[inicio:inicio + LOTE_CONSULTA]
+
+
+def veiculos_por_placa(placas):
+    veiculos = {}
+    for lote in _em_lotes(placas):
+        veiculos.update(
+            Veiculo.objects.filter(placa_normalizada__in=lote).values_list("placa_normalizada", "id")
+        )
+    return veiculos
+
+
+def _chave_sem_auto(multa):
+    return multa["veiculo_id"], multa["data_hora"].date(), multa["valor"]
+
+
+def ja_importadas(multas):
+    """(autos, chaves) das multas do arquivo já lançadas; chaves são (veiculo_id, data, valor) das sem auto."""
+    autos = set()
+    for lote in _em_lotes({multa["auto"] for multa in multas if multa["auto"]}):
+        autos.update(Despesa.objects.filter(auto_infracao__in=lote).values_list("auto_infracao", flat=True))
+
+    procuradas = {_chave_sem_auto(multa) for multa in multas if not multa["auto"]}
+    chaves = set()
+    if procuradas:
+        datas = [data for _, data, _ in procuradas]
+        for lote in _em_lotes({veiculo_id for veiculo_id, _, _ in procuradas}):
+            chaves.update(
+                chave
+                for chave in Despesa.objects.filter(
+                    categoria="multa", auto_infracao="", veiculo_id__in=lote, data__range=(min(datas), max(datas))
+                ).values_list("veiculo_id", "data", "valor")
+                if chave in procuradas
+            )
+    return autos, chaves
+
+
+def inseridas(multas, apos_id):
+    """Despesas com id acima de apos_id que correspondem às multas (as lançadas por esta importação)."""
+    autos = {multa["auto"] for multa in multas if multa["auto"]}
+    chaves = {_chave_sem_auto(multa) for multa in multas if not multa["auto"]}
+    despesas = []
+    for lote in _em_lotes({multa["veiculo_id"] for multa in multas}):
+        despesas.extend(
+            despesa
+            for despesa in Despesa.objects.filter(pk__gt=apos_id, categoria="multa", veiculo_id__in=lote)
+            if (despesa.auto_infracao in autos if despesa.auto_infracao
+                else (despesa.veiculo_id, despesa.data, despesa.valor) in chaves)
+        )
+    return despesas
+
+
+def intervalos_por_veiculo(veiculo_ids, de, ate):
+    """Locações (ativas e arquivadas) dos veículos que cruzam [de, ate], ordenadas por início.
+
+    Cada intervalo é (inicio, fim ou None se em andamento, cliente_id, locacao_id).
+    """
+    intervalos = defaultdict(list)
+    for modelo in (Locacao, LocacaoArquivada):
+        for lote in _em_lotes(veiculo_ids):
+            linhas = (
+                modelo.objects.filter(veiculo_id__in=lote, inicio__lte=ate)
+                # Em andamento o fim é só a previsão: o carro continua com o cliente
+                .filter(Q(fim__gte=de) | Q(status="andamento"))
+                .values_list("veiculo_id", "inicio", "fim", "status", "cliente_id", "id")
+            )
+            for veiculo_id, inicio, fim, status, cliente_id, locacao_id in linhas:
+                intervalos[veiculo_id].append((inicio, None if status == "andamento" else fim, cliente_id, locacao_id))
+    for lista in intervalos.values():
+        lista.sort()
+    return intervalos
+
+
+def casar_multas(multas, intervalos):
+    """Varredura das multas e locações de cada veículo em ordem de data.
+
+    Preenche multa["cliente_id"]/multa["locacao_id"] (None se ninguém estava com o carro).
+    """
+    por_veiculo = defaultdict(list)
+    for multa in multas:
+        por_veiculo[multa["veiculo_id"]].append(multa)
+
+    for veiculo_id, lista in por_veiculo.items():
+        lista.sort(key=lambda multa: multa["data_hora"])
+        locacoes = intervalos.get(veiculo_id, [])
+        proxima, atual = 0, None
+        for multa in lista:
+            momento = multa["data_hora"]
+            # Avança até a última locação iniciada antes da infração
+            while proxima < len(locacoes) and locacoes[proxima][0] <= momento:
+                atual = locacoes[proxima]
+                proxima += 1
+            if atual is not None and (atual[1] is None or momento <= atual[1]):
+                multa["cliente_id"], multa["locacao_id"] = atual[2], atual[3]
+            else:
+                multa["cliente_id"] = multa["locacao_id"] = None
+
+
+def _descricao(multa):
+    partes = ["Multa"]
+    if multa["auto"]:
+        partes.append(f"AIT {multa['auto']}")
+    partes.append(f"em {multa['data_hora']:%d/%m/%Y %H:%M}")
+    if multa["locacao_id"]:
+        partes.append(f"(locação #{multa['locacao_id']})")
+    if multa["descricao"]:
+        partes.append(f"— {multa['descricao']}")
+    return " ".join(partes)[:400]
+
+
+def importar_multas(arquivo, simular=False):
+    """Importa as multas do arquivo. Devolve (resumo, pendentes) — pendentes vai para o relatório."""
+    multas, pendentes = ler_multas(arquivo)
+    resumo = {"lidas": len(multas) + len(pendentes), "criadas": 0, "com_cliente": 0, "sem_locacao": 0}
+
+    veiculos = veiculos_por_placa({multa["placa"] for multa in multas})
+    cadastradas = []
+    for multa in multas:
+        multa["veiculo_id"] = veiculos.get(multa["placa"])
+        if multa["veiculo_id"] is None:
+            pendentes.append({**multa, "motivo": "placa não cadastrada"})
+        else:
+            cadastradas.append(multa)
+
+    # Reimportação do mesmo arquivo: autos já lançados são ignorados; multas sem auto são
+    # reconhecidas por veículo (placa), dia e valor
+    autos, sem_auto = ja_importadas(cadastradas)
+    encontradas = []
+    for multa in cadastradas:
+        ja_lancada = multa["auto"] in autos if multa["auto"] else _chave_sem_auto(multa) in sem_auto
+        if ja_lancada:
+            pendentes.append({**multa, "motivo": "já importada"})
+        else:
+            encontradas.append(multa)
+
+    if encontradas:
+        momentos = [multa["data_hora"] for multa in encontradas]
+        intervalos = intervalos_por_veiculo(set(veiculos.values()), min(momentos), max(momentos))
+        casar_multas(encontradas, intervalos)
+
+    for multa in encontradas:
+        if multa["cliente_id"] is None:
+            # A despesa é lançada no veículo mesmo assim; fica no relatório para conferência
+            resumo["sem_locacao"] += 1
+            pendentes.append({**multa, "motivo": "nenhuma locação no horário (lançada sem cliente)"})
+        else:
+            resumo["com_cliente"] += 1
+
+    if not simular and encontradas:
+        with transaction.atomic():
+            # Com ignore_conflicts o bulk_create não devolve os ids: os eventos saem das linhas acima
+            # do maior id de antes da inserção (e não de todas as despesas com os mesmos autos)
+            apos_id = Despesa.objects.aggregate(maior=Max("id"))["maior"] or 0
+            Despesa.objects.bulk_create(
+                [
+                    Despesa(
+                        veiculo_id=multa["veiculo_id"],
+                        cliente_id=multa["cliente_id"],
+                        categoria="multa",
+                        descricao=_descricao(multa),
+                        data=multa["data_hora"].date(),
+                        valor=multa["valor"],
+                        auto_infracao=multa["auto"],
+                    )
+                    for multa in encontradas
+                ],
+                batch_size=1000,
+                ignore_conflicts=True,
+            )
+            # bulk_create não dispara sinais
+            tocar(Despesa)
+            registrar_eventos("despesa.registrada", [dados_despesa(d) for d in inseridas(encontradas, apos_id)])
+    resumo["criadas"] = len(encontradas)
+
+    pendentes.sort(key=lambda multa: multa["linha"])
+    return resumo, pendentes
+
+
+def escrever_relatorio(saida, pendentes):
+    escritor = csv.DictWriter(saida, fieldnames=CAMPOS_RELATORIO, delimiter=";", extrasaction="ignore")
+    escritor.writeheader()
+    for multa in pendentes:
+        data_hora = multa["data_hora"]
+        escritor.writerow({
+            **multa,
+            "data_hora": f"{data_hora:%d/%m/%Y %H:%M:%S}" if isinstance(data_hora, datetime) else data_hora,
+        })
@@ -0,0 +1,73 @@
+import re
+import unicodedata
+from django.db.models import CharField, Lookup, Q
+from django.db.models.lookups import StartsWith
+
+# Colunas "sombra" normalizadas (Cliente.cpf_normalizado, Veiculo.placa_normalizada...):
+# preenchidas no save() e indexadas, para que buscas exatas e por prefixo usem o índice
+# em vez de icontains sobre o valor como foi digitado.
+
+
+# Termo de busca que é um CPF/CNH (com ou sem pontuação)
+DOCUMENTO = re.compile(r"[\d.\-/ ]*\d[\d.\-/ ]*")
+
+
+def so_digitos(valor):
+    # 123.456.789-00 -> 12345678900
+    return re.sub(r"\D", "", valor or "")
+
+
+def normalizar_placa(placa):
+    # ABC-1234, abc1d23, "ABC 1D23" -> ABC1234 / ABC1D23 (formato antigo e Mercosul)
+    return re.sub(r"[^A-Z0-9]", "", (placa or "").upper())
+
+
+def normalizar_nome(nome):
+    # "  José  da Conceição" -> "jose da conceicao"
+    sem_acento = unicodedata.normalize("NFKD", nome or "").encode("ascii", "ignore").decode()
+    return " ".join(sem_acento.lower().split())
+
+
+@CharField.register_lookup
+class Prefixo(Lookup):
+    """`campo__prefixo=valor`: começa com valor, usando o índice da coluna.
+
+    No PostgreSQL é o startswith (LIKE 'x%' usa o índice varchar_pattern_ops criado com o
+    db_index). No SQLite o LIKE só usaria o índice com collation NOCASE, então vira a faixa
+    valor <= campo < valor + U+FFFF, que é uma busca no índice. Só para valores normalizados
+    (dígitos, A-Z): não há curingas para escapar.
+    """
+
+    lookup_name = "prefixo"
+
+    def as_sql(self, compiler, connection):
+        return StartsWith(self.lhs, self.rhs).as_sql(compiler, connection)
+
+    def as_sqlite(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        params = (*lhs_params, *rhs_params, *lhs_params, *(valor + "\uffff" for valor in rhs_params))
+        return f"({lhs} >= {rhs} AND {lhs} < {rhs})", params
+
+
+def busca_cliente(q, prefixo=""):
+    """Filtro da busca de clientes: nome sem acento/caixa; CPF e CNH por prefixo dos dígitos."""
+    documento = Q(**{f"{prefixo}cpf_normalizado__prefixo": so_digitos(q)}) | Q(
+        **{f"{prefixo}cnh_normalizada__prefixo": so_digitos(q)}
+    )
+    if DOCUMENTO.fullmatch(q.strip()):
+        # Só dígitos e pontuação: nenhum nome casaria, e sem o nome no OR as duas faixas usam os índices
+        return documento
+    filtro = Q(**{f"{prefixo}nome_normalizado__contains": normalizar_nome(q)})
+    if so_digitos(q):
+        filtro |= documento
+    return filtro
+
+
+def busca_veiculo(q, prefixo=""):
+    """Filtro da busca de veículos: placa por prefixo (sem separadores), marca/modelo por trecho."""
+    filtro = Q(**{f"{prefixo}modelo__icontains": q}) | Q(**{f"{prefixo}marca__icontains": q})
+    placa = normalizar_placa(q)
+    if placa:
+        filtro |= Q(**{f"{prefixo}placa_normalizada__prefixo": placa})
+    return filtro
@@ -0,0 +1,114 @@
+import numpy as np
+from django.db.models import Q
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from .models import Veiculo, Locacao, LocacaoArquivada
+from .relatorios import limites_periodo
+
+# Ocupação da frota calculada com NumPy: as locações viram intervalos de dias (inteiros)
+# e a matriz veículo x dia sai de um vetor de diferenças + cumsum, sem loop em Python.
+
+
+def matriz_ocupacao(indices_veiculo, inicios, fins, n_veiculos, n_dias):
+    """Matriz booleana (n_veiculos x n_dias); inicios/fins são índices de dia inclusivos."""
+    inicios = np.clip(inicios, 0, n_dias)
+    fins = np.clip(fins + 1, 0, n_dias)
+    validos = inicios < fins
+
+    diferencas = np.zeros((n_veiculos, n_dias + 1), dtype=np.int32)
+    np.add.at(diferencas, (indices_veiculo[validos], inicios[validos]), 1)
+    np.add.at(diferencas, (indices_veiculo[validos], fins[validos]), -1)
+    return np.cumsum(diferencas[:, :n_dias], axis=1) > 0
+
+
+def resumir_ocupacao(ocupado, inicio_ativo, grupos):
+    """Taxas por veículo, por grupo (modelo) e da frota por dia.
+
+    `inicio_ativo` é o primeiro dia em que cada veículo fazia parte da frota e `grupos`
+    o índice do modelo de cada veículo.
+    """
+    n_veiculos, n_dias = ocupado.shape
+    inicio_ativo = np.clip(inicio_ativo, 0, n_dias)
+    dias = np.arange(n_dias)
+    ativo = dias[np.newaxis, :] >= inicio_ativo[:, np.newaxis]
+    ocupado = ocupado & ativo
+
+    dias_ocupados = ocupado.sum(axis=1)
+    dias_ativos = n_dias - inicio_ativo
+    por_veiculo = np.divide(dias_ocupados, dias_ativos, out=np.zeros(n_veiculos), where=dias_ativos > 0)
+
+    n_grupos = int(grupos.max()) + 1 if n_veiculos else 0
+    ocupados_grupo = np.bincount(grupos, weights=dias_ocupados, minlength=n_grupos)
+    ativos_grupo = np.bincount(grupos, weights=dias_ativos, minlength=n_grupos)
+    por_grupo = np.divide(ocupados_grupo, ativos_grupo, out=np.zeros(n_grupos), where=ativos_grupo > 0)
+
+    frota_ativa = np.cumsum(np.bincount(inicio_ativo, minlength=n_dias + 1)[:n_dias])
+    frota_ocupada = ocupado.sum(axis=0)
+    por_dia = np.divide(frota_ocupada, frota_ativa, out=np.zeros(n_dias), where=frota_ativa > 0)
+
+    return {
+        "dias_ocupados": dias_ocupados,
+        "por_veiculo": por_veiculo,
+        "por_grupo": por_grupo,
+        "por_dia": por_dia,
+        "frota_ocupada": frota_ocupada,
+        "frota_ativa": frota_ativa,
+    }
+
+
+def ocupacao_frota(data_inicio, data_fim):
+    """Carrega veículos e locações em duas consultas `values_list` e calcula a ocupação diária."""
+    inicio, fim = limites_periodo(data_inicio, data_fim)
+    n_dias = (data_fim - data_inicio).days + 1
+    origem = np.datetime64(data_inicio, "D")
+
+    veiculos = list(
+        Veiculo.objects.order_by("id")
+        .values_list("id", "placa", "marca", "modelo", TruncDate("criado_em"))
+    )
+    locacoes = [
+        linha
+        for modelo in (Locacao, LocacaoArquivada)
+        # Em andamento com o fim previsto antes do período: o carro continua fora (ver abaixo)
+        for linha in modelo.objects.filter(veiculo__isnull=False, inicio__lt=fim)
+        .filter(Q(fim__gte=inicio) | Q(status="andamento"))
+        .values_list("veiculo_id", TruncDate("inicio"), TruncDate("fim"), "status")
+    ]
+
+    ids = np.fromiter((v[0] for v in veiculos), dtype=np.int64, count=len(veiculos))
+    criado = np.array([v[4] for v in veiculos], dtype="datetime64[D]")
+    inicio_ativo = np.maximum((criado - origem).astype(np.int64), 0)
+
+    # Agrupamento por marca + modelo
+    nomes_grupo, grupos = np.unique(np.array([f"{v[2]} {v[3]}" for v in veiculos], dtype=str), return_inverse=True)
+
+    if locacoes:
+        veic_loc, ini_loc, fim_loc, status_loc = zip(*locacoes)
+        indices = np.searchsorted(ids, np.array(veic_loc, dtype=np.int64))
+        inicios = (np.array(ini_loc, dtype="datetime64[D]") - origem).astype(np.int64)
+        fins = (np.array(fim_loc, dtype="datetime64[D]") - origem).astype(np.int64)
+        # Locação em andamento com fim vencido: o carro continua fora até hoje
+        hoje = (np.datetime64(timezone.localdate(), "D") - origem).astype(np.int64)
+        em_andamento = np.array(status_loc, dtype=object) == "andamento"
+        fins = np.where(em_andamento, np.maximum(fins, hoje), fins)
+    else:
+        indices = inicios = fins = np.zeros(0, dtype=np.int64)
+
+    ocupado = matriz_ocupacao(indices, inicios, fins, len(ids), n_dias)
+    resumo = resumir_ocupacao(ocupado, inicio_ativo, grupos)
+
+    datas = origem + np.arange(n_dias)
+    return {
+        "veiculos": [
+            {"id": v[0], "placa": v[1], "marca": v[2], "modelo": v[3],
+             "dias_ocupados": int(d), "taxa": round(float(t) * 100, 1)}
+            for v, d, t in zip(veiculos, resumo["dias_ocupados"], resumo["por_veiculo"])
+        ],
+        "modelos": [
+            {"modelo": nome, "taxa": round(float(t) * 100, 1)}
+            for nome, t in zip(nomes_grupo, resumo["por_grupo"])
+        ],
+        "dias": [str(d) for d in datas],
+        "frota_por_dia": [round(float(t) * 100, 1) for t in resumo["por_dia"]],
+        "frota_media": round(float(resumo["frota_ocupada"].sum()) / max(int(resumo["frota_ativa"].sum()), 1) * 100, 1),
+    }
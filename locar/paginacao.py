@@ -0,0 +1,88 @@
+import hashlib
+import json
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import QuerySet
+from django.utils.functional import cached_property
+from .versoes import versoes
+
+# Acima deste número de linhas a estimativa do banco substitui o COUNT(*) exato
+LIMITE_CONTAGEM_EXATA = 10000
+CONTAGEM_CACHE_TIMEOUT = 60
+
+
+def estimativa_tabela(modelo, using="default"):
+    """Número aproximado de linhas da tabela segundo as estatísticas do banco (None se não houver)."""
+    connection = connections[using]
+    tabela = modelo._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == "postgresql":
+            cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(%s)", [tabela])
+        elif connection.vendor == "sqlite":
+            # sqlite_stat1 só existe depois de um ANALYZE
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_stat1'")
+            if cursor.fetchone() is None:
+                return None
+            cursor.execute("SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1", [tabela])
+        else:
+            return None
+        linha = cursor.fetchone()
+    if not linha or linha[0] is None:
+        return None
+    total = int(str(linha[0]).split()[0])
+    # reltuples = -1: tabela nunca analisada
+    return total if total >= 0 else None
+
+
+def estimativa_consulta(queryset):
+    """Linhas estimadas pelo planejador para um queryset filtrado (só PostgreSQL expõe a estimativa)."""
+    connection = connections[queryset.db]
+    if connection.vendor != "postgresql":
+        return None
+    sql, params = queryset.order_by().query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute("EXPLAIN (FORMAT JSON) " + sql, params)
+        plano = cursor.fetchone()[0]
+    if isinstance(plano, str):
+        plano = json.loads(plano)
+    return int(plano[0]["Plan"]["Plan Rows"])
+
+
+class PaginadorEstimado(Paginator):
+    """Paginator que troca o COUNT(*) pela estimativa do banco quando o resultado é grande.
+
+    Sem filtro usa as estatísticas da tabela; com filtro, o EXPLAIN (PostgreSQL). Abaixo de
+    LIMITE_CONTAGEM_EXATA conta de verdade. O resultado fica em cache por filtro e versão da tabela.
+    """
+
+    estimado = False
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not isinstance(queryset, QuerySet):
+            return super().count
+
+        chave = self._chave_cache(queryset)
+        em_cache = cache.get(chave)
+        if em_cache is not None:
+            total, self.estimado = em_cache
+            return total
+
+        if queryset.query.where:
+            estimativa = estimativa_consulta(queryset)
+        else:
+            estimativa = estimativa_tabela(queryset.model, queryset.db)
+        if estimativa is not None and estimativa > LIMITE_CONTAGEM_EXATA:
+            total, self.estimado = estimativa, True
+        else:
+            total = super().count
+        cache.set(chave, (total, self.estimado), CONTAGEM_CACHE_TIMEOUT)
+        return total
+
+    def _chave_cache(self, queryset):
+        sql, params = queryset.order_by().query.sql_with_params()
+        versao = versoes(queryset.model).get(queryset.model._meta.label_lower, (0, None))[0]
+        assinatura = hashlib.md5(f"{sql}|{params}".encode()).hexdigest()
+        return f"contagem:{queryset.model._meta.label_lower}:{versao}:{assinatura}"
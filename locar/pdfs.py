@@ -0,0 +1,223 @@
+import hashlib
+import io
+import json
+import logging
+from datetime import date, timedelta
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q
+from django.template.loader import get_template
+from django.utils import timezone
+from .models import Cliente, Locacao, Pagamento, PagamentoArquivado, TarefaPdf
+
+# Contratos e recibos em PDF. Os dados de cada documento são lidos com values() e passados
+# ao template como estão; o hash desses dados (mais o fonte do template) dá o nome do arquivo,
+# então um PDF só é renderizado de novo quando algo que aparece nele mudou.
+
+logger = logging.getLogger(__name__)
+
+TEMPLATES = {
+    "contrato": "pdfs/contrato.html",
+    "recibo": "pdfs/recibo.html",
+    "recibos_mes": "pdfs/recibos_mes.html",
+}
+MAX_TENTATIVAS = 3
+# Reserva de um worker que morreu no meio da renderização expira depois disso
+TEMPO_MAXIMO = timedelta(minutes=10)
+
+CAMPOS_CLIENTE = ["id", "nome", "cpf", "data_nascimento", "telefone", "email", "endereco", "cnh_numero", "cnh_validade"]
+CAMPOS_VEICULO = ["marca", "modelo", "ano", "placa", "renavam", "chassi"]
+CAMPOS_LOCACAO = [
+    "id", "inicio", "fim", "km_inicio", "valor_semanal", "quantidade_semanas", "caucao", "forma_pagamento",
+]
+
+
+def _prefixados(prefixo, campos):
+    return [f"{prefixo}__{campo}" for campo in campos]
+
+
+def _separar(linha, prefixo):
+    return {chave[len(prefixo) + 2:]: valor for chave, valor in linha.items() if chave.startswith(prefixo + "__")}
+
+
+def _dados_contrato(referencia):
+    linha = (
+        Locacao.objects.filter(pk=int(referencia))
+        .values(*CAMPOS_LOCACAO, *_prefixados("cliente", CAMPOS_CLIENTE), *_prefixados("veiculo", CAMPOS_VEICULO))
+        .get()
+    )
+    locacao = {campo: linha[campo] for campo in CAMPOS_LOCACAO}
+    locacao["forma_pagamento"] = dict(Locacao.FORMA_PAGAMENTO_CHOICES).get(locacao["forma_pagamento"])
+    locacao["valor_total"] = locacao["valor_semanal"] * locacao["quantidade_semanas"]
+    return {"locacao": locacao, "cliente": _separar(linha, "cliente"), "veiculo": _separar(linha, "veiculo")}
+
+
+def _dados_recibo(referencia):
+    linha = (
+        Pagamento.objects.filter(pk=int(referencia))
+        .values(
+            "id", "data", "valor", "locacao_id",
+            *_prefixados("locacao__cliente", ["nome", "cpf"]),
+            *_prefixados("locacao__veiculo", ["modelo", "placa"]),
+        )
+        .get()
+    )
+    return {
+        "pagamento": {"id": linha["id"], "data": linha["data"], "valor": linha["valor"], "locacao": linha["locacao_id"]},
+        "cliente": _separar(linha, "locacao__cliente"),
+        "veiculo": _separar(linha, "locacao__veiculo"),
+    }
+
+
+def _proximo_mes(inicio):
+    return (inicio.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def _dados_recibos_mes(referencia):
+    # referencia: "<cliente_id>:<AAAA-MM>"
+    cliente_id, mes = referencia.split(":")
+    inicio = date.fromisoformat(f"{mes}-01")
+    fim = _proximo_mes(inicio)
+    cliente = Cliente.objects.filter(pk=int(cliente_id)).values(*CAMPOS_CLIENTE).get()
+
+    pagamentos = []
+    for modelo in (Pagamento, PagamentoArquivado):
+        pagamentos += modelo.objects.filter(
+            locacao__cliente_id=cliente["id"], data__date__gte=inicio, data__date__lt=fim
+        ).values("id", "data", "valor", "locacao_id", placa=F("locacao__veiculo__placa"))
+    pagamentos.sort(key=lambda p: (p["data"], p["id"]))
+    return {
+        "cliente": cliente,
+        "mes": inicio,
+        "pagamentos": pagamentos,
+        "total": sum((p["valor"] for p in pagamentos), 0),
+    }
+
+
+DADOS = {"contrato": _dados_contrato, "recibo": _dados_recibo, "recibos_mes": _dados_recibos_mes}
+
+
+def dados_pdf(tipo, referencia):
+    """Contexto do template e nome do arquivo (pdfs/<tipo>/<hash>.pdf). Levanta DoesNotExist."""
+    dados = DADOS[tipo](referencia)
+    fonte = "".join(get_template(nome).template.source for nome in (TEMPLATES[tipo], "pdfs/_estilo.html"))
+    assinatura = hashlib.sha256(
+        (fonte + json.dumps(dados, sort_keys=True, default=str)).encode()
+    ).hexdigest()
+    return dados, f"pdfs/{tipo}/{assinatura}.pdf"
+
+
+def renderizar_pdf(template_name, contexto):
+    # Importado aqui: só os workers (gerar_pdfs) carregam a biblioteca de PDF
+    from xhtml2pdf import pisa
+
+    html = get_template(template_name).render(contexto)
+    saida = io.BytesIO()
+    resultado = pisa.CreatePDF(html, dest=saida, encoding="utf-8")
+    if resultado.err:
+        raise ValueError(f"Falha ao gerar {template_name}: {resultado.err} erro(s)")
+    return saida.getvalue()
+
+
+def gerar_pdf(tipo, referencia):
+    """Gera o PDF se ainda não existir um para os dados atuais; devolve o nome no storage."""
+    dados, nome = dados_pdf(tipo, referencia)
+    if not default_storage.exists(nome):
+        conteudo = renderizar_pdf(TEMPLATES[tipo], {**dados, "gerado_em": timezone.now()})
+        default_storage.save(nome, ContentFile(conteudo))
+    return nome
+
+
+def enfileirar(tipo, referencia):
+    # Já existe uma tarefa pendente igual: a restrição única parcial descarta a duplicata
+    TarefaPdf.objects.bulk_create([TarefaPdf(tipo=tipo, referencia=str(referencia))], ignore_conflicts=True)
+
+
+def enfileirar_recibos_mes(ano, mes):
+    """Uma tarefa de recibos por cliente que teve pagamento no mês. Devolve quantas foram criadas."""
+    inicio = date(ano, mes, 1)
+    fim = _proximo_mes(inicio)
+    clientes = set()
+    for modelo in (Pagamento, PagamentoArquivado):
+        clientes.update(
+            modelo.objects.filter(data__date__gte=inicio, data__date__lt=fim)
+            .values_list("locacao__cliente_id", flat=True)
+            .distinct()
+        )
+    referencia = f"{inicio:%Y-%m}"
+    TarefaPdf.objects.bulk_create(
+        [TarefaPdf(tipo="recibos_mes", referencia=f"{cliente_id}:{referencia}") for cliente_id in sorted(clientes)],
+        ignore_conflicts=True,
+        batch_size=500,
+    )
+    return len(clientes)
+
+
+def _concluir(tarefa, nome):
+    tarefa.status = "concluida"
+    tarefa.arquivo = nome
+    tarefa.erro = ""
+    tarefa.concluido_em = timezone.now()
+    tarefa.save()
+    # Versões anteriores do mesmo documento não são mais servidas
+    antigas = TarefaPdf.objects.filter(tipo=tarefa.tipo, referencia=tarefa.referencia, status="concluida").exclude(pk=tarefa.pk)
+    arquivos = set(antigas.exclude(arquivo=nome).values_list("arquivo", flat=True))
+    antigas.delete()
+
+    def apagar_arquivos():
+        for arquivo in arquivos:
+            default_storage.delete(arquivo)
+
+    # Arquivos só saem depois do commit, fora da transação
+    transaction.on_commit(apagar_arquivos)
+
+
+def _reservaveis(agora):
+    return Q(status="pendente") | Q(status="processando", iniciado_em__lt=agora - TEMPO_MAXIMO)
+
+
+def _reservar(tarefa_id):
+    # UPDATE condicional e curto: de vários workers só um reserva a tarefa, e a transação não fica
+    # aberta durante a renderização (no SQLite ela travaria o banco inteiro)
+    agora = timezone.now()
+    if not TarefaPdf.objects.filter(_reservaveis(agora), pk=tarefa_id).update(status="processando", iniciado_em=agora):
+        return None
+    return TarefaPdf.objects.get(pk=tarefa_id)
+
+
+def _falhar(tarefa, exc):
+    tarefa.tentativas += 1
+    tarefa.erro = str(exc)
+    tarefa.status = "erro" if tarefa.tentativas >= MAX_TENTATIVAS else "pendente"
+    try:
+        with transaction.atomic():
+            tarefa.save()
+    except IntegrityError:
+        # O documento foi enfileirado de novo durante a renderização: a tarefa nova o cobre
+        tarefa.delete()
+
+
+def processar_fila(lote=20):
+    """Processa até `lote` tarefas pendentes; devolve quantas foram processadas (com sucesso ou não)."""
+    processadas = 0
+    ids = list(TarefaPdf.objects.filter(_reservaveis(timezone.now())).order_by("id").values_list("id", flat=True)[:lote])
+    for tarefa_id in ids:
+        tarefa = _reservar(tarefa_id)
+        if tarefa is None:
+            continue
+        processadas += 1
+        # Renderização e gravação do arquivo fora de transação
+        try:
+            nome = gerar_pdf(tarefa.tipo, tarefa.referencia)
+        except (Locacao.DoesNotExist, Pagamento.DoesNotExist, Cliente.DoesNotExist):
+            # Registro apagado depois de enfileirado
+            tarefa.delete()
+            continue
+        except Exception as exc:
+            logger.exception("Erro ao gerar PDF %s %s", tarefa.tipo, tarefa.referencia)
+            _falhar(tarefa, exc)
+            continue
+        with transaction.atomic():
+            _concluir(tarefa, nome)
+    return processadas
@@ -0,0 +1,154 @@
+import cProfile
+import io
+import logging
+import marshal
+import os
+import pstats
+import random
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from django.conf import settings
+from django.db import connection
+from .models import PerfilRequisicao
+
+# Perfil de uma requisição sob demanda: a equipe acrescenta ?perfil=1 (ou o cabeçalho X-Perfil)
+# à página lenta, ou PERFIL_AMOSTRAGEM sorteia uma fração das requisições. O perfil guarda o
+# cProfile (pstats), as pilhas amostradas (formato "collapsed" dos flamegraphs) e um resumo do SQL.
+# Sem pedido nem sorteio o middleware só faz duas verificações baratas e segue.
+
+logger = logging.getLogger(__name__)
+
+
+class ColetorSql:
+    """execute_wrapper que soma tempo e quantidade por SQL (sem os parâmetros)."""
+
+    def __init__(self):
+        self.total = 0
+        self.tempo_ms = 0.0
+        self.por_sql = defaultdict(lambda: [0, 0.0])
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duracao = (time.perf_counter() - inicio) * 1000
+            self.total += 1
+            self.tempo_ms += duracao
+            item = self.por_sql[sql]
+            item[0] += 1
+            item[1] += duracao
+
+    def resumo(self, limite=15):
+        mais_pesadas = sorted(self.por_sql.items(), key=lambda item: item[1][1], reverse=True)[:limite]
+        return "\n".join(f"{tempo:8.1f} ms {vezes:4}x  {sql[:500]}" for sql, (vezes, tempo) in mais_pesadas)
+
+
+class AmostradorPilhas(threading.Thread):
+    """Lê a pilha da thread da requisição a cada `intervalo` segundos."""
+
+    def __init__(self, thread_id, intervalo):
+        super().__init__(daemon=True)
+        self.thread_id = thread_id
+        self.intervalo = intervalo
+        self.pilhas = Counter()
+        self.parar = threading.Event()
+
+    def run(self):
+        while not self.parar.wait(self.intervalo):
+            frame = sys._current_frames().get(self.thread_id)
+            quadros = []
+            while frame is not None:
+                codigo = frame.f_code
+                quadros.append(f"{codigo.co_name} ({os.path.basename(codigo.co_filename)}:{codigo.co_firstlineno})")
+                frame = frame.f_back
+            if quadros:
+                self.pilhas[";".join(reversed(quadros))] += 1
+
+    def collapsed(self):
+        # Uma linha por pilha: "raiz;...;folha amostras" (flamegraph.pl, speedscope, inferno)
+        return "\n".join(f"{pilha} {amostras}" for pilha, amostras in self.pilhas.most_common())
+
+
+def texto_pstats(dados, limite=30, ordem="cumulative"):
+    """Tabela das funções mais caras a partir do pstats gravado."""
+    saida = io.StringIO()
+    estatisticas = pstats.Stats(stream=saida)
+    estatisticas.stats = marshal.loads(dados)
+    estatisticas.get_top_level_stats()
+    estatisticas.sort_stats(ordem).print_stats(limite)
+    return saida.getvalue()
+
+
+class PerfilMiddleware:
+    # Deve vir depois do AuthenticationMiddleware (o pedido explícito exige usuário da equipe)
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.amostragem = settings.PERFIL_AMOSTRAGEM
+
+    def __call__(self, request):
+        motivo = self._motivo(request)
+        if motivo is None:
+            return self.get_response(request)
+        return self._perfilar(request, motivo)
+
+    def _motivo(self, request):
+        if settings.PERFIL_PARAMETRO in request.GET or "HTTP_X_PERFIL" in request.META:
+            return "pedido" if request.user.is_staff else None
+        if self.amostragem and random.random() < self.amostragem:
+            return "amostra"
+        return None
+
+    def _perfilar(self, request, motivo):
+        perfil = cProfile.Profile()
+        coletor = ColetorSql()
+        amostrador = AmostradorPilhas(threading.get_ident(), settings.PERFIL_INTERVALO_AMOSTRA)
+        try:
+            perfil.enable()
+        except ValueError:
+            # Já existe um profiler ativo nesta thread
+            return self.get_response(request)
+        amostrador.start()
+        inicio = time.perf_counter()
+        try:
+            with connection.execute_wrapper(coletor):
+                response = self.get_response(request)
+        finally:
+            perfil.disable()
+            amostrador.parar.set()
+        duracao = (time.perf_counter() - inicio) * 1000
+        amostrador.join()
+
+        try:
+            registro = self._gravar(request, response, motivo, duracao, perfil, coletor, amostrador)
+        except Exception:
+            # O perfil nunca derruba a página
+            logger.exception("Falha ao gravar o perfil de %s", request.path)
+        else:
+            response["X-Perfil-Id"] = str(registro.pk)
+        return response
+
+    def _gravar(self, request, response, motivo, duracao, perfil, coletor, amostrador):
+        estatisticas = pstats.Stats(perfil)
+        correspondencia = request.resolver_match
+        usuario = getattr(request, "user", None)
+        registro = PerfilRequisicao.objects.create(
+            url_nome=(correspondencia.view_name if correspondencia else "")[:100],
+            caminho=request.get_full_path()[:500],
+            metodo=request.method,
+            status=response.status_code,
+            motivo=motivo,
+            usuario=usuario if usuario is not None and usuario.is_authenticated else None,
+            duracao_ms=round(duracao, 2),
+            consultas=coletor.total,
+            tempo_sql_ms=round(coletor.tempo_ms, 2),
+            resumo_sql=coletor.resumo(),
+            pstats=marshal.dumps(estatisticas.stats),
+            pilhas=amostrador.collapsed(),
+        )
+        # Guarda só os PERFIL_MAXIMO mais recentes
+        PerfilRequisicao.objects.filter(pk__lte=registro.pk - settings.PERFIL_MAXIMO).delete()
+        return registro
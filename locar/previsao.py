@@ -0,0 +1,109 @@
+import numpy as np
+from datetime import timedelta
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber, TruncDate
+from django.utils import timezone
+from .models import Locacao, Pagamento
+
+# Previsão de recebimentos: todas as parcelas em aberto das locações em andamento são
+# expandidas em vetores NumPy (uma posição por parcela) e somadas por dia com bincount.
+
+HISTORICO_ATRASO_DIAS = 730
+ATRASO_MAXIMO_DIAS = 60
+EPOCA = np.datetime64("1970-01-01", "D")
+
+
+def expandir_parcelas(inicios, valores, quantidades, pagas):
+    """Vencimento (dia, inteiro) e valor de cada parcela em aberto; a parcela k vence em inicio + 7k."""
+    abertas = np.clip(quantidades - pagas, 0, None)
+    total = int(abertas.sum())
+    locacao = np.repeat(np.arange(len(abertas)), abertas)
+    deslocamento = np.arange(total) - np.repeat(np.cumsum(abertas) - abertas, abertas)
+    numero = pagas[locacao] + deslocamento + 1
+    return inicios[locacao] + 7 * numero, valores[locacao]
+
+
+def distribuicao_atraso(atrasos):
+    """Probabilidade de cada atraso (0..ATRASO_MAXIMO_DIAS dias) observada no histórico."""
+    if not len(atrasos):
+        distribuicao = np.zeros(ATRASO_MAXIMO_DIAS + 1)
+        distribuicao[0] = 1.0
+        return distribuicao
+    contagem = np.bincount(np.clip(atrasos, 0, ATRASO_MAXIMO_DIAS), minlength=ATRASO_MAXIMO_DIAS + 1)
+    return contagem / contagem.sum()
+
+
+def curvas_previsao(vencimentos, valores, hoje, horizonte, distribuicao):
+    """Entradas diárias contratadas, esperadas (convolução com o atraso) e pessimistas (percentil 90)."""
+    # Parcelas já vencidas entram como devidas hoje
+    dias = np.maximum(vencimentos - hoje, 0)
+    dentro = dias < horizonte
+    contratado = np.bincount(dias[dentro], weights=valores[dentro], minlength=horizonte)[:horizonte]
+
+    esperado = np.convolve(contratado, distribuicao)[:horizonte]
+
+    acumulada = np.cumsum(distribuicao)
+    p90 = int(np.searchsorted(acumulada, 0.9))
+    pessimista = np.concatenate([np.zeros(p90), contratado])[:horizonte]
+    return contratado, esperado, pessimista
+
+
+def atrasos_historicos(hoje):
+    """Dias de atraso de cada pagamento: data real x vencimento da semana que ele quitou."""
+    pagamentos = (
+        Pagamento.objects
+        .filter(locacao__inicio__date__gte=hoje - timedelta(days=HISTORICO_ATRASO_DIAS))
+        .annotate(
+            numero=Window(RowNumber(), partition_by=[F("locacao_id")], order_by=F("data").asc()),
+            pago_em=TruncDate("data"),
+            inicio=TruncDate("locacao__inicio"),
+        )
+        .values_list("inicio", "pago_em", "numero")
+    )
+    linhas = list(pagamentos)
+    if not linhas:
+        return np.zeros(0, dtype=np.int64)
+    inicio, pago_em, numero = zip(*linhas)
+    vencimento = np.array(inicio, dtype="datetime64[D]") + 7 * np.array(numero, dtype=np.int64)
+    return (np.array(pago_em, dtype="datetime64[D]") - vencimento).astype(np.int64)
+
+
+def previsao_recebimentos(semanas=8, granularidade="semana", considerar_atraso=True):
+    hoje_data = timezone.localdate()
+    hoje = int((np.datetime64(hoje_data, "D") - EPOCA).astype(np.int64))
+    horizonte = semanas * 7
+
+    linhas = list(
+        Locacao.objects.filter(status="andamento", quantidade_semanas__gt=F("semanas_pagas"))
+        .values_list(TruncDate("inicio"), "valor_semanal", "quantidade_semanas", "semanas_pagas")
+    )
+    if linhas:
+        inicio, valor, quantidade, pagas = zip(*linhas)
+        vencimentos, valores = expandir_parcelas(
+            (np.array(inicio, dtype="datetime64[D]") - EPOCA).astype(np.int64),
+            np.array(valor, dtype=np.float64),
+            np.array(quantidade, dtype=np.int64),
+            np.array(pagas, dtype=np.int64),
+        )
+    else:
+        vencimentos, valores = np.zeros(0, dtype=np.int64), np.zeros(0)
+
+    distribuicao = distribuicao_atraso(atrasos_historicos(hoje_data) if considerar_atraso else [])
+    contratado, esperado, pessimista = curvas_previsao(vencimentos, valores, hoje, horizonte, distribuicao)
+
+    if granularidade == "semana":
+        contratado, esperado, pessimista = (c.reshape(semanas, 7).sum(axis=1) for c in (contratado, esperado, pessimista))
+        datas = [hoje_data + timedelta(days=7 * i) for i in range(semanas)]
+    else:
+        datas = [hoje_data + timedelta(days=i) for i in range(horizonte)]
+
+    return {
+        "granularidade": granularidade,
+        "datas": datas,
+        "contratado": np.round(contratado, 2).tolist(),
+        "esperado": np.round(esperado, 2).tolist(),
+        "pessimista": np.round(pessimista, 2).tolist(),
+        "total_contratado": round(float(contratado.sum()), 2),
+        "total_esperado": round(float(esperado.sum()), 2),
+        "total_pessimista": round(float(pessimista.sum()), 2),
+    }
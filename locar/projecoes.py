@@ -0,0 +1,84 @@
+from django.db.models import Max
+
+# Projeções das listagens: cada lista declara as colunas que o template mostra e recebe linhas
+# compactas (__slots__, sem instância de modelo, sem TextField/FileField que a página não usa).
+# As colunas de cliente/veículo vêm do JOIN da própria consulta, sem uma consulta por linha.
+
+
+class Linha:
+    """Base das linhas: `__slots__` são os atributos; `caminhos` mapeia os que vêm de outra tabela."""
+
+    __slots__ = ()
+    caminhos = {}
+    # Atributos na ordem do SELECT, incluindo os __slots__ das classes base
+    atributos = ()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls.atributos = tuple(
+            atributo for classe in reversed(cls.__mro__) for atributo in classe.__dict__.get("__slots__", ())
+        )
+
+    def __init__(self, *valores):
+        for atributo, valor in zip(self.atributos, valores):
+            setattr(self, atributo, valor)
+
+    @classmethod
+    def colunas(cls):
+        return [cls.caminhos.get(atributo, atributo) for atributo in cls.atributos]
+
+    @classmethod
+    def projetar(cls, queryset):
+        return queryset.values_list(*cls.colunas())
+
+    @classmethod
+    def carregar(cls, tuplas):
+        return [cls(*valores) for valores in tuplas]
+
+
+class LinhaCliente(Linha):
+    __slots__ = ("id", "nome", "criado_em", "telefone", "email", "cpf", "cnh_numero", "cnh_validade")
+
+
+class LinhaVeiculo(Linha):
+    __slots__ = ("id", "modelo", "marca", "ano", "placa", "km_atual", "fipe", "status")
+
+
+class LinhaLocacao(Linha):
+    # Serve para Locacao e LocacaoArquivada
+    __slots__ = (
+        "id", "inicio", "valor_semanal", "quantidade_semanas", "caucao", "status",
+        "cliente_nome", "cliente_cpf", "veiculo_modelo", "veiculo_placa",
+    )
+    caminhos = {
+        "cliente_nome": "cliente__nome", "cliente_cpf": "cliente__cpf",
+        "veiculo_modelo": "veiculo__modelo", "veiculo_placa": "veiculo__placa",
+    }
+
+    @property
+    def valor_total_locacao(self):
+        return self.valor_semanal * self.quantidade_semanas
+
+
+class LinhaReceber(LinhaLocacao):
+    __slots__ = ("semanas_pagas", "ultimo_pagamento")
+
+    @classmethod
+    def projetar(cls, queryset):
+        # Último pagamento no mesmo SELECT (antes era uma consulta por locação); o values_list antes
+        # do annotate deixa no GROUP BY só as colunas projetadas
+        colunas = [coluna for coluna in cls.colunas() if coluna != "ultimo_pagamento"]
+        return queryset.values_list(*colunas).annotate(ultimo_pagamento=Max("pagamentos__data"))
+
+
+class ProjecaoMixin:
+    """ListView paginada que entrega ao template linhas `linha` em vez de instâncias do modelo."""
+
+    linha = None
+
+    def paginate_queryset(self, queryset, page_size):
+        paginator, page, object_list, is_paginated = super().paginate_queryset(
+            self.linha.projetar(queryset), page_size
+        )
+        page.object_list = self.linha.carregar(object_list)
+        return paginator, page, page.object_list, is_paginated
@@ -0,0 +1,192 @@
+from collections import Counter
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+from django.core.cache import cache
+from django.db.models import (Count, DateField, DecimalField, DurationField, ExpressionWrapper, F, FloatField,
+                              OuterRef, Q, Subquery, Sum, Value)
+from django.db.models.functions import Cast, Coalesce, Greatest, Least, NullIf, TruncDay, TruncMonth, TruncWeek
+from django.utils import timezone
+from .models import Veiculo, Locacao, Despesa, Pagamento, LocacaoArquivada, PagamentoArquivado
+from .versoes import chave_versoes
+
+# Períodos encerrados só mudam com gravações retroativas (que mudam a chave): cache mais longo
+RELATORIO_CACHE_TIMEOUT = 60 * 60 * 6
+# Tabelas lidas pelos relatórios: as versões delas (locar/versoes.py) entram nas chaves de cache,
+# então uma gravação com data no passado (despesa retroativa, arquivamento) não serve número velho
+MODELOS_RENTABILIDADE = (Veiculo, Locacao, Pagamento, Despesa, LocacaoArquivada, PagamentoArquivado)
+MODELOS_SERIE = (Locacao, Pagamento, Despesa, LocacaoArquivada, PagamentoArquivado)
+
+CATEGORIAS_DESPESA = Despesa._meta.get_field("categoria").choices
+
+ZERO = Value(Decimal("0.00"), output_field=DecimalField(max_digits=14, decimal_places=2))
+
+
+def limites_periodo(data_inicio, data_fim):
+    """Converte o período (datas) em [inicio, fim) com datetimes no fuso atual."""
+    tz = timezone.get_current_timezone()
+    inicio = timezone.make_aware(datetime.combine(data_inicio, time.min), tz)
+    fim = timezone.make_aware(datetime.combine(data_fim + timedelta(days=1), time.min), tz)
+    return inicio, fim
+
+
+def _soma_por_veiculo(queryset, campo_veiculo, expressao, output_field):
+    # Subquery agregada por veículo: evita o produto cartesiano de vários JOINs somados
+    return Subquery(
+        queryset.filter(**{campo_veiculo: OuterRef("pk")})
+        .order_by()
+        .values(campo_veiculo)
+        .annotate(total=Sum(expressao))
+        .values("total")[:1],
+        output_field=output_field,
+    )
+
+
+def rentabilidade_veiculos(data_inicio, data_fim):
+    """Queryset de veículos anotado com receita, caução retido, despesas e tempo alugado no período."""
+    inicio, fim = limites_periodo(data_inicio, data_fim)
+    moeda = DecimalField(max_digits=14, decimal_places=2)
+
+    despesas = Despesa.objects.filter(data__range=[data_inicio, data_fim])
+
+    # Intersecção de cada locação com o período consultado
+    sobreposicao = ExpressionWrapper(
+        Least(F("fim"), Value(fim)) - Greatest(F("inicio"), Value(inicio)),
+        output_field=DurationField(),
+    )
+
+    # Locações/pagamentos ativos e arquivados entram nas mesmas somas
+    receita = caucao_retido = ZERO
+    tempos = []
+    for modelo_locacao, modelo_pagamento in ((Locacao, Pagamento), (LocacaoArquivada, PagamentoArquivado)):
+        pagamentos = modelo_pagamento.objects.filter(data__gte=inicio, data__lt=fim)
+        caucoes = modelo_locacao.objects.filter(caucao_status="retido", fim__gte=inicio, fim__lt=fim)
+        locacoes = modelo_locacao.objects.filter(inicio__lt=fim, fim__gt=inicio)
+        receita = receita + Coalesce(_soma_por_veiculo(pagamentos, "locacao__veiculo", "valor", moeda), ZERO)
+        caucao_retido = caucao_retido + Coalesce(_soma_por_veiculo(caucoes, "veiculo", "caucao", moeda), ZERO)
+        tempos.append(_soma_por_veiculo(locacoes, "veiculo", sobreposicao, DurationField()))
+
+    return (
+        Veiculo.objects
+        .annotate(
+            receita=ExpressionWrapper(receita, output_field=moeda),
+            caucao_retido=ExpressionWrapper(caucao_retido, output_field=moeda),
+            total_despesas=Coalesce(_soma_por_veiculo(despesas, "veiculo", "valor", moeda), ZERO),
+            tempo_ativo=tempos[0],
+            tempo_arquivado=tempos[1],
+        )
+        .annotate(tempo_alugado=Coalesce(F("tempo_ativo"), Value(timedelta())) + Coalesce(F("tempo_arquivado"), Value(timedelta())))
+        .annotate(lucro=F("receita") + F("caucao_retido") - F("total_despesas"))
+        .annotate(
+            roi=Cast(F("lucro"), FloatField()) * 100.0 / NullIf(Cast(F("fipe"), FloatField()), 0.0),
+        )
+        .values(
+            "id", "placa", "marca", "modelo", "fipe", "status",
+            "receita", "caucao_retido", "total_despesas", "tempo_alugado", "lucro", "roi",
+        )
+    )
+
+
+def anexar_detalhes_rentabilidade(linhas, data_inicio, data_fim):
+    """Completa as linhas com despesas por categoria (uma consulta agrupada), dias e utilização."""
+    pendentes = [linha for linha in linhas if "despesas_categoria" not in linha]
+    if not pendentes:
+        return linhas
+
+    somas = {cat: Sum("valor", filter=Q(categoria=cat)) for cat, _ in CATEGORIAS_DESPESA}
+    por_veiculo = {
+        row.pop("veiculo"): row
+        for row in Despesa.objects
+        .filter(data__range=[data_inicio, data_fim], veiculo_id__in=[linha["id"] for linha in pendentes])
+        .order_by()
+        .values("veiculo")
+        .annotate(**somas)
+    }
+
+    dias_periodo = (data_fim - data_inicio).days + 1
+    for linha in pendentes:
+        categorias = por_veiculo.get(linha["id"], {})
+        linha["despesas_categoria"] = [
+            (rotulo, categorias.get(cat) or Decimal("0.00")) for cat, rotulo in CATEGORIAS_DESPESA
+        ]
+        tempo = linha["tempo_alugado"] or timedelta()
+        linha["dias_alugados"] = round(tempo.total_seconds() / 86400, 1)
+        linha["utilizacao"] = round(min(linha["dias_alugados"] / dias_periodo, 1) * 100, 1)
+    return linhas
+
+
+# ----------------------------- SÉRIE TEMPORAL -----------------------------------------
+TRUNCAMENTOS = {"dia": TruncDay, "semana": TruncWeek, "mes": TruncMonth}
+
+
+def inicio_bucket(data, granularidade):
+    if granularidade == "semana":
+        return data - timedelta(days=data.weekday())
+    if granularidade == "mes":
+        return data.replace(day=1)
+    return data
+
+
+def proximo_bucket(data, granularidade):
+    if granularidade == "semana":
+        return data + timedelta(days=7)
+    if granularidade == "mes":
+        return (data.replace(day=1) + timedelta(days=32)).replace(day=1)
+    return data + timedelta(days=1)
+
+
+def _somas_por_bucket(queryset, campo_data, expressao, granularidade):
+    bucket = TRUNCAMENTOS[granularidade](campo_data, output_field=DateField())
+    return dict(
+        queryset.order_by().annotate(bucket=bucket).values("bucket").annotate(total=expressao).values_list("bucket", "total")
+    )
+
+
+def _calcular_buckets(primeiro, ultimo, granularidade):
+    """Receitas, despesas e locações iniciadas de [primeiro, ultimo) agrupadas no banco."""
+    inicio, fim = limites_periodo(primeiro, ultimo - timedelta(days=1))
+    despesas = _somas_por_bucket(Despesa.objects.filter(data__gte=primeiro, data__lt=ultimo), "data", Sum("valor"), granularidade)
+    receitas, locacoes = Counter(), Counter()
+    for modelo_locacao, modelo_pagamento in ((Locacao, Pagamento), (LocacaoArquivada, PagamentoArquivado)):
+        receitas.update(_somas_por_bucket(modelo_pagamento.objects.filter(data__gte=inicio, data__lt=fim), "data", Sum("valor"), granularidade))
+        locacoes.update(_somas_por_bucket(modelo_locacao.objects.filter(inicio__gte=inicio, inicio__lt=fim), "inicio", Count("id"), granularidade))
+
+    buckets = {}
+    atual = primeiro
+    while atual < ultimo:
+        # Buckets sem movimento entram zerados
+        buckets[atual] = (float(receitas.get(atual) or 0), float(despesas.get(atual) or 0), locacoes.get(atual, 0))
+        atual = proximo_bucket(atual, granularidade)
+    return buckets
+
+
+def serie_temporal(data_inicio, data_fim, granularidade):
+    """Série de receitas/despesas/locações por bucket; buckets já encerrados ficam em cache até a
+    próxima gravação nas tabelas da série (uma despesa pode ser lançada com data passada)."""
+    hoje = timezone.localdate()
+    primeiro = inicio_bucket(data_inicio, granularidade)
+    limite = proximo_bucket(inicio_bucket(data_fim, granularidade), granularidade)
+    corrente = inicio_bucket(hoje, granularidade)
+
+    datas = []
+    atual = primeiro
+    while atual < limite:
+        datas.append(atual)
+        atual = proximo_bucket(atual, granularidade)
+
+    versao = chave_versoes(*MODELOS_SERIE)
+    chaves = {d: f"serie:{granularidade}:{versao}:{d.isoformat()}" for d in datas if d < corrente}
+    em_cache = cache.get_many(chaves.values())
+    valores = {d: em_cache[k] for d, k in chaves.items() if k in em_cache}
+
+    # Recalcula só o intervalo que faltou no cache (normalmente apenas o bucket corrente)
+    faltantes = [d for d in datas if d not in valores]
+    if faltantes:
+        calculados = _calcular_buckets(faltantes[0], proximo_bucket(faltantes[-1], granularidade), granularidade)
+        cache.set_many(
+            {chaves[d]: v for d, v in calculados.items() if d in chaves and d not in valores},
+            RELATORIO_CACHE_TIMEOUT,
+        )
+        for d in faltantes:
+            valores[d] = calculados[d]
+
+    return [(d, *valores[d]) for d in datas]
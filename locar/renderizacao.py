@@ -0,0 +1,200 @@
+import contextvars
+import threading
+import time
+from collections import defaultdict
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+from django.template.base import Node, Template
+from django.template.loader_tags import BlockNode, IncludeNode
+
+# Medição da renderização dos templates: tempo por template, por {% block %} e por {% include %}
+# e as consultas SQL disparadas durante a renderização (ex.: {{ loc.cliente.nome }} dentro de um
+# {% for %} sem select_related), atribuídas ao template e à linha que as causou. Cada resposta leva
+# o resumo no cabeçalho Server-Timing; o acumulado por view deste processo sai em /api/metricas/.
+# Fora de uma requisição (PDFs, e-mails) os templates renderizam sem medição.
+
+# Medição da requisição em andamento; definida pelo RenderizacaoMiddleware
+medicao_atual = contextvars.ContextVar("medicao_render", default=None)
+
+_trava = threading.Lock()
+# view -> totais deste processo
+acumulado = {}
+
+
+def _nome_template(origem):
+    return getattr(origem, "template_name", None) or "<string>"
+
+
+class MedicaoRender:
+    """Tempos de uma requisição; também é o execute_wrapper que conta o SQL do template."""
+
+    def __init__(self):
+        # (tipo, nome) -> [vezes, ms]; tipo: "template", "bloco" ou "include"
+        self.partes = defaultdict(lambda: [0, 0.0])
+        # (template, linha) -> [consultas, ms, trecho]
+        self.linhas = {}
+        # Nós em renderização, do mais externo ao mais interno
+        self.nos = []
+        self.profundidade = 0
+        self.render_ms = 0.0
+        self.consultas = 0
+        self.consultas_ms = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        if not self.nos:
+            return execute(sql, params, many, context)
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duracao = (time.perf_counter() - inicio) * 1000
+            no = self.nos[-1]
+            chave = (_nome_template(no.origin), no.token.lineno)
+            linha = self.linhas.setdefault(chave, [0, 0.0, no.token.contents[:80]])
+            linha[0] += 1
+            linha[1] += duracao
+            self.consultas += 1
+            self.consultas_ms += duracao
+
+    def anotar(self, tipo, nome, duracao):
+        parte = self.partes[(tipo, nome)]
+        parte[0] += 1
+        parte[1] += duracao
+
+    def server_timing(self, limite=5):
+        itens = [
+            f'render;dur={self.render_ms:.1f};desc="templates"',
+            f'render-sql;dur={self.consultas_ms:.1f};desc="consultas no template: {self.consultas}"',
+        ]
+        # As partes mais pesadas; o nome vai no desc (o nome da métrica não aceita "/")
+        mais_pesadas = sorted(self.partes.items(), key=lambda item: item[1][1], reverse=True)[:limite]
+        itens += [f'{tipo};dur={ms:.1f};desc="{nome}"' for (tipo, nome), (_, ms) in mais_pesadas if ms >= 0.1]
+        return ", ".join(itens)
+
+
+# ----------------------------- INSTRUMENTAÇÃO -----------------------------------------
+def _cronometrar(tipo, original, nome):
+    def render(self, context):
+        medicao = medicao_atual.get()
+        if medicao is None:
+            return original(self, context)
+        medicao.profundidade += 1
+        inicio = time.perf_counter()
+        try:
+            return original(self, context)
+        finally:
+            duracao = (time.perf_counter() - inicio) * 1000
+            medicao.profundidade -= 1
+            if not medicao.profundidade:
+                medicao.render_ms += duracao
+            medicao.anotar(tipo, nome(self, context), duracao)
+
+    return render
+
+
+def _rastrear_no(original):
+    # Guarda o nó em renderização para atribuir o SQL à linha do template
+    def render_annotated(self, context):
+        medicao = medicao_atual.get()
+        if medicao is None:
+            return original(self, context)
+        medicao.nos.append(self)
+        try:
+            return original(self, context)
+        finally:
+            medicao.nos.pop()
+
+    return render_annotated
+
+
+def instalar():
+    if getattr(Template, "_medicao_instalada", False):
+        return
+    Template._medicao_instalada = True
+    # Template.render: o template da view e os de {% include %} (o pai de {% extends %} entra no filho)
+    Template.render = _cronometrar("template", Template.render, lambda template, context: template.name or "<string>")
+    BlockNode.render = _cronometrar(
+        "bloco", BlockNode.render, lambda bloco, context: f"{context.template.name}#{bloco.name}"
+    )
+    IncludeNode.render = _cronometrar(
+        "include", IncludeNode.render, lambda include, context: include.template.token.strip("\"'")
+    )
+    Node.render_annotated = _rastrear_no(Node.render_annotated)
+
+
+if settings.TEMPLATES_MEDIR:
+    instalar()
+
+
+# ----------------------------- MIDDLEWARE E MÉTRICAS -----------------------------------------
+class RenderizacaoMiddleware:
+    def __init__(self, get_response):
+        if not settings.TEMPLATES_MEDIR:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        medicao = MedicaoRender()
+        token = medicao_atual.set(medicao)
+        try:
+            with connection.execute_wrapper(medicao):
+                response = self.get_response(request)
+        finally:
+            medicao_atual.reset(token)
+        if medicao.partes:
+            correspondencia = request.resolver_match
+            acumular(correspondencia.view_name if correspondencia else "(sem rota)", medicao)
+            # Os widgets do dashboard já mandam o próprio Server-Timing
+            response["Server-Timing"] = ", ".join(filter(None, [response.get("Server-Timing"), medicao.server_timing()]))
+        return response
+
+
+def acumular(view, medicao):
+    with _trava:
+        totais = acumulado.setdefault(view, {
+            "requisicoes": 0, "render_ms": 0.0, "consultas": 0, "consultas_ms": 0.0,
+            "partes": defaultdict(lambda: [0, 0.0]), "linhas": {},
+        })
+        totais["requisicoes"] += 1
+        totais["render_ms"] += medicao.render_ms
+        totais["consultas"] += medicao.consultas
+        totais["consultas_ms"] += medicao.consultas_ms
+        for chave, (vezes, ms) in medicao.partes.items():
+            parte = totais["partes"][chave]
+            parte[0] += vezes
+            parte[1] += ms
+        for chave, (consultas, ms, trecho) in medicao.linhas.items():
+            linha = totais["linhas"].setdefault(chave, [0, 0.0, trecho])
+            linha[0] += consultas
+            linha[1] += ms
+
+
+def metricas(limite=10):
+    """Acumulado por view: médias por requisição, partes mais lentas e linhas com mais SQL."""
+    with _trava:
+        copia = {
+            view: {**totais, "partes": dict(totais["partes"]), "linhas": dict(totais["linhas"])}
+            for view, totais in acumulado.items()
+        }
+    resultado = {}
+    for view, totais in sorted(copia.items(), key=lambda item: item[1]["render_ms"], reverse=True):
+        requisicoes = totais["requisicoes"]
+        partes = sorted(totais["partes"].items(), key=lambda item: item[1][1], reverse=True)[:limite]
+        linhas = sorted(totais["linhas"].items(), key=lambda item: item[1][0], reverse=True)[:limite]
+        resultado[view] = {
+            "requisicoes": requisicoes,
+            "render_ms_medio": round(totais["render_ms"] / requisicoes, 2),
+            "consultas_por_requisicao": round(totais["consultas"] / requisicoes, 2),
+            "consultas_ms_medio": round(totais["consultas_ms"] / requisicoes, 2),
+            "partes": [
+                {"tipo": tipo, "nome": nome, "vezes": vezes, "ms_total": round(ms, 2), "ms_medio": round(ms / vezes, 2)}
+                for (tipo, nome), (vezes, ms) in partes
+            ],
+            "linhas": [
+                {"template": template, "linha": numero, "trecho": trecho,
+                 "consultas": consultas, "ms_total": round(ms, 2)}
+                for (template, numero), (consultas, ms, trecho) in linhas
+            ],
+        }
+    return resultado
@@ -0,0 +1,52 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import (Cliente, Veiculo, Locacao, Pagamento, Despesa, LembreteEnviado, LocacaoArquivada,
+                     PagamentoArquivado)
+from .pdfs import enfileirar
+from .versoes import tocar
+from .webhooks import dados_despesa, dados_locacao, dados_pagamento, registrar_evento
+
+@receiver([post_save, post_delete], sender=Cliente)
+@receiver([post_save, post_delete], sender=Veiculo)
+@receiver([post_save, post_delete], sender=Locacao)
+@receiver([post_save, post_delete], sender=Pagamento)
+@receiver([post_save, post_delete], sender=Despesa)
+@receiver([post_save, post_delete], sender=LocacaoArquivada)
+@receiver([post_save, post_delete], sender=PagamentoArquivado)
+def incrementar_versao(sender, **kwargs):
+    # Invalida os ETags das páginas que leem esta tabela (e o extrato em cache, para Locacao/Pagamento)
+    tocar(sender)
+
+
+@receiver(post_delete, sender=Locacao)
+def apagar_lembretes(sender, instance, **kwargs):
+    # O arquivamento não passa por aqui (apaga sem sinais) e mantém o histórico
+    LembreteEnviado.objects.filter(locacao_id=instance.pk).delete()
+
+
+@receiver(post_save, sender=Locacao)
+def enfileirar_contrato(sender, instance, **kwargs):
+    # O worker só renderiza de novo se algo que aparece no contrato mudou (hash dos dados)
+    enfileirar("contrato", instance.pk)
+
+
+@receiver(post_save, sender=Pagamento)
+def enfileirar_recibo(sender, instance, created, **kwargs):
+    if created:
+        enfileirar("recibo", instance.pk)
+
+
+@receiver(post_save, sender=Pagamento)
+@receiver(post_save, sender=Locacao)
+@receiver(post_save, sender=Despesa)
+def registrar_evento_webhook(sender, instance, created, **kwargs):
+    # Roda dentro da transação do save (Pagamento/Despesa.save e a reserva da Locacao são atômicos).
+    # O encerramento da locação é registrado pela EncerrarLocacaoView.
+    if not created:
+        return
+    if sender is Pagamento:
+        registrar_evento("pagamento.criado", dados_pagamento(instance))
+    elif sender is Locacao:
+        registrar_evento("locacao.aberta", dados_locacao(instance))
+    else:
+        registrar_evento("despesa.registrada", dados_despesa(instance))
@@ -0,0 +1,14 @@
+from django import template
+from ..documentos import url_documento
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def documento_url(context, obj, campo):
+    """{% documento_url cliente "documento_com_foto" %} -> link assinado para o arquivo."""
+    request = context.get("request")
+    # Visitante anônimo não recebe link
+    if request is None or not request.user.is_authenticated:
+        return ""
+    return url_documento(obj, campo, request.user)
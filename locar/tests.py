@@ -1,3 +1,594 @@
-from django.test import TestCase
+import http.client
+import io
+import json
+import smtplib
+import tempfile
+import threading
+import unittest
+import uuid
+from unittest import mock
+from datetime import date, timedelta
+from pathlib import Path
+from decimal import Decimal
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core import mail
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.mail.backends import locmem
+from django.core.management import call_command
+from django.db import connection, models
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from .arquivo import arquivar_locacoes, restaurar_locacoes
+from .carga import limpar_dados, preparar_dados
+from .context_processors import ARQUIVOS, assets
+from .lembretes import enviar_lembretes
+from .versoes import tocar
+from .views import ClienteDetail
+from .webhooks import registrar_evento, reservar_lote, enviar_lote
+from .models import (Cliente, Veiculo, Locacao, LocacaoArquivada, Pagamento, PagamentoArquivado, Despesa,
+                     DestinoWebhook, EventoWebhook, EntregaWebhook, LembreteEnviado, Usuario)
+from .normalizacao import busca_cliente, busca_veiculo
+from .projecoes import LinhaCliente, LinhaVeiculo, LinhaLocacao, LinhaReceber
 
-# Create your tests here.
+# O admin usa {% static %}: sem o manifesto do collectstatic, armazenamento simples
+SEM_MANIFESTO = {
+    "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+    "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+}
+
+
+def criar_cliente(n):
+    return Cliente.objects.create(
+        nome=f"Cliente {n}", cpf=f"{n:011d}", telefone="11999990000", email=f"cliente{n}@exemplo.com",
+        endereco="Rua A, 1", data_nascimento=date(1990, 1, 1), cnh_numero=f"{n:011d}",
+        cnh_validade=date(2030, 1, 1),
+    )
+
+
+def criar_veiculo(n):
+    return Veiculo.objects.create(
+        modelo="Onix", marca="Chevrolet", ano=2022, placa=f"ABC{n:04d}", km_atual=1000,
+        fipe=Decimal("70000"), renavam=f"{n:011d}", chassi=f"9BG{n:014d}",
+    )
+
+
+def criar_locacao(cliente, veiculo, usuario):
+    inicio = timezone.now() - timedelta(days=10)
+    return Locacao.objects.create(
+        cliente=cliente, veiculo=veiculo, criado_por=usuario, inicio=inicio, fim=inicio + timedelta(weeks=4),
+        km_inicio=veiculo.km_atual, valor_semanal=Decimal("500"), quantidade_semanas=4, caucao=Decimal("1000"),
+    )
+
+
+class GetCondicionalTests(TestCase):
+    """ETag/Last-Modified das páginas com CondicionalMixin (locar/versoes.py)."""
+
+    def setUp(self):
+        self.usuario = Usuario.objects.create_user("atendente", password="senha")
+        self.client.force_login(self.usuario)
+        criar_cliente(1)
+
+    def test_if_none_match_devolve_304_ate_uma_gravacao(self):
+        url = reverse("cliente_list")
+        resposta = self.client.get(url)
+        self.assertEqual(resposta.status_code, 200)
+        etag = resposta["ETag"]
+
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        criar_cliente(2)
+        resposta = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resposta.status_code, 200)
+        self.assertNotEqual(resposta["ETag"], etag)
+        self.assertContains(resposta, "Cliente 2")
+
+    def test_if_modified_since_devolve_304(self):
+        url = reverse("cliente_list")
+        resposta = self.client.get(url)
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=resposta["Last-Modified"]).status_code, 304)
+
+    def test_gravacao_em_tabela_relacionada_renova_o_detalhe(self):
+        veiculo = criar_veiculo(1)
+        locacao = criar_locacao(Cliente.objects.get(), veiculo, self.usuario)
+        url = reverse("locacao_detalhe", args=[locacao.pk])
+        etag = self.client.get(url)["ETag"]
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        locacao.pagamentos.create(valor=Decimal("500"))
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_etag_e_por_usuario(self):
+        url = reverse("cliente_list")
+        etag = self.client.get(url)["ETag"]
+        self.client.force_login(Usuario.objects.create_user("gerente", password="senha"))
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_if_modified_since_expira_com_a_janela_dos_links(self):
+        cliente = Cliente.objects.get()
+        url = reverse("cliente_detalhe", args=[cliente.pk])
+        agora = timezone.now()
+        with mock.patch("django.utils.timezone.now", return_value=agora):
+            ultima = self.client.get(url)["Last-Modified"]
+            self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=ultima).status_code, 304)
+        # Na janela seguinte os links assinados da resposta anterior já podem ter expirado
+        with mock.patch("django.utils.timezone.now", return_value=agora + timedelta(seconds=ClienteDetail.janela_etag)):
+            resposta = self.client.get(url, HTTP_IF_MODIFIED_SINCE=ultima)
+        self.assertEqual(resposta.status_code, 200)
+        self.assertNotEqual(resposta["Last-Modified"], ultima)
+
+
+def criar_movimento(quantidade, usuario):
+    """Locações com um pagamento e uma multa cada; metade vai para o arquivo."""
+    inicial = Cliente.objects.count() + 1
+    locacoes = []
+    for n in range(inicial, inicial + quantidade):
+        locacao = criar_locacao(criar_cliente(n), criar_veiculo(n), usuario)
+        locacao.pagamentos.create(valor=Decimal("500"))
+        Despesa.objects.create(veiculo=locacao.veiculo, categoria="multa", descricao="Multa", valor=Decimal("130.16"))
+        locacoes.append(locacao.pk)
+    arquivar_locacoes(locacoes[::2])
+
+
+@override_settings(STORAGES=SEM_MANIFESTO)
+class AdminTabelasGrandesTests(TestCase):
+    """Listagens do admin com número fixo de consultas (list_select_related, contagem estimada)."""
+
+    # Sessão, usuário, versões das tabelas, estatísticas do SQLite, contagem e a página
+    # (+ filtros laterais com consulta própria)
+    CONSULTAS = {
+        "cliente": 6, "veiculo": 6, "locacao": 8, "pagamento": 8, "despesa": 8, "locacaoarquivada": 6,
+    }
+
+    def setUp(self):
+        self.admin = Usuario.objects.create_superuser("admin", "admin@exemplo.com", "senha")
+        self.client.force_login(self.admin)
+
+    def _conferir_consultas(self):
+        for modelo, consultas in self.CONSULTAS.items():
+            # A contagem fica em cache por versão da tabela: cada listagem parte do cache vazio
+            cache.clear()
+            with self.subTest(modelo=modelo), self.assertNumQueries(consultas):
+                self.assertEqual(self.client.get(f"/admin/locar/{modelo}/").status_code, 200)
+
+    def test_consultas_por_listagem(self):
+        criar_movimento(2, self.admin)
+        self._conferir_consultas()
+
+    def test_consultas_nao_crescem_com_as_linhas(self):
+        criar_movimento(20, self.admin)
+        self._conferir_consultas()
+
+    def test_busca_pelas_colunas_normalizadas(self):
+        criar_movimento(2, self.admin)
+        cliente = Cliente.objects.create(
+            nome="José da Conceição", cpf="123.456.789-09", telefone="11999990000", email="jose@exemplo.com",
+            endereco="Rua A, 1", data_nascimento=date(1990, 1, 1), cnh_numero="99988877766",
+            cnh_validade=date(2030, 1, 1),
+        )
+        for termo in ("CONCEIÇÃO", "jose da", "12345678909", "123.456.789-09"):
+            with self.subTest(termo=termo):
+                resposta = self.client.get("/admin/locar/cliente/", {"q": termo})
+                self.assertEqual([c.pk for c in resposta.context["cl"].result_list], [cliente.pk])
+        resposta = self.client.get("/admin/locar/veiculo/", {"q": "abc-0001"})
+        self.assertEqual([v.placa for v in resposta.context["cl"].result_list], ["ABC0001"])
+
+
+class ProjecaoListagensTests(TestCase):
+    """Listagens com linhas projetadas (locar/projecoes.py): colunas declaradas e consultas fixas."""
+
+    # Sessão, usuário, versões das tabelas (ETag e Last-Modified), estatísticas do SQLite,
+    # contagem e a página. A lista de recebimentos não é paginada.
+    CONSULTAS = {
+        "/clientes/": 7, "/veiculos/": 7, "/locacao/": 7, "/locacao/?status=arquivada": 7, "/financeiro/receber/": 4,
+    }
+
+    def setUp(self):
+        self.usuario = Usuario.objects.create_user("atendente", password="senha")
+        self.client.force_login(self.usuario)
+
+    def test_colunas_das_projecoes(self):
+        self.assertEqual(
+            LinhaCliente.colunas(), ["id", "nome", "criado_em", "telefone", "email", "cpf", "cnh_numero", "cnh_validade"]
+        )
+        self.assertEqual(LinhaVeiculo.colunas(), ["id", "modelo", "marca", "ano", "placa", "km_atual", "fipe", "status"])
+        self.assertEqual(
+            LinhaLocacao.colunas(),
+            [
+                "id", "inicio", "valor_semanal", "quantidade_semanas", "caucao", "status",
+                "cliente__nome", "cliente__cpf", "veiculo__modelo", "veiculo__placa",
+            ],
+        )
+        self.assertEqual(LinhaReceber.colunas(), LinhaLocacao.colunas() + ["semanas_pagas", "ultimo_pagamento"])
+
+    def test_projecoes_nao_leem_texto_nem_arquivos(self):
+        for modelo, linha in [
+            (Cliente, LinhaCliente), (Veiculo, LinhaVeiculo), (Locacao, LinhaLocacao),
+            (LocacaoArquivada, LinhaLocacao), (Locacao, LinhaReceber),
+        ]:
+            pesados = {
+                campo.name for campo in modelo._meta.concrete_fields
+                if isinstance(campo, (models.TextField, models.FileField))
+            }
+            with self.subTest(modelo=modelo.__name__, linha=linha.__name__):
+                self.assertTrue(pesados)
+                self.assertFalse(pesados & set(linha.colunas()))
+
+    def test_paginas_recebem_linhas_projetadas(self):
+        criar_movimento(2, self.usuario)
+        for url, nome, linha in [
+            ("/clientes/", "clientes", LinhaCliente), ("/veiculos/", "veiculos", LinhaVeiculo),
+            ("/locacao/", "locacoes", LinhaLocacao), ("/locacao/?status=arquivada", "locacoes", LinhaLocacao),
+        ]:
+            with self.subTest(url=url):
+                linhas = self.client.get(url).context[nome]
+                self.assertTrue(linhas)
+                self.assertTrue(all(type(objeto) is linha for objeto in linhas))
+
+    def _conferir_consultas(self):
+        for url, consultas in self.CONSULTAS.items():
+            cache.clear()
+            with self.subTest(url=url), self.assertNumQueries(consultas):
+                self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_consultas_por_listagem(self):
+        criar_movimento(2, self.usuario)
+        self._conferir_consultas()
+
+    def test_consultas_nao_crescem_com_as_linhas(self):
+        criar_movimento(20, self.usuario)
+        self._conferir_consultas()
+
+
+class ReservaVeiculoTests(TransactionTestCase):
+    """Locações simultâneas: o UPDATE condicional deixa passar uma por veículo, sem recusar as de outros veículos."""
+
+    ATENDENTES = 8
+
+    def setUp(self):
+        self.usuario = Usuario.objects.create_user("atendente", password="senha")
+        self.clientes = [criar_cliente(n) for n in range(1, self.ATENDENTES + 1)]
+
+    def _locar_ao_mesmo_tempo(self, veiculos):
+        """Uma thread por atendente, todas largando juntas; o atendente i loca veiculos[i] para o cliente i."""
+        largada = threading.Barrier(len(veiculos))
+        resultados = [None] * len(veiculos)
+
+        def locar(indice):
+            try:
+                largada.wait()
+                criar_locacao(self.clientes[indice], Veiculo.objects.get(pk=veiculos[indice].pk), self.usuario)
+                resultados[indice] = "locada"
+            except ValidationError as exc:
+                resultados[indice] = "recusada" if "veiculo" in exc.message_dict else repr(exc)
+            except Exception as exc:
+                # Ex.: "database is locked" se a reserva voltasse a ler antes de escrever
+                resultados[indice] = repr(exc)
+            finally:
+                connection.close()
+
+        atendentes = [threading.Thread(target=locar, args=(indice,)) for indice in range(len(veiculos))]
+        for atendente in atendentes:
+            atendente.start()
+        for atendente in atendentes:
+            atendente.join()
+        return resultados
+
+    def test_reserva_concorrente_tem_um_vencedor(self):
+        veiculo = criar_veiculo(1)
+        resultados = self._locar_ao_mesmo_tempo([veiculo] * self.ATENDENTES)
+
+        self.assertCountEqual(resultados, ["locada"] + ["recusada"] * (self.ATENDENTES - 1))
+        self.assertEqual(Locacao.objects.filter(veiculo=veiculo).count(), 1)
+        veiculo.refresh_from_db()
+        self.assertEqual(veiculo.status, "alugado")
+
+    def test_disputa_nao_recusa_locacao_de_outro_veiculo(self):
+        disputado, livre = criar_veiculo(1), criar_veiculo(2)
+        resultados = self._locar_ao_mesmo_tempo([disputado] * (self.ATENDENTES - 1) + [livre])
+
+        self.assertEqual(resultados[-1], "locada")
+        self.assertCountEqual(resultados[:-1], ["locada"] + ["recusada"] * (self.ATENDENTES - 2))
+        self.assertEqual(Veiculo.objects.filter(status="alugado").count(), 2)
+
+    def test_veiculos_diferentes_sao_todos_locados(self):
+        veiculos = [criar_veiculo(n) for n in range(1, self.ATENDENTES + 1)]
+        self.assertEqual(self._locar_ao_mesmo_tempo(veiculos), ["locada"] * self.ATENDENTES)
+        self.assertEqual(Locacao.objects.count(), self.ATENDENTES)
+
+    def test_veiculo_alugado_recusa_nova_locacao(self):
+        veiculo = criar_veiculo(1)
+        criar_locacao(self.clientes[0], veiculo, self.usuario)
+        with self.assertRaises(ValidationError):
+            criar_locacao(self.clientes[1], Veiculo.objects.get(pk=veiculo.pk), self.usuario)
+        self.assertEqual(Locacao.objects.count(), 1)
+
+
+class PeriodoFiltradoTests(TestCase):
+    """Filtro de período dos relatórios (data_inicio/data_fim): datas invertidas e período longo demais."""
+
+    def setUp(self):
+        self.client.force_login(Usuario.objects.create_user("atendente", password="senha"))
+        veiculo = criar_veiculo(1)
+        criar_locacao(criar_cliente(1), veiculo, Usuario.objects.get())
+
+    def test_datas_invertidas_sao_trocadas(self):
+        periodo = {"data_inicio": "2025-03-10", "data_fim": "2025-03-01"}
+        dias = self.client.get(reverse("ocupacao_json"), periodo).json()["labels"]
+        self.assertEqual((len(dias), dias[0], dias[-1]), (10, "2025-03-01", "2025-03-10"))
+        self.assertEqual(self.client.get(reverse("ocupacao"), periodo).status_code, 200)
+
+    def test_periodo_limitado_aos_ultimos_tres_anos(self):
+        periodo = {"data_inicio": "0001-01-01", "data_fim": "9999-12-31"}
+        dias = self.client.get(reverse("ocupacao_json"), periodo).json()["labels"]
+        self.assertEqual(len(dias), 3 * 366 + 1)
+        self.assertEqual(dias[-1], "9999-12-30")
+        for url in ("ocupacao", "rentabilidade"):
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(reverse(url), periodo).status_code, 200)
+
+
+class BuscaPorPrefixoTests(TestCase):
+    """Buscas por prefixo de CPF/CNH/placa (lookup `prefixo`, locar/normalizacao.py)."""
+
+    def setUp(self):
+        self.cliente = criar_cliente(1)
+        Cliente.objects.filter(pk=self.cliente.pk).update(cpf_normalizado="12345678909")
+        criar_cliente(2)
+        for placa in ("ABC1D23", "ABC2E34", "ABD1234"):
+            Veiculo.objects.create(
+                modelo="Onix", marca="Chevrolet", ano=2022, placa=placa, km_atual=0, fipe=Decimal("70000"),
+                renavam=placa, chassi=placa,
+            )
+
+    def _plano(self, queryset):
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+            return " | ".join(linha[-1] for linha in cursor.fetchall())
+
+    def test_resultados(self):
+        self.assertEqual(list(Cliente.objects.filter(busca_cliente("123.456"))), [self.cliente])
+        self.assertEqual(
+            sorted(Veiculo.objects.filter(busca_veiculo("abc-")).values_list("placa", flat=True)),
+            ["ABC1D23", "ABC2E34"],
+        )
+        self.assertEqual(list(Veiculo.objects.filter(busca_veiculo("ABC1D23")).values_list("placa", flat=True)), ["ABC1D23"])
+        self.assertFalse(Veiculo.objects.filter(placa_normalizada__prefixo="ABC3").exists())
+
+    @unittest.skipUnless(connection.vendor == "sqlite", "plano de consulta do SQLite")
+    def test_prefixo_usa_o_indice_no_sqlite(self):
+        plano = self._plano(Cliente.objects.filter(busca_cliente("123.456.789")))
+        self.assertIn("SEARCH locar_cliente USING INDEX locar_cliente_cpf_normalizado", plano)
+        self.assertIn("SEARCH locar_cliente USING INDEX locar_cliente_cnh_normalizada", plano)
+        self.assertNotIn("SCAN", plano)
+        plano = self._plano(Veiculo.objects.filter(placa_normalizada__prefixo="ABC1"))
+        self.assertIn("SEARCH locar_veiculo USING INDEX locar_veiculo_placa_normalizada", plano)
+        self.assertNotIn("SCAN", plano)
+
+
+class CacheRelatoriosTests(TestCase):
+    """Relatórios de períodos fechados em cache: gravações retroativas renovam a chave (versões das tabelas)."""
+
+    PERIODO = {"data_inicio": "2024-01-01", "data_fim": "2024-01-31"}
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(Usuario.objects.create_user("gerente", password="senha"))
+        self.veiculo = criar_veiculo(1)
+
+    def _lancar_despesa(self, valor, dia="2024-01-15"):
+        Despesa.objects.create(veiculo=self.veiculo, categoria="manutencao", descricao="Revisão", data=dia, valor=valor)
+
+    def test_rentabilidade_ve_despesa_retroativa(self):
+        self._lancar_despesa(Decimal("100"))
+        linhas = self.client.get(reverse("rentabilidade"), self.PERIODO).context["linhas"]
+        self.assertEqual(linhas[0]["total_despesas"], Decimal("100"))
+
+        self._lancar_despesa(Decimal("50"))
+        linhas = self.client.get(reverse("rentabilidade"), self.PERIODO).context["linhas"]
+        self.assertEqual(linhas[0]["total_despesas"], Decimal("150"))
+
+    def test_serie_temporal_ve_despesa_retroativa(self):
+        periodo = {**self.PERIODO, "granularidade": "semana"}
+        self._lancar_despesa(Decimal("100"))
+        despesas = self.client.get(reverse("serie_temporal"), periodo).json()["datasets"][1]["data"]
+        self.assertEqual(sum(despesas), 100)
+
+        self._lancar_despesa(Decimal("50"), dia="2024-01-03")
+        despesas = self.client.get(reverse("serie_temporal"), periodo).json()["datasets"][1]["data"]
+        self.assertEqual(sum(despesas), 150)
+
+
+class LimpezaTesteCargaTests(TestCase):
+    def test_limpar_dados_apaga_eventos_de_webhook_do_teste(self):
+        DestinoWebhook.objects.create(nome="ERP", url="http://erp.exemplo.com/webhook", segredo="segredo")
+        usuario = Usuario.objects.create_user("atendente", password="senha")
+        # preparar_dados cria os clientes 00000000001... (mesmo CPF de criar_cliente(1))
+        real = criar_locacao(criar_cliente(100), criar_veiculo(100), usuario)
+        for cliente_id, veiculo_id in preparar_dados(2):
+            locacao = criar_locacao(Cliente.objects.get(pk=cliente_id), Veiculo.objects.get(pk=veiculo_id), usuario)
+            locacao.pagamentos.create(valor=Decimal("500"))
+
+        limpar_dados()
+
+        self.assertEqual(list(EventoWebhook.objects.values_list("dados__locacao_id", flat=True)), [real.pk])
+        self.assertEqual(EntregaWebhook.objects.count(), 1)
+
+
+class EnvioWebhookTests(TestCase):
+    def setUp(self):
+        self.destino = DestinoWebhook.objects.create(nome="ERP", url="http://erp.exemplo.com/webhook", segredo="segredo")
+        registrar_evento("pagamento.criado", {"pagamento_id": 1})
+
+    def test_resposta_http_malformada_volta_para_a_fila(self):
+        for erro in (http.client.BadStatusLine(""), http.client.IncompleteRead(b"")):
+            with self.subTest(erro=type(erro).__name__):
+                EntregaWebhook.objects.update(status="pendente", proxima_tentativa=timezone.now())
+                lote, entregas = reservar_lote(self.destino, 10, timezone.now())
+                with mock.patch("locar.webhooks.urllib.request.urlopen", side_effect=erro):
+                    self.assertEqual(enviar_lote(self.destino, lote, entregas), "retentativa")
+                entrega = EntregaWebhook.objects.get()
+                self.assertEqual(entrega.status, "pendente")
+                self.assertIsNone(entrega.lote)
+                self.assertGreater(entrega.proxima_tentativa, timezone.now())
+        self.assertEqual(EntregaWebhook.objects.get().tentativas, 2)
+
+
+class ArquivoLocacoesTests(TestCase):
+    """Arquivamento e restauração (locar/arquivo.py): mesmo id, pagamentos junto, lembretes mantidos."""
+
+    def setUp(self):
+        usuario = Usuario.objects.create_user("atendente", password="senha")
+        self.locacoes = []
+        for n in (1, 2):
+            locacao = criar_locacao(criar_cliente(n), criar_veiculo(n), usuario)
+            locacao.pagamentos.create(valor=Decimal("500"))
+            locacao.pagamentos.create(valor=Decimal("500"))
+            LembreteEnviado.objects.create(
+                locacao=locacao, cliente=locacao.cliente, vencimento=locacao.proximo_vencimento, tipo="proximo",
+                canal="email", destino=locacao.cliente.email, status="enviado", lote=uuid.uuid4(),
+            )
+            self.locacoes.append(locacao)
+        # Duas semanas pagas: o vencimento recalculado na restauração não é o da criação
+        Locacao.objects.update(semanas_pagas=2, proximo_vencimento=None)
+        self.ids = [locacao.pk for locacao in self.locacoes]
+
+    def test_arquivar_move_locacoes_e_pagamentos(self):
+        self.assertEqual(arquivar_locacoes(self.ids), (2, 4))
+        self.assertFalse(Locacao.objects.exists())
+        self.assertFalse(Pagamento.objects.exists())
+        self.assertEqual(sorted(LocacaoArquivada.objects.values_list("id", flat=True)), self.ids)
+        self.assertEqual(PagamentoArquivado.objects.filter(locacao_id__in=self.ids).count(), 4)
+        self.assertEqual(LembreteEnviado.objects.count(), 2)
+
+    def test_restaurar_devolve_o_mesmo_id_e_recalcula_o_vencimento(self):
+        arquivar_locacoes(self.ids)
+        self.assertEqual(restaurar_locacoes(self.ids), (2, 4))
+        self.assertFalse(LocacaoArquivada.objects.exists())
+        self.assertFalse(PagamentoArquivado.objects.exists())
+        for locacao in Locacao.objects.filter(pk__in=self.ids):
+            with self.subTest(locacao=locacao.pk):
+                self.assertEqual(locacao.pagamentos.count(), 2)
+                self.assertIsNotNone(locacao.proximo_vencimento)
+                self.assertEqual(locacao.proximo_vencimento, locacao.calcular_proximo_vencimento())
+                self.assertEqual(list(locacao.lembretes.values_list("status", flat=True)), ["enviado"])
+
+    def test_consultas_por_lote_e_nao_por_linha(self):
+        # Versões das tabelas de arquivo já existentes (senão o tocar() também as cria)
+        tocar(LocacaoArquivada, PagamentoArquivado)
+        # SAVEPOINT, leitura de locações e pagamentos, dois INSERTs, dois DELETEs, quatro versões, RELEASE
+        with self.assertNumQueries(12):
+            arquivar_locacoes(self.ids)
+
+
+class AssetsTests(TestCase):
+    """Pacote local de CSS/JS (context processor `assets`): só com todos os arquivos, senão o CDN."""
+
+    @override_settings(DEBUG=True)
+    def test_debug_exige_todos_os_arquivos(self):
+        with tempfile.TemporaryDirectory() as pasta, mock.patch("locar.context_processors.STATIC_DIR", Path(pasta)):
+            for arquivo in ARQUIVOS:
+                self.assertFalse(assets(None)["assets_locais"])
+                caminho = Path(pasta) / arquivo
+                caminho.parent.mkdir(parents=True, exist_ok=True)
+                caminho.write_text("/* */")
+            self.assertTrue(assets(None)["assets_locais"])
+
+    @override_settings(DEBUG=False)
+    def test_producao_exige_todos_os_arquivos_no_manifesto(self):
+        manifesto = {arquivo: arquivo.replace(".", ".0123abcd.", 1) for arquivo in ARQUIVOS}
+        with mock.patch.object(staticfiles_storage, "hashed_files", manifesto, create=True):
+            self.assertTrue(assets(None)["assets_locais"])
+        for faltando in ARQUIVOS:
+            parcial = {nome: hash for nome, hash in manifesto.items() if nome != faltando}
+            with self.subTest(faltando=faltando), mock.patch.object(staticfiles_storage, "hashed_files", parcial, create=True):
+                self.assertFalse(assets(None)["assets_locais"])
+
+
+class ConciliarPagamentosTests(TestCase):
+    """Checkpoint do manage.py conciliar_pagamentos: relatório e --corrigir não se atropelam."""
+
+    def setUp(self):
+        usuario = Usuario.objects.create_user("atendente", password="senha")
+        self.locacao = criar_locacao(criar_cliente(1), criar_veiculo(1), usuario)
+        self.locacao.pagamentos.create(valor=Decimal("500"))
+        Locacao.objects.filter(pk=self.locacao.pk).update(semanas_pagas=0)
+        pasta = tempfile.TemporaryDirectory()
+        self.addCleanup(pasta.cleanup)
+        self.checkpoint = Path(pasta.name) / "checkpoint.json"
+
+    def test_corrigir_ignora_checkpoint_do_relatorio(self):
+        # Relatório interrompido depois de conferir tudo: o --corrigir ainda precisa passar pela faixa
+        self.checkpoint.write_text(json.dumps({"modo": "relatorio", "ultimo_id": self.locacao.pk}))
+        call_command("conciliar_pagamentos", corrigir=True, checkpoint=str(self.checkpoint), stdout=io.StringIO())
+        self.locacao.refresh_from_db()
+        self.assertEqual(self.locacao.semanas_pagas, 1)
+        self.assertFalse(self.checkpoint.exists())
+
+    def test_checkpoint_padrao_por_modo_fora_do_projeto(self):
+        caminhos = []
+        with mock.patch("pathlib.Path.write_text", autospec=True, side_effect=lambda caminho, _: caminhos.append(caminho)):
+            call_command("conciliar_pagamentos", stdout=io.StringIO())
+            call_command("conciliar_pagamentos", corrigir=True, stdout=io.StringIO())
+        self.assertEqual(len(set(caminhos)), 2)
+        for caminho in caminhos:
+            self.assertFalse(caminho.is_relative_to(settings.BASE_DIR))
+
+
+class BackendRecusando(locmem.EmailBackend):
+    """E-mail em memória que recusa os destinatários de `recusados`, como um servidor SMTP."""
+    recusados = set()
+
+    def send_messages(self, mensagens):
+        for mensagem in mensagens:
+            recusados = set(mensagem.recipients()) & self.recusados
+            if recusados:
+                raise smtplib.SMTPRecipientsRefused({destino: (550, b"Mailbox unavailable") for destino in recusados})
+        return super().send_messages(mensagens)
+
+
+@override_settings(EMAIL_BACKEND="locar.tests.BackendRecusando")
+class LembretesEmailTests(TestCase):
+    """manage.py enviar_lembretes pelo CanalEmail (locar/lembretes.py)."""
+
+    def setUp(self):
+        usuario = Usuario.objects.create_user("atendente", password="senha")
+        self.agrupado = criar_cliente(1)
+        self.recusado = criar_cliente(2)
+        criar_locacao(self.agrupado, criar_veiculo(1), usuario)
+        criar_locacao(self.agrupado, criar_veiculo(2), usuario)
+        self.locacao_recusada = criar_locacao(self.recusado, criar_veiculo(3), usuario)
+        BackendRecusando.recusados = {self.recusado.email}
+        self.addCleanup(setattr, BackendRecusando, "recusados", set())
+
+    def _enviar(self):
+        return enviar_lembretes("email", por_segundo=0, tentativas=1)
+
+    def test_uma_mensagem_por_cliente_sem_reenvio_e_recusa_repetida(self):
+        resumo = self._enviar()
+        self.assertEqual((resumo["enviados"], resumo["erros"]), (1, 1))
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, [self.agrupado.email])
+        self.assertIn("ABC0001", mail.outbox[0].body)
+        self.assertIn("ABC0002", mail.outbox[0].body)
+        self.assertEqual(LembreteEnviado.objects.filter(cliente=self.agrupado, status="enviado").count(), 2)
+        erro = LembreteEnviado.objects.get(cliente=self.recusado)
+        self.assertEqual(erro.status, "erro")
+        self.assertIn("Mailbox unavailable", erro.erro)
+
+        # O destinatário volta a aceitar: só a parcela com erro é enviada de novo
+        BackendRecusando.recusados = set()
+        resumo = self._enviar()
+        self.assertEqual((resumo["clientes"], resumo["enviados"], resumo["erros"]), (1, 1, 0))
+        self.assertEqual([mensagem.to for mensagem in mail.outbox[1:]], [[self.recusado.email]])
+        self.assertEqual(
+            list(LembreteEnviado.objects.filter(locacao=self.locacao_recusada).order_by("id").values_list("status", flat=True)),
+            ["erro", "enviado"],
+        )
+
+        resumo = self._enviar()
+        self.assertEqual((resumo["clientes"], resumo["enviados"]), (0, 0))
+        self.assertEqual(len(mail.outbox), 2)
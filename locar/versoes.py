@@ -0,0 +1,89 @@
+import hashlib
+from datetime import datetime, time, timezone as tz
+from django.contrib.messages import get_messages
+from django.db.models import F
+from django.utils import timezone
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+from .models import VersaoTabela
+
+
+def tocar(*modelos):
+    """Incrementa a versão das tabelas (usar também após update()/bulk_create, que não disparam sinais)."""
+    agora = timezone.now()
+    for modelo in modelos:
+        tabela = modelo._meta.label_lower
+        if not VersaoTabela.objects.filter(tabela=tabela).update(versao=F("versao") + 1, atualizado_em=agora):
+            VersaoTabela.objects.get_or_create(tabela=tabela, defaults={"versao": 1, "atualizado_em": agora})
+
+
+def versoes(*modelos):
+    tabelas = [modelo._meta.label_lower for modelo in modelos]
+    return {
+        tabela: (versao, atualizado_em)
+        for tabela, versao, atualizado_em in VersaoTabela.objects.filter(tabela__in=tabelas).values_list(
+            "tabela", "versao", "atualizado_em"
+        )
+    }
+
+
+def chave_versoes(*modelos):
+    """Versões das tabelas, na ordem dada, para chaves de cache ("3:0:17"; 0 = tabela nunca gravada)."""
+    atuais = versoes(*modelos)
+    return ":".join(str(atuais.get(modelo._meta.label_lower, (0, None))[0]) for modelo in modelos)
+
+
+class CondicionalMixin:
+    """GET condicional (ETag/Last-Modified) a partir das versões das tabelas usadas pela página.
+
+    Páginas que dependem da data atual (vencimentos, mês corrente) mudam também na virada do dia;
+    com `janela_etag` (segundos) o ETag e o Last-Modified mudam a cada janela, para páginas com links
+    que expiram.
+    """
+    modelos_condicionais = ()
+    depende_da_data = False
+    janela_etag = 0
+    cache_max_age = 0
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method not in ("GET", "HEAD"):
+            return super().dispatch(request, *args, **kwargs)
+        view = condition(etag_func=self._etag, last_modified_func=self._ultima_modificacao)(super().dispatch)
+        response = view(request, *args, **kwargs)
+        # Conteúdo por usuário; sem max_age, sempre revalidado
+        if self.cache_max_age:
+            patch_cache_control(response, private=True, max_age=self.cache_max_age)
+        else:
+            patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+    def _versoes(self, request):
+        if not hasattr(self, "_versoes_cache"):
+            self._versoes_cache = versoes(*self.modelos_condicionais)
+        return self._versoes_cache
+
+    def _etag(self, request, *args, **kwargs):
+        # Mensagens pendentes precisam ser exibidas: responde sem validador
+        if len(get_messages(request)):
+            return None
+        partes = [
+            type(self).__name__,
+            request.get_full_path(),
+            str(request.user.pk),
+            str(timezone.localdate()) if self.depende_da_data else "",
+            str(int(timezone.now().timestamp() // self.janela_etag)) if self.janela_etag else "",
+        ]
+        partes += [f"{tabela}:{versao}" for tabela, (versao, _) in sorted(self._versoes(request).items())]
+        return hashlib.md5("|".join(partes).encode()).hexdigest()
+
+    def _ultima_modificacao(self, request, *args, **kwargs):
+        if len(get_messages(request)):
+            return None
+        datas = [atualizado_em for _, atualizado_em in self._versoes(request).values()]
+        if self.depende_da_data:
+            datas.append(timezone.make_aware(datetime.combine(timezone.localdate(), time.min)))
+        if self.janela_etag:
+            # Início da janela atual: If-Modified-Since de uma janela anterior (links já expirados) não dá 304
+            inicio = timezone.now().timestamp() // self.janela_etag * self.janela_etag
+            datas.append(datetime.fromtimestamp(inicio, tz.utc))
+        return max(datas) if datas else None
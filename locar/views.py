@@ -1,49 +1,104 @@
+from django.conf import settings
 from django.contrib import messages
 from django.utils import timezone
 from django.urls import reverse_lazy, reverse
-from django.http import HttpResponseRedirect
-from django.db.models import Q, ProtectedError, Sum
+from django.core import signing
+from django.core.exceptions import ObjectDoesNotExist, ValidationError
+from django.core.files.storage import default_storage
+from django.http import Http404, HttpResponse, HttpResponseForbidden, HttpResponseRedirect, JsonResponse
+from django.db import transaction
+from django.db.models import Q, ProtectedError, Sum, F
+from django.core.cache import cache
 from django.shortcuts import redirect, get_object_or_404, render
+from django.core.paginator import Paginator
 from collections import defaultdict
+import csv
+import time
 from django.utils import timezone
-from datetime import timedelta, datetime
+from datetime import date, timedelta, datetime
+from django.contrib.admin.views.decorators import staff_member_required
+from django.utils.decorators import method_decorator
 from django.views.generic import ListView, CreateView, DeleteView, DetailView, UpdateView, TemplateView, View
 from .forms import ClienteForm, VeiculoForm, LocacaoForm, EncerrarLocacaoForm, DespesaForm
-from .models import Cliente, Veiculo, Locacao, Despesa, Pagamento
+from .models import Cliente, Veiculo, Locacao, Despesa, Pagamento, LocacaoArquivada, TarefaPdf
+from .documentos import abrir_token, resposta_arquivo, resposta_documento
+from .pdfs import dados_pdf, enfileirar
+from .dashboard import locacoes_no_periodo, resumo_financeiro, indicadores_frota, pagamentos_por_dia
+from .ocupacao import ocupacao_frota
+from .previsao import previsao_recebimentos
+from .normalizacao import busca_cliente, busca_veiculo, normalizar_nome
+from .paginacao import PaginadorEstimado
+from .projecoes import LinhaCliente, LinhaVeiculo, LinhaLocacao, LinhaReceber, ProjecaoMixin
+from .consultas_lentas import ranking, recentes
+from .extrato import extrato_cliente, extrato_completo
+from .renderizacao import metricas
+from .versoes import CondicionalMixin, chave_versoes
+from .webhooks import dados_locacao, registrar_evento
+from .relatorios import (rentabilidade_veiculos, anexar_detalhes_rentabilidade, serie_temporal, TRUNCAMENTOS,
+                         RELATORIO_CACHE_TIMEOUT, MODELOS_RENTABILIDADE)
 
 class ClieneBaseView:
     model = Cliente
     success_url = reverse_lazy('cliente_list')
 
-class ClienteList(ClieneBaseView, ListView):
+class ClienteList(CondicionalMixin, ProjecaoMixin, ClieneBaseView, ListView):
+    modelos_condicionais = (Cliente,)
+    linha = LinhaCliente
     template_name = "clientes/cliente_list.html"
     context_object_name = "clientes"
     ordering = ["-criado_em"]
     paginate_by = 30
+    paginator_class = PaginadorEstimado
 
     def get_queryset(self):
-        queryset = Cliente.objects.all()
+        # super(): aplica o `ordering`
+        queryset = super().get_queryset()
         q = self.request.GET.get("q")
         if q:
-            queryset = queryset.filter(
-                Q(nome__icontains=q) |
-                Q(cpf__icontains=q) |
-                Q(cnh_numero__icontains=q)
-            ).distinct()
+            queryset = queryset.filter(busca_cliente(q))
         return queryset
 
 class ClienteCreate(ClieneBaseView, CreateView):
     template_name = "clientes/cliente_adicionar.html"
     form_class = ClienteForm
 
-class ClienteDetail(ClieneBaseView, DetailView):
+class ClienteDetail(CondicionalMixin, ClieneBaseView, DetailView):
+    modelos_condicionais = (Cliente,)
+    # Links assinados de documentos expiram: o ETag precisa mudar antes disso
+    janela_etag = settings.DOCUMENTOS_URL_VALIDADE // 2
     template_name = "clientes/cliente_detalhe.html"
 
+class ClienteExtratoView(View):
+    template_name = "clientes/cliente_extrato.html"
+
+    def get(self, request, pk):
+        cliente = get_object_or_404(Cliente.objects.only("id", "nome", "cpf"), pk=pk)
+        pagina = int(request.GET["page"]) if request.GET.get("page", "").isdigit() else 1
+        extrato = extrato_cliente(cliente.pk, max(pagina, 1))
+        return render(request, self.template_name, {"cliente": cliente, **extrato})
+
+
+class ClienteExtratoExportView(View):
+    def get(self, request, pk):
+        cliente = get_object_or_404(Cliente.objects.only("id"), pk=pk)
+        linhas, _ = extrato_completo(cliente.pk)
+        response = HttpResponse(content_type="text/csv; charset=utf-8")
+        response["Content-Disposition"] = f'attachment; filename="extrato-cliente-{cliente.pk}-{timezone.now().date()}.csv"'
+        writer = csv.writer(response, delimiter=";")
+        writer.writerow(["data", "tipo", "locacao", "parcela", "debito", "credito", "caucao", "pago", "dias_atraso",
+                         "saldo", "total_pago"])
+        for linha in linhas:
+            writer.writerow([
+                timezone.localtime(linha["data"]).strftime("%Y-%m-%d %H:%M"), linha["tipo"], linha["locacao_id"],
+                linha["numero"] or "", linha["debito"], linha["credito"], linha["caucao"],
+                "sim" if linha["pago"] else "", linha["dias_atraso"] or "", linha["saldo"], linha["total_pago"],
+            ])
+        return response
+
 class ClienteUptade(ClieneBaseView, UpdateView):
     template_name = "clientes/cliente_editar.html"
-    fields = [ "nome", "cpf", "data_nascimento", "telefone", "email", "endereco", "cnh_numero", "cnh_validade",
-                "observacao", "documento_com_foto"
-    ]
+    # Mesmo formulário do cadastro: checagem de CPF/CNH duplicados pelas colunas normalizadas
+    form_class = ClienteForm
    
 class ClienteDelete(ClieneBaseView, DeleteView):
     template_name = "clientes/cliente_excluir.html"
@@ -67,21 +122,20 @@ class VeiculoBaseView:
     model = Veiculo
     success_url = reverse_lazy('veiculo_list')
 
-class VeiculoList(VeiculoBaseView, ListView):
+class VeiculoList(CondicionalMixin, ProjecaoMixin, VeiculoBaseView, ListView):
+    modelos_condicionais = (Veiculo,)
+    linha = LinhaVeiculo
     template_name = "veiculos/veiculo_list.html"
     context_object_name = 'veiculos'
     paginate_by = 30
+    paginator_class = PaginadorEstimado
 
     def get_queryset(self):
         queryset = Veiculo.objects.all()
         q = self.request.GET.get("q")
         status = self.request.GET.get("status")
         if q:
-            queryset = queryset.filter(
-                Q(modelo__icontains=q) |
-                Q(placa__icontains=q) |
-                Q(marca__icontains=q) 
-            ).distinct()
+            queryset = queryset.filter(busca_veiculo(q))
         if status:
             queryset = queryset.filter(status=status)
         return queryset.order_by('-status', '-id')
@@ -91,7 +145,9 @@ class VeiculoCreate(VeiculoBaseView, CreateView):
     template_name = "veiculos/veiculo_adicionar.html"
     form_class = VeiculoForm
 
-class VeiculoDetail(VeiculoBaseView, DetailView):
+class VeiculoDetail(CondicionalMixin, VeiculoBaseView, DetailView):
+    modelos_condicionais = (Veiculo, Despesa)
+    janela_etag = settings.DOCUMENTOS_URL_VALIDADE // 2
     template_name = "veiculos/veiculo_detalhe.html"
 
     def get_context_data(self, **kwargs):
@@ -125,32 +181,57 @@ class LocacaoBaseView:
     form_class = LocacaoForm
     success_url = reverse_lazy('locacao_list')
 
-class LocacaoList(LocacaoBaseView, ListView):
+class LocacaoList(CondicionalMixin, ProjecaoMixin, LocacaoBaseView, ListView):
+    modelos_condicionais = (Locacao, Cliente, Veiculo)
+    # Cliente e veículo vêm no JOIN da projeção
+    linha = LinhaLocacao
     template_name = "locacao/locacao_list.html"
     context_object_name = "locacoes"
     ordering = ["status"]
     paginate_by = 30
+    paginator_class = PaginadorEstimado
 
     def get_queryset(self):
-        queryset = Locacao.objects.all()
-        q = self.request.GET.get("q")
         status = self.request.GET.get("status")
+        #  "Arquivada" consulta as locações movidas para o arquivo
+        if status == "arquivada":
+            queryset = LocacaoArquivada.objects.all()
+        else:
+            queryset = Locacao.objects.all()
+        q = self.request.GET.get("q")
         if q:
-            queryset = queryset.filter(
-                Q(cliente__nome__icontains = q) |
-                Q(veiculo__placa__icontains=q) |
-                Q(veiculo__modelo__icontains = q) 
-            ).distinct()
-        if status:
+            queryset = queryset.filter(busca_cliente(q, "cliente__") | busca_veiculo(q, "veiculo__"))
+        if status and status != "arquivada":
             queryset = queryset.filter(status=status)
         return queryset.order_by('status')
 
-class LocacaoDetail(LocacaoBaseView, DetailView):
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["arquivadas"] = self.request.GET.get("status") == "arquivada"
+        return context
+
+class LocacaoDetail(CondicionalMixin, LocacaoBaseView, DetailView):
+    modelos_condicionais = (Locacao, Cliente, Veiculo, Pagamento)
+    janela_etag = settings.DOCUMENTOS_URL_VALIDADE // 2
     template_name = "locacao/locacao_detalhe.html"
 
+class LocacaoArquivadaDetail(DetailView):
+    model = LocacaoArquivada
+    template_name = "locacao/locacao_detalhe.html"
+    context_object_name = "locacao"
+
+
 class LocacaoCreate(LocacaoBaseView, CreateView):
     template_name = "locacao/locacao_adicionar.html"
 
+    def form_valid(self, form):
+        try:
+            return super().form_valid(form)
+        except ValidationError as exc:
+            # Outro atendente locou o mesmo veículo entre a validação do formulário e a gravação
+            form.add_error(None, exc)
+            return self.form_invalid(form)
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['veiculos_disponiveis'] = Veiculo.objects.filter(status="disponível")
@@ -220,13 +301,18 @@ class EncerrarLocacaoView(UpdateView):
         locacao.status = "encerrada"
         locacao.fim = timezone.now()
         locacao.caucao_status = caucao_status  # devolvido ou retido
-        locacao.save()
 
-        #  Atualiza o veículo
-        veiculo = locacao.veiculo
-        veiculo.status = "disponível"
-        veiculo.km_atual = km_fim
-        veiculo.save()
+        # Locação, veículo e evento de webhook gravados juntos
+        with transaction.atomic():
+            locacao.save()
+
+            #  Atualiza o veículo
+            veiculo = locacao.veiculo
+            veiculo.status = "disponível"
+            veiculo.km_atual = km_fim
+            veiculo.save()
+
+            registrar_evento("locacao.encerrada", dados_locacao(locacao))
 
         #  Mensagem de feedback
         if locacao.caucao_status == "devolvido":
@@ -246,18 +332,20 @@ class EncerrarLocacaoView(UpdateView):
 
 #-------------------------------- RECEBER PAGAMENOTS -------------------------------------
 
-class ReceberListView(TemplateView):
+class ReceberListView(CondicionalMixin, TemplateView):
+    modelos_condicionais = (Locacao, Pagamento, Cliente, Veiculo)
+    depende_da_data = True
     template_name = "financeiro/receber.html"
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         hoje = timezone.now().date()
-        locacoes = Locacao.objects.filter(status="andamento")
+        locacoes = Locacao.objects.filter(status="andamento").order_by("-criado_em")
         q = self.request.GET.get("q")
 
         if q:
             locacoes = locacoes.filter(
-                Q(cliente__nome__icontains=q) |
+                Q(cliente__nome_normalizado__contains=normalizar_nome(q)) |
                 Q(veiculo__modelo__icontains=q)
             )
             context["q"] = q
@@ -275,7 +363,7 @@ class ReceberListView(TemplateView):
         agrupado = defaultdict(list)
         totais_por_dia = defaultdict(float)
 
-        for loc in locacoes:
+        for loc in LinhaReceber.carregar(LinhaReceber.projetar(locacoes)):
             dia_semana = loc.inicio.weekday()
             parcela = loc.valor_total_locacao / loc.quantidade_semanas
 
@@ -286,10 +374,6 @@ class ReceberListView(TemplateView):
 
             proximo_pagamento = loc.inicio.date() + timedelta(days=(semanas_pagas + 1) * 7)
 
-            #  Último pagamento real do banco
-            ultimo_pagamento_obj = loc.pagamentos.order_by("-data").first()
-            ultimo_pagamento = ultimo_pagamento_obj.data if ultimo_pagamento_obj else None
-
             #  Status visual
             if proximo_pagamento <= hoje:
                 status = "vencido"
@@ -302,8 +386,8 @@ class ReceberListView(TemplateView):
 
             agrupado[dias_semana[dia_semana]].append({
                 "locacao": loc,
-                "cliente": loc.cliente.nome,
-                "veiculo": loc.veiculo.modelo,
+                "cliente": loc.cliente_nome,
+                "veiculo": loc.veiculo_modelo,
                 "valor_total": loc.valor_total_locacao,
                 "parcela": parcela,
                 "semanas_pagas": semanas_pagas,
@@ -311,7 +395,7 @@ class ReceberListView(TemplateView):
                 "total_pago": total_pago,
                 "saldo": saldo,
                 "proximo_pagamento": proximo_pagamento,
-                "ultimo_pagamento": ultimo_pagamento, 
+                "ultimo_pagamento": loc.ultimo_pagamento,
                 "status": status,
             })
 
@@ -344,16 +428,18 @@ class EfetuarPagamentoView(View):
             messages.warning(request, "✅ Todas as parcelas já foram quitadas.")
             return redirect("receber")
 
-        #  1 — Registra pagamento no banco
-        Pagamento.objects.create(
-            locacao=locacao,
-            valor=parcela
-            # data é salva automaticamente pelo auto_now_add=True
-        )
+        # Pagamento, contador de semanas e evento de webhook na mesma transação
+        with transaction.atomic():
+            #  1 — Registra pagamento no banco
+            Pagamento.objects.create(
+                locacao=locacao,
+                valor=parcela
+                # data é salva automaticamente pelo auto_now_add=True
+            )
 
-        #  2 — Atualiza semanas pagas da locação
-        locacao.semanas_pagas += 1
-        locacao.save()
+            #  2 — Atualiza semanas pagas da locação
+            locacao.semanas_pagas += 1
+            locacao.save()
 
         messages.success(
             request,
@@ -363,169 +449,72 @@ class EfetuarPagamentoView(View):
         return redirect("receber")
     
 
-class DashboardView(TemplateView):
+class DashboardView(CondicionalMixin, TemplateView):
+    # Só a "casca": os widgets são carregados em paralelo pelos endpoints abaixo
+    depende_da_data = True
     template_name = "dashboard/dashboard.html"
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        hoje = timezone.now().date()
+        context["data_inicio"], context["data_fim"] = _periodo_filtrado(self.request)
+        return context
 
-        # ------------------------------------------------------------
-        #  FILTRO DE DATA
-        # ------------------------------------------------------------
-        data_inicio = self.request.GET.get("data_inicio")
-        data_fim = self.request.GET.get("data_fim")
 
-        if not data_inicio or not data_fim:
-            primeiro_dia = hoje.replace(day=1)
-            if hoje.month == 12:
-                proximo_mes = hoje.replace(year=hoje.year + 1, month=1, day=1)
-            else:
-                proximo_mes = hoje.replace(month=hoje.month + 1, day=1)
-            ultimo_dia = proximo_mes - timedelta(days=1)
-            data_inicio, data_fim = primeiro_dia, ultimo_dia
-        else:
-            data_inicio = timezone.datetime.strptime(data_inicio, "%Y-%m-%d").date()
-            data_fim = timezone.datetime.strptime(data_fim, "%Y-%m-%d").date()
-
-        # ------------------------------------------------------------
-        #  LOCAÇÕES
-        # ------------------------------------------------------------
-        locacoes_qs = Locacao.objects.select_related("cliente", "veiculo").filter(
-            inicio__lte=data_fim
-        ).filter(
-            fim__gte=data_inicio
-        ) | Locacao.objects.filter(status="andamento")
-
-        locacoes_qs = locacoes_qs.distinct()
-
-        locacoes = []
-        for loc in locacoes_qs:
-            inicio_date = loc.inicio.date() if hasattr(loc.inicio, "date") else loc.inicio
-            duracao_dias = (loc.quantidade_semanas or 0) * 7
-            fim_estimado = inicio_date + timedelta(days=max(duracao_dias - 1, 0))
-
-            fim_real = getattr(loc, "fim", None)
-            if fim_real:
-                fim_date = fim_real.date() if hasattr(fim_real, "date") else fim_real
-            else:
-                fim_date = fim_estimado
-
-            if fim_date >= data_inicio and inicio_date <= data_fim:
-                locacoes.append(loc)
-
-        # ------------------------------------------------------------
-        #  DESPESAS
-        # ------------------------------------------------------------
-        despesas = Despesa.objects.filter(data__range=[data_inicio, data_fim])
-
-        # ------------------------------------------------------------
-        #  RESUMO FINANCEIRO
-        # ------------------------------------------------------------
-        total_receber = 0
-        total_pago = 0
-        total_saldo = 0
-
-        for loc in locacoes:
-            parcela = loc.valor_total_locacao / loc.quantidade_semanas if loc.quantidade_semanas > 0 else 0
-            # 🔹 Se o caução foi devolvido, não soma ao total_pago
-            caucao_valor = loc.caucao if getattr(loc, "caucao_status", "retido") == "retido" else 0
-
-            pago = loc.semanas_pagas * parcela + caucao_valor
-            saldo = loc.valor_total_locacao - pago
-
-            total_receber += loc.valor_total_locacao
-            total_pago += pago
-            total_saldo += saldo
-
-        total_despesas = despesas.aggregate(total=Sum("valor"))["total"] or 0
-        lucro_liquido = total_pago - total_despesas
-
-        resumo = {
-            "total_receber": total_receber,
-            "total_pago": total_pago,
-            "saldo_a_receber": total_saldo,
-            "total_despesas": total_despesas,
-            "lucro_liquido": lucro_liquido,
-        }
+class DashboardWidgetMixin(CondicionalMixin):
+    depende_da_data = True
 
-        # ------------------------------------------------------------
-        #  OUTROS DADOS
-        # ------------------------------------------------------------
-        total_veiculos = Veiculo.objects.count()
-        veiculos_alugados = Veiculo.objects.filter(status="alugado").count()
-        locacoes_ativas = len(locacoes)
-        total_clientes = Cliente.objects.count()
-
-        # ------------------------------------------------------------
-        #  PAGAMENTOS AGRUPADOS
-        # ------------------------------------------------------------
-        dias_semana = {
-            0: "Segunda-feira",
-            1: "Terça-feira",
-            2: "Quarta-feira",
-            3: "Quinta-feira",
-            4: "Sexta-feira",
-            5: "Sábado",
-            6: "Domingo",
-        }
+    def dispatch(self, request, *args, **kwargs):
+        inicio = time.perf_counter()
+        self.data_inicio, self.data_fim = _periodo_filtrado(request)
+        response = super().dispatch(request, *args, **kwargs)
+        response["Server-Timing"] = f"widget;dur={(time.perf_counter() - inicio) * 1000:.1f}"
+        return response
 
-        pagamentos_por_dia = defaultdict(list)
+    def get_locacoes(self):
+        return locacoes_no_periodo(self.data_inicio, self.data_fim)
 
-        for loc in locacoes:
-            dia_semana = loc.inicio.weekday()
-            parcela = loc.valor_total_locacao / loc.quantidade_semanas if loc.quantidade_semanas > 0 else 0
-            proximo_pagamento = (
-                (loc.inicio.date() if hasattr(loc.inicio, "date") else loc.inicio)
-                + timedelta(days=(loc.semanas_pagas + 1) * 7)
-            )
 
-            caucao_valor = loc.caucao if getattr(loc, "caucao_status", "retido") == "retido" else 0
+class DashboardResumoView(DashboardWidgetMixin, TemplateView):
+    template_name = "dashboard/_resumo.html"
+    modelos_condicionais = (Locacao, Despesa)
 
-            if proximo_pagamento <= hoje:
-                status = "vencido"
-            elif proximo_pagamento <= hoje + timedelta(days=3):
-                status = "proximo"
-            else:
-                status = "ok"
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["resumo"] = resumo_financeiro(self.get_locacoes(), self.data_inicio, self.data_fim)
+        return context
 
-            pagamentos_por_dia[dias_semana[dia_semana]].append({
-                "locacao": loc,
-                "cliente": loc.cliente.nome,
-                "veiculo": loc.veiculo.modelo,
-                "proximo_pagamento": proximo_pagamento,
-                "status": status,
-                "parcela": parcela,
-                "semanas_pagas": loc.semanas_pagas,
-                "semanas_restantes": loc.quantidade_semanas - loc.semanas_pagas,
-                "valor_recebido": (loc.semanas_pagas * parcela) + caucao_valor,
-            })
 
-        # ------------------------------------------------------------
-        #  GRÁFICO
-        # ------------------------------------------------------------
-        labels_chart = list(pagamentos_por_dia.keys())
-        data_chart = [len(pagamentos_por_dia[dia]) for dia in labels_chart]
+class DashboardFrotaView(DashboardWidgetMixin, TemplateView):
+    template_name = "dashboard/_frota.html"
+    modelos_condicionais = (Locacao, Veiculo, Cliente)
+    # Contagens gerais: um minuto de atraso é aceitável
+    cache_max_age = 60
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context.update(indicadores_frota(self.get_locacoes()))
+        return context
 
-        # ------------------------------------------------------------
-        #  CONTEXTO FINAL
-        # ------------------------------------------------------------
-        context.update({
-            "resumo": resumo,
-            "pagamentos_por_dia": dict(pagamentos_por_dia),
-            "labels_chart": labels_chart,
-            "data_chart": data_chart,
-            "total_veiculos": total_veiculos,
-            "veiculos_alugados": veiculos_alugados,
-            "locacoes_ativas": locacoes_ativas,
-            "total_clientes": total_clientes,
-            "data_inicio": data_inicio,
-            "data_fim": data_fim,
-        })
 
+class DashboardRecebimentosView(DashboardWidgetMixin, TemplateView):
+    template_name = "dashboard/_recebimentos.html"
+    modelos_condicionais = (Locacao, Cliente, Veiculo)
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["pagamentos_por_dia"] = pagamentos_por_dia(self.get_locacoes(), timezone.now().date())
         return context
 
 
+class DashboardGraficoView(DashboardWidgetMixin, View):
+    modelos_condicionais = (Locacao,)
+
+    def get(self, request):
+        por_dia = pagamentos_por_dia(self.get_locacoes(), timezone.now().date())
+        labels_chart = list(por_dia.keys())
+        return JsonResponse({"labels": labels_chart, "data": [len(por_dia[dia]) for dia in labels_chart]})
+
+
     
 #----------------------------- DESPESAS DESPESAS DESPESAS DESPESAS---------------------------------------------
 
@@ -534,10 +523,13 @@ class DespesaBaseView():
     form_class = DespesaForm
     success_url = reverse_lazy('despesa_list')
 
-class DespesaListView(ListView):
+class DespesaListView(CondicionalMixin, ListView):
+    modelos_condicionais = (Despesa, Veiculo)
+    janela_etag = settings.DOCUMENTOS_URL_VALIDADE // 2
     model = Despesa
     template_name = "despesa/despesa_list.html"
     context_object_name = "despesas"
+    por_pagina = 30
 
     def get_queryset(self):
         qs = super().get_queryset().select_related("veiculo")
@@ -556,27 +548,97 @@ class DespesaListView(ListView):
         if ano:
             qs = qs.filter(data__year=ano)
 
-        return qs.order_by("-data", "-id")
+        self.filtrado = qs.order_by("-data", "-id")
+
+        #  Paginação por cursor (?apos= / ?antes=AAAA-MM-DD_id): sem OFFSET nem COUNT; uma linha a
+        #  mais que a página diz se há outra página na mesma direção
+        apos = _cursor_despesa(self.request.GET.get("apos"))
+        antes = _cursor_despesa(self.request.GET.get("antes"))
+        if antes:
+            data_cursor, id_cursor = antes
+            linhas = list(
+                self.filtrado.filter(Q(data__gt=data_cursor) | Q(data=data_cursor, id__gt=id_cursor))
+                .order_by("data", "id")[:self.por_pagina + 1]
+            )
+            if len(linhas) > self.por_pagina:
+                self.tem_anterior, self.tem_proxima = True, True
+                return linhas[:self.por_pagina][::-1]
+            #  Voltou ao começo: primeira página completa
+            apos = None
+        qs = self.filtrado
+        if apos:
+            data_cursor, id_cursor = apos
+            qs = qs.filter(Q(data__lt=data_cursor) | Q(data=data_cursor, id__lt=id_cursor))
+        linhas = list(qs[:self.por_pagina + 1])
+        self.tem_anterior = apos is not None
+        self.tem_proxima = len(linhas) > self.por_pagina
+        return linhas[:self.por_pagina]
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context["veiculos"] = Veiculo.objects.all()
 
-        #  Total de despesas do filtro atual
-        context["total_despesas"] = self.get_queryset().aggregate(total=Sum("valor"))["total"] or 0
-
-        #  Lista de anos com base no campo `data`
-        anos = (
-            Despesa.objects
-            .dates("data", "year", order="DESC")
-            .distinct()
+        #  Veículo selecionado apenas; a lista completa é carregada sob demanda no filtro
+        veiculo = self.request.GET.get("veiculo")
+        context["veiculo_selecionado"] = (
+            Veiculo.objects.filter(pk=veiculo).only("id", "modelo", "placa").first() if veiculo and veiculo.isdigit() else None
         )
-        anos = [d.year for d in anos] if anos else [datetime.now().year]
 
-        context["anos"] = anos
+        #  Total, subtotais por categoria e por mês em uma única agregação
+        categorias = Despesa._meta.get_field("categoria").choices
+        somas = {f"cat_{cat}": Sum("valor", filter=Q(categoria=cat)) for cat, _ in categorias}
+        somas.update({f"mes_{m}": Sum("valor", filter=Q(data__month=m)) for m in range(1, 13)})
+        totais = self.filtrado.order_by().aggregate(total=Sum("valor"), **somas)
+
+        context["total_despesas"] = totais["total"] or 0
+        context["totais_categoria"] = [(rotulo, totais[f"cat_{cat}"]) for cat, rotulo in categorias if totais[f"cat_{cat}"]]
+        context["totais_mes"] = [(m, totais[f"mes_{m}"]) for m in range(1, 13) if totais[f"mes_{m}"]]
+
+        #  Cursores a partir da primeira e da última linha exibidas; os filtros seguem nos links
+        despesas = context["despesas"]
+        if despesas and self.tem_anterior:
+            context["cursor_anterior"] = f"{despesas[0].data:%Y-%m-%d}_{despesas[0].id}"
+        if despesas and self.tem_proxima:
+            context["proximo_cursor"] = f"{despesas[-1].data:%Y-%m-%d}_{despesas[-1].id}"
+        filtros = self.request.GET.copy()
+        for chave in ("apos", "antes", "page"):
+            filtros.pop(chave, None)
+        context["filtros"] = filtros.urlencode()
+
+        #  Mesma versão da tabela que o ETag já leu: a lista de anos muda junto com ele
+        versao, _ = self._versoes(self.request).get(Despesa._meta.label_lower, (0, None))
+        context["anos"] = _anos_despesa(versao)
         context["meses"] = range(1, 13)
         return context
 
+
+def _cursor_despesa(valor):
+    data_cursor, _, id_cursor = (valor or "").partition("_")
+    try:
+        return datetime.strptime(data_cursor, "%Y-%m-%d").date(), int(id_cursor)
+    except ValueError:
+        return None
+
+
+ANOS_DESPESA_CACHE_TIMEOUT = 60 * 60 * 24
+
+
+def _anos_despesa(versao):
+    #  Lista de anos com base no campo `data`; a chave leva a versão da tabela (VersaoTabela), que
+    #  todo processo lê do banco, então uma gravação em outro worker ou comando troca a chave
+    chave = f"despesa:anos:{versao}"
+    anos = cache.get(chave)
+    if anos is None:
+        anos = [d.year for d in Despesa.objects.dates("data", "year", order="DESC")] or [datetime.now().year]
+        cache.set(chave, anos, ANOS_DESPESA_CACHE_TIMEOUT)
+    return anos
+
+
+class VeiculoOpcoesView(View):
+    # Opções compactas para o filtro de veículos (carregadas sob demanda)
+    def get(self, request):
+        veiculos = Veiculo.objects.order_by("modelo", "placa").values_list("id", "modelo", "placa")
+        return JsonResponse({"veiculos": [{"id": pk, "nome": f"{modelo} ({placa})"} for pk, modelo, placa in veiculos]})
+
 class DespesaCreateView(DespesaBaseView, CreateView):
     template_name = "despesa/despesa_adicionar.html"
     
@@ -592,4 +654,268 @@ class DespesaUpdateView(UpdateView):
 class DespesaDeleteView(DeleteView):
     model = Despesa
     template_name = "despesa/despesa_excluir.html"
-    success_url = reverse_lazy('despesa_list')
\ No newline at end of file
+    success_url = reverse_lazy('despesa_list')
+
+
+#----------------------------- RELATÓRIOS ---------------------------------------------
+
+# Período máximo dos filtros: a ocupação monta uma matriz veículos x dias
+PERIODO_MAXIMO = timedelta(days=3 * 366)
+
+
+def _periodo_filtrado(request):
+    # Mesmo comportamento do dashboard: sem filtro, usa o mês corrente
+    hoje = timezone.now().date()
+    data_inicio = request.GET.get("data_inicio")
+    data_fim = request.GET.get("data_fim")
+    if data_inicio and data_fim:
+        try:
+            data_inicio = datetime.strptime(data_inicio, "%Y-%m-%d").date()
+            data_fim = datetime.strptime(data_fim, "%Y-%m-%d").date()
+        except ValueError:
+            pass
+        else:
+            # Datas invertidas são trocadas; um período longo demais fica com os últimos 3 anos.
+            # O fim vira [inicio, fim + 1 dia) nas consultas: date.max não tem dia seguinte
+            ultimo_dia = date.max - timedelta(days=1)
+            data_inicio, data_fim = sorted((min(data_inicio, ultimo_dia), min(data_fim, ultimo_dia)))
+            if data_fim - data_inicio > PERIODO_MAXIMO:
+                data_inicio = data_fim - PERIODO_MAXIMO
+            return data_inicio, data_fim
+    primeiro_dia = hoje.replace(day=1)
+    proximo_mes = (primeiro_dia + timedelta(days=32)).replace(day=1)
+    return primeiro_dia, proximo_mes - timedelta(days=1)
+
+
+class RentabilidadeView(ListView):
+    template_name = "relatorios/rentabilidade.html"
+    context_object_name = "linhas"
+    paginate_by = 30
+
+    ORDENACOES = {
+        "placa": "placa",
+        "receita": "-receita",
+        "despesas": "-total_despesas",
+        "lucro": "-lucro",
+        "roi": "-roi",
+        "utilizacao": "-tempo_alugado",
+    }
+
+    def get_queryset(self):
+        self.data_inicio, self.data_fim = _periodo_filtrado(self.request)
+        self.ordem = self.request.GET.get("ordem") if self.request.GET.get("ordem") in self.ORDENACOES else "lucro"
+
+        campo = self.ORDENACOES[self.ordem]
+        descendente = campo.startswith("-")
+        expressao = F(campo.lstrip("-"))
+        expressao = expressao.desc(nulls_last=True) if descendente else expressao.asc()
+        queryset = rentabilidade_veiculos(self.data_inicio, self.data_fim).order_by(expressao, "id")
+
+        #  Período fechado: guarda todas as linhas em cache até a próxima gravação nas tabelas lidas
+        if self.data_fim < timezone.now().date():
+            versao = chave_versoes(*MODELOS_RENTABILIDADE)
+            chave = f"rentabilidade:{self.data_inicio}:{self.data_fim}:{self.ordem}:{versao}"
+            linhas = cache.get(chave)
+            if linhas is None:
+                linhas = anexar_detalhes_rentabilidade(list(queryset), self.data_inicio, self.data_fim)
+                cache.set(chave, linhas, RELATORIO_CACHE_TIMEOUT)
+            return linhas
+        return queryset
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        linhas = anexar_detalhes_rentabilidade(list(context["linhas"]), self.data_inicio, self.data_fim)
+        context.update({
+            "linhas": linhas,
+            "data_inicio": self.data_inicio,
+            "data_fim": self.data_fim,
+            "ordem": self.ordem,
+            "ordenacoes": self.ORDENACOES,
+        })
+        return context
+
+
+class SerieTemporalView(View):
+    # JSON no formato do Chart.js: labels + datasets
+    def get(self, request):
+        if request.GET.get("data_inicio") and request.GET.get("data_fim"):
+            data_inicio, data_fim = _periodo_filtrado(request)
+        else:
+            data_fim = timezone.now().date()
+            data_inicio = (data_fim - timedelta(days=365)).replace(day=1)
+
+        granularidade = request.GET.get("granularidade")
+        if granularidade not in TRUNCAMENTOS:
+            dias = (data_fim - data_inicio).days
+            granularidade = "dia" if dias <= 62 else "semana" if dias <= 366 else "mes"
+
+        serie = serie_temporal(data_inicio, data_fim, granularidade)
+        return JsonResponse({
+            "granularidade": granularidade,
+            "labels": [bucket.isoformat() for bucket, *_ in serie],
+            "datasets": [
+                {"label": "Receitas", "data": [receita for _, receita, _, _ in serie]},
+                {"label": "Despesas", "data": [despesa for _, _, despesa, _ in serie]},
+                {"label": "Locações iniciadas", "data": [locacoes for *_, locacoes in serie]},
+            ],
+        })
+
+
+class OcupacaoMixin:
+    def get_ocupacao(self):
+        if self.request.GET.get("data_inicio") and self.request.GET.get("data_fim"):
+            self.data_inicio, self.data_fim = _periodo_filtrado(self.request)
+        else:
+            self.data_fim = timezone.now().date()
+            self.data_inicio = self.data_fim - timedelta(days=364)
+        return ocupacao_frota(self.data_inicio, self.data_fim)
+
+
+class OcupacaoView(OcupacaoMixin, TemplateView):
+    template_name = "relatorios/ocupacao.html"
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        ocupacao = self.get_ocupacao()
+        veiculos = sorted(ocupacao["veiculos"], key=lambda v: v["taxa"], reverse=True)
+        page_obj = Paginator(veiculos, 30).get_page(self.request.GET.get("page"))
+        context.update({
+            "ocupacao": ocupacao,
+            "modelos": sorted(ocupacao["modelos"], key=lambda m: m["taxa"], reverse=True),
+            "page_obj": page_obj,
+            "veiculos": page_obj.object_list,
+            "data_inicio": self.data_inicio,
+            "data_fim": self.data_fim,
+        })
+        return context
+
+
+class OcupacaoJsonView(OcupacaoMixin, View):
+    def get(self, request):
+        ocupacao = self.get_ocupacao()
+        return JsonResponse({
+            "labels": ocupacao["dias"],
+            "frota_por_dia": ocupacao["frota_por_dia"],
+            "frota_media": ocupacao["frota_media"],
+            "modelos": ocupacao["modelos"],
+            "veiculos": ocupacao["veiculos"],
+        })
+
+
+class PrevisaoMixin:
+    def get_previsao(self):
+        try:
+            semanas = min(max(int(self.request.GET.get("semanas", 8)), 1), 52)
+        except ValueError:
+            semanas = 8
+        granularidade = "dia" if self.request.GET.get("granularidade") == "dia" else "semana"
+        return previsao_recebimentos(semanas, granularidade, considerar_atraso=self.request.GET.get("atraso") != "0")
+
+
+class PrevisaoJsonView(PrevisaoMixin, View):
+    def get(self, request):
+        previsao = self.get_previsao()
+        previsao["datas"] = [d.isoformat() for d in previsao["datas"]]
+        return JsonResponse(previsao)
+
+
+class PrevisaoExportView(PrevisaoMixin, View):
+    def get(self, request):
+        previsao = self.get_previsao()
+        response = HttpResponse(content_type="text/csv; charset=utf-8")
+        response["Content-Disposition"] = f'attachment; filename="previsao-recebimentos-{timezone.now().date()}.csv"'
+        writer = csv.writer(response, delimiter=";")
+        writer.writerow(["data", "contratado", "esperado", "pessimista"])
+        for linha in zip(previsao["datas"], previsao["contratado"], previsao["esperado"], previsao["pessimista"]):
+            writer.writerow(linha)
+        return response
+
+
+#----------------------------- DOCUMENTOS ---------------------------------------------
+
+class DocumentoView(View):
+    def get(self, request, token):
+        try:
+            modelo, pk, campo, usuario_pk = abrir_token(token)
+        except signing.BadSignature:
+            return HttpResponseForbidden("Link de documento inválido ou expirado.")
+        # O link vale só para o usuário autenticado que o recebeu e precisa da permissão de
+        # visualização do modelo; tokens sem usuário não são aceitos
+        if not request.user.is_authenticated or usuario_pk is None:
+            return HttpResponseForbidden("Entre no sistema para abrir este documento.")
+        if usuario_pk != request.user.pk:
+            return HttpResponseForbidden("Link de documento emitido para outro usuário.")
+        if not request.user.has_perm(
+            f"{modelo._meta.app_label}.view_{modelo._meta.model_name}"
+        ):
+            return HttpResponseForbidden("Sem permissão para este documento.")
+
+        arquivo = getattr(get_object_or_404(modelo.objects.only(campo), pk=pk), campo)
+        if not arquivo:
+            raise Http404("Documento não encontrado.")
+        return resposta_documento(request, arquivo)
+
+
+#----------------------------- PDFs ---------------------------------------------
+
+class PdfView(View):
+    # Serve o PDF se já foi gerado para os dados atuais; senão enfileira e mostra a página de espera
+    tipo = None
+
+    def get_referencia(self, **kwargs):
+        return str(kwargs["pk"])
+
+    def get_nome_download(self, **kwargs):
+        return f"{self.tipo}-{self.get_referencia(**kwargs).replace(':', '-')}.pdf"
+
+    def get(self, request, **kwargs):
+        referencia = self.get_referencia(**kwargs)
+        try:
+            _, nome = dados_pdf(self.tipo, referencia)
+        except ObjectDoesNotExist:
+            raise Http404("Registro não encontrado.")
+        if default_storage.exists(nome):
+            return resposta_arquivo(request, nome, nome_download=self.get_nome_download(**kwargs))
+
+        enfileirar(self.tipo, referencia)
+        falha = TarefaPdf.objects.filter(tipo=self.tipo, referencia=referencia, status="erro").order_by("-id").first()
+        return render(request, "pdfs/aguardando.html", {"falha": falha}, status=202)
+
+
+class ContratoPdfView(PdfView):
+    tipo = "contrato"
+
+
+class ReciboPdfView(PdfView):
+    tipo = "recibo"
+
+
+class RecibosMesPdfView(PdfView):
+    tipo = "recibos_mes"
+
+    def get_referencia(self, **kwargs):
+        return f"{kwargs['pk']}:{kwargs['ano']:04d}-{kwargs['mes']:02d}"
+
+
+@method_decorator(staff_member_required, name="dispatch")
+class ConsultasLentasView(TemplateView):
+    template_name = "relatorios/consultas_lentas.html"
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        dias = int(self.request.GET["dias"]) if self.request.GET.get("dias", "").isdigit() else 7
+        context.update({
+            "dias": dias,
+            "limite_ms": settings.SQL_LENTO_MS,
+            "grupos": ranking(timezone.now() - timedelta(days=dias)),
+            # Buffer deste processo: as mais recentes primeiro
+            "recentes": list(reversed(recentes))[:20],
+        })
+        return context
+
+
+@method_decorator(staff_member_required, name="dispatch")
+class MetricasView(View):
+    # Acumulado deste processo desde que subiu
+    def get(self, request):
+        return JsonResponse({"renderizacao": metricas()})
@@ -0,0 +1,267 @@
+import hashlib
+import hmac
+import http.client
+import json
+import logging
+import random
+import time
+import urllib.error
+import urllib.request
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
+from django.db.models import Exists, F, OuterRef, Q
+from django.utils import timezone
+from .models import DestinoWebhook, EntregaWebhook, EventoWebhook
+
+# Webhooks de saída (outbox). Quem grava um pagamento, uma despesa ou abre/encerra uma locação só
+# insere o evento e uma EntregaWebhook por destino inscrito, na mesma transação da mudança: se a
+# transação volta, o evento some junto, e a requisição nunca espera pelo destino. O envio é do
+# worker (manage.py enviar_webhooks): junta até WEBHOOKS_LOTE eventos num POST, assina com
+# HMAC-SHA256, respeita o limite de envios simultâneos de cada destino, repete com espera
+# exponencial e, esgotadas as tentativas (ou num 4xx), deixa a entrega como "morta" para o admin.
+# A entrega é "pelo menos uma vez": o destino deve ignorar ids de evento já recebidos.
+
+logger = logging.getLogger(__name__)
+
+EVENTOS = ["pagamento.criado", "locacao.aberta", "locacao.encerrada", "despesa.registrada"]
+
+
+# ----------------------------- EVENTOS -----------------------------------------
+def registrar_eventos(tipo, lista_dados):
+    """Grava os eventos e as entregas na transação em andamento. Sem destino inscrito, não grava nada."""
+    destinos = [d for d in DestinoWebhook.objects.filter(ativo=True).only("id", "eventos") if d.recebe(tipo)]
+    if not destinos or not lista_dados:
+        return
+    eventos = EventoWebhook.objects.bulk_create([EventoWebhook(tipo=tipo, dados=dados) for dados in lista_dados])
+    EntregaWebhook.objects.bulk_create(
+        [EntregaWebhook(evento=evento, destino=destino) for evento in eventos for destino in destinos],
+        batch_size=500,
+    )
+
+
+def registrar_evento(tipo, dados):
+    registrar_eventos(tipo, [dados])
+
+
+def dados_pagamento(pagamento):
+    return {
+        "pagamento_id": pagamento.pk,
+        "locacao_id": pagamento.locacao_id,
+        "cliente_id": pagamento.locacao.cliente_id,
+        "valor": pagamento.valor,
+        "data": pagamento.data,
+    }
+
+
+def dados_locacao(locacao):
+    return {
+        "locacao_id": locacao.pk,
+        "cliente_id": locacao.cliente_id,
+        "veiculo_id": locacao.veiculo_id,
+        "status": locacao.status,
+        "inicio": locacao.inicio,
+        "fim": locacao.fim,
+        "km_inicio": locacao.km_inicio,
+        "km_fim": locacao.km_fim,
+        "valor_semanal": locacao.valor_semanal,
+        "quantidade_semanas": locacao.quantidade_semanas,
+        "semanas_pagas": locacao.semanas_pagas,
+        "caucao": locacao.caucao,
+        "caucao_status": locacao.caucao_status,
+    }
+
+
+def dados_despesa(despesa):
+    return {
+        "despesa_id": despesa.pk,
+        "veiculo_id": despesa.veiculo_id,
+        "cliente_id": despesa.cliente_id,
+        "categoria": despesa.categoria,
+        "descricao": despesa.descricao,
+        "valor": despesa.valor,
+        "data": despesa.data,
+        "auto_infracao": despesa.auto_infracao,
+    }
+
+
+# ----------------------------- ASSINATURA -----------------------------------------
+def assinar(segredo, timestamp, corpo):
+    """HMAC-SHA256 de "<timestamp>.<corpo>" (o timestamp assinado impede reaproveitar um POST antigo)."""
+    mensagem = f"{timestamp}.".encode() + corpo
+    return "sha256=" + hmac.new(segredo.encode(), mensagem, hashlib.sha256).hexdigest()
+
+
+def verificar_assinatura(segredo, timestamp, corpo, assinatura, tolerancia=300):
+    """Conferência do lado de quem recebe (usada pelo manage.py receptor_webhook)."""
+    try:
+        atraso = abs(time.time() - int(timestamp))
+    except (TypeError, ValueError):
+        return False
+    return atraso <= tolerancia and hmac.compare_digest(assinar(segredo, timestamp, corpo), assinatura or "")
+
+
+# ----------------------------- ENVIO -----------------------------------------
+def espera(tentativas):
+    """Segundos até a próxima tentativa: exponencial com teto e ±20% de variação (destinos que
+    voltam do ar não recebem todas as retentativas no mesmo segundo)."""
+    segundos = min(settings.WEBHOOKS_ESPERA_BASE * 2 ** (tentativas - 1), settings.WEBHOOKS_ESPERA_MAXIMA)
+    return segundos * random.uniform(0.8, 1.2)
+
+
+def _vencidas(agora):
+    # "enviando" com a trava vencida: o worker que reservou morreu no meio do envio
+    return EntregaWebhook.objects.filter(
+        Q(status="pendente", proxima_tentativa__lte=agora) | Q(status="enviando", travado_ate__lte=agora)
+    )
+
+
+def reservar_lote(destino, tamanho, ate):
+    """Reserva até `tamanho` entregas do destino vencidas em `ate`; devolve (lote, entregas) ou None
+    se não há nada ou o destino já está no limite de envios simultâneos."""
+    agora = timezone.now()
+    with transaction.atomic():
+        # A trava na linha do destino serializa as reservas dele entre workers e processos. É um
+        # UPDATE que não muda nada, e não select_for_update: no SQLite a transação precisa começar
+        # escrevendo (trava de escrita já no início), senão a leitura seguida de escrita falha com
+        # "database is locked" quando outra thread reserva ao mesmo tempo
+        DestinoWebhook.objects.filter(pk=destino.pk).update(max_concorrencia=F("max_concorrencia"))
+        destino = DestinoWebhook.objects.get(pk=destino.pk)
+        em_andamento = (
+            EntregaWebhook.objects.filter(destino=destino, status="enviando", travado_ate__gt=agora)
+            .values("lote").distinct().count()
+        )
+        if em_andamento >= destino.max_concorrencia:
+            return None
+        ids = list(
+            _vencidas(ate).filter(destino=destino).order_by("id").values_list("id", flat=True)[:tamanho]
+        )
+        if not ids:
+            return None
+        lote = uuid.uuid4()
+        # A trava dura mais que o POST: só expira se o worker morrer
+        EntregaWebhook.objects.filter(pk__in=ids).update(
+            status="enviando", lote=lote, travado_ate=agora + timedelta(seconds=settings.WEBHOOKS_TIMEOUT * 3)
+        )
+    entregas = list(EntregaWebhook.objects.filter(lote=lote).select_related("evento").order_by("id"))
+    return lote, entregas
+
+
+def _corpo(lote, entregas):
+    eventos = [
+        {"id": e.evento_id, "tipo": e.evento.tipo, "criado_em": e.evento.criado_em, "dados": e.evento.dados}
+        for e in entregas
+    ]
+    return json.dumps({"lote": str(lote), "eventos": eventos}, cls=DjangoJSONEncoder).encode()
+
+
+def enviar_lote(destino, lote, entregas):
+    """POST do lote ao destino; grava o resultado nas entregas. Devolve "entregue", "retentativa" ou "morta"."""
+    corpo = _corpo(lote, entregas)
+    timestamp = str(int(time.time()))
+    requisicao = urllib.request.Request(
+        destino.url,
+        data=corpo,
+        headers={
+            "Content-Type": "application/json",
+            "User-Agent": "locadora-webhooks",
+            "X-Webhook-Lote": str(lote),
+            "X-Webhook-Timestamp": timestamp,
+            "X-Webhook-Assinatura": assinar(destino.segredo, timestamp, corpo),
+        },
+        method="POST",
+    )
+    try:
+        with urllib.request.urlopen(requisicao, timeout=settings.WEBHOOKS_TIMEOUT):
+            pass
+    except urllib.error.HTTPError as exc:
+        # 4xx (exceto 408 e 429) é recusa do destino: repetir não resolve
+        permanente = 400 <= exc.code < 500 and exc.code not in (408, 429)
+        return _falhar(lote, entregas, f"HTTP {exc.code}", permanente)
+    except (OSError, http.client.HTTPException) as exc:
+        # Rede, TLS, timeout (URLError e TimeoutError são OSError) ou resposta HTTP malformada
+        # (BadStatusLine, IncompleteRead): transitório, volta para a fila com espera
+        return _falhar(lote, entregas, str(getattr(exc, "reason", exc)) or type(exc).__name__, False)
+
+    # Filtrar pelo lote: se a trava tivesse vencido, outro worker já teria trocado o lote
+    EntregaWebhook.objects.filter(lote=lote).update(
+        status="entregue", entregue_em=timezone.now(), tentativas=F("tentativas") + 1,
+        lote=None, travado_ate=None, erro="",
+    )
+    return "entregue"
+
+
+def _falhar(lote, entregas, erro, permanente):
+    logger.warning("Webhook %s: lote %s com %s evento(s) falhou: %s", entregas[0].destino_id, lote, len(entregas), erro)
+    agora = timezone.now()
+    resultado = "morta" if permanente else "retentativa"
+    for tentativas in {e.tentativas + 1 for e in entregas}:
+        campos = {"tentativas": tentativas, "erro": erro, "lote": None, "travado_ate": None}
+        if permanente or tentativas >= settings.WEBHOOKS_MAX_TENTATIVAS:
+            campos["status"] = "morta"
+            resultado = "morta"
+        else:
+            campos["status"] = "pendente"
+            campos["proxima_tentativa"] = agora + timedelta(seconds=espera(tentativas))
+        EntregaWebhook.objects.filter(lote=lote, tentativas=tentativas - 1).update(**campos)
+    return resultado
+
+
+def _trabalhar(destino, tamanho, ate):
+    # Uma "vaga" de envio do destino: reserva e envia lotes até acabar o que venceu antes da rodada
+    resumo = Counter()
+    try:
+        while (reserva := reservar_lote(destino, tamanho, ate)) is not None:
+            lote, entregas = reserva
+            resultado = enviar_lote(destino, lote, entregas)
+            resumo["lotes"] += 1
+            resumo[resultado] += len(entregas)
+    except Exception:
+        logger.exception("Erro no envio de webhooks para o destino %s", destino.pk)
+        resumo["erros"] += 1
+    finally:
+        # Cada thread tem a própria conexão
+        connection.close()
+    return resumo
+
+
+def despachar(lote=None, trabalhadores=None):
+    """Uma rodada: envia o que está vencido agora, até max_concorrencia POSTs simultâneos por
+    destino (um destino lento só ocupa as próprias vagas). Devolve um Counter com o resumo."""
+    tamanho = lote or settings.WEBHOOKS_LOTE
+    ate = timezone.now()
+    destinos = list(
+        DestinoWebhook.objects.filter(ativo=True, max_concorrencia__gt=0)
+        .filter(Exists(_vencidas(ate).filter(destino=OuterRef("pk"))))
+    )
+    vagas = [destino for destino in destinos for _ in range(destino.max_concorrencia)]
+    resumo = Counter()
+    if not vagas:
+        return resumo
+    with ThreadPoolExecutor(max_workers=trabalhadores or min(len(vagas), 16)) as executor:
+        for parcial in executor.map(lambda destino: _trabalhar(destino, tamanho, ate), vagas):
+            resumo.update(parcial)
+    return resumo
+
+
+def limpar(dias=None):
+    """Apaga entregas concluídas e eventos sem entrega mais antigos que WEBHOOKS_RETENCAO_DIAS."""
+    limite = timezone.now() - timedelta(days=settings.WEBHOOKS_RETENCAO_DIAS if dias is None else dias)
+    entregas, _ = EntregaWebhook.objects.filter(status="entregue", entregue_em__lt=limite).delete()
+    eventos, _ = (
+        EventoWebhook.objects.filter(criado_em__lt=limite)
+        .exclude(Exists(EntregaWebhook.objects.filter(evento=OuterRef("pk"))))
+        .delete()
+    )
+    return entregas, eventos
+
+
+def reenviar(entregas):
+    """Devolve à fila entregas mortas (ou pendentes), com as tentativas zeradas."""
+    return entregas.exclude(status__in=["entregue", "enviando"]).update(
+        status="pendente", tentativas=0, proxima_tentativa=timezone.now(), erro="", lote=None, travado_ate=None
+    )
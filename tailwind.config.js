@@ -0,0 +1,30 @@
+/** Tema do painel (o mesmo usado pelo Tailwind do CDN em base.html). */
+module.exports = {
+  content: [
+    "./locar/templates/**/*.html",
+    "./locar/forms.py",
+  ],
+  theme: {
+    extend: {
+      colors: {
+        brand: {
+          50: '#f5f8fb',
+          100: '#e0edf6',
+          200: '#b8d7eb',
+          300: '#8fbce0',
+          400: '#66a0d5',
+          500: '#3d85ca',
+          600: '#2f6bb0',
+          700: '#23568c',
+          800: '#1a4070',
+          900: '#133059',
+        },
+        graylight: '#f6f7fb',
+      },
+      boxShadow: {
+        soft: '0 2px 8px rgba(0,0,0,0.05)',
+      }
+    }
+  },
+  plugins: [],
+}